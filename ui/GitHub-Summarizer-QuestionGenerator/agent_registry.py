@@ -0,0 +1,187 @@
+"""
+Agents shared by the API endpoints.
+
+Every agent has fixed instructions and is built once per provider (OpenAI
+through the Agents SDK, or Gemini), then reused by every request. Request
+data such as the topic, challenge type or correct answer goes into the
+input. The instructions are then an identical prefix on every call, which
+providers can serve from their prompt cache.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from agents import Agent, Runner
+from gemini_helper import GeminiAgent, run_gemini_agent
+
+TUTOR_INSTRUCTIONS = "You are a helpful programming and coding assistant. You provide general coding advice, explanations, and help with programming concepts. WRAP ALL MATH in Mathjax and all CODE in ````` (code ticks)"
+
+CODE_QUESTION_INSTRUCTIONS = "You are an expert coding educator. Generate educational multiple-choice questions about code."
+
+MCQ_OPTIONS_INSTRUCTIONS = """You are an expert at creating challenging multiple-choice options for coding questions.
+
+Given a coding question and the correct answer, generate 3 plausible but incorrect options that would challenge students.
+
+The incorrect options should be:
+1. Plausible enough to seem correct at first glance
+2. Based on common misconceptions or mistakes
+3. Similar in style and length to the correct answer
+
+Format your response EXACTLY as valid JSON:
+{
+  "incorrect_options": ["Option 1", "Option 2", "Option 3"]
+}
+
+Return ONLY the JSON, no other text."""
+
+CHALLENGE_INSTRUCTIONS = """You are an expert educator creating challenging multiple-choice questions.
+
+Generate 3-5 high-quality multiple-choice questions about the topic you are given.
+
+For each question:
+1. Make it thought-provoking and educational
+2. Provide 4 options (A, B, C, D)
+3. Mark the correct answer
+4. Include a brief explanation
+
+Format your response EXACTLY as valid JSON:
+{
+  "questions": [
+    {
+      "question": "Question text here?",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "answer": "Option A",
+      "explanation": "Explanation here"
+    }
+  ]
+}
+
+Make sure to return ONLY the JSON, no other text."""
+
+PROGRESS_CARDS_INSTRUCTIONS = """You are an expert career advisor and learning strategist.
+
+Generate exactly 5 MAJOR MILESTONE cards for the long-term career/learning goal you are given.
+
+IMPORTANT: This is a LONG-TERM CAREER or LEARNING GOAL, not a short-term project. Each milestone should represent months or years of work.
+
+Each milestone should be:
+1. A significant, high-level achievement (e.g., "Foundational Knowledge", "Professional Experience", "Career Advancement")
+2. Ordered from beginner to expert level
+3. Represent major phases of the learning/career journey
+4. Brief title (3-5 words EXACTLY) with descriptive explanation of what this phase entails
+
+Format your response EXACTLY as valid JSON:
+{
+  "cards": [
+    {
+      "title": "Build Foundational Knowledge",
+      "description": "Learn core concepts, syntax, and fundamental principles through courses, books, and tutorials"
+    },
+    {
+      "title": "Develop Practical Skills",
+      "description": "Build real projects, contribute to open source, and gain hands-on experience"
+    }
+  ]
+}
+
+IMPORTANT:
+- Titles must be 3-5 words only
+- These are MAJOR phases, not small tasks
+- Think in terms of months/years, not days/weeks
+Generate EXACTLY 5 milestone cards. Return ONLY the JSON, no other text."""
+
+MINI_CHALLENGE_INSTRUCTIONS = """You are a friendly coding tutor creating a MOBILE-FRIENDLY challenge.
+
+You are given the challenge type and what the challenge should be.
+
+CRITICAL RULES:
+- MUST be SHORT enough for mobile screen (max 10 lines total)
+- NO markdown formatting (plain text only for iMessage)
+- Be warm, conversational, and encouraging
+- Use simple, clear language
+- Add relevant emojis for engagement
+
+Format your response as plain text, NOT markdown. Make it feel like a text message from a friend!"""
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """Fixed definition of a shared agent."""
+    name: str
+    instructions: str
+    handoffs: Tuple[str, ...] = ()  # Registry keys; OpenAI only
+
+
+AGENT_SPECS = {
+    "tutor": AgentSpec("Tutor", TUTOR_INSTRUCTIONS),
+    "assistant": AgentSpec("App assistant", TUTOR_INSTRUCTIONS, handoffs=("tutor",)),
+    "code_question": AgentSpec("Code Question Generator", CODE_QUESTION_INSTRUCTIONS),
+    "mcq_options": AgentSpec("MCQ Options Generator", MCQ_OPTIONS_INSTRUCTIONS),
+    "challenge": AgentSpec("Challenge Question Generator", CHALLENGE_INSTRUCTIONS),
+    "progress_cards": AgentSpec("Progress Card Generator", PROGRESS_CARDS_INSTRUCTIONS),
+    "mini_challenge": AgentSpec("Mini Challenge Generator", MINI_CHALLENGE_INSTRUCTIONS),
+}
+
+PROVIDERS = ("openai", "gemini")
+
+
+class AgentRegistry:
+    """Builds each agent once per provider and runs it on request input."""
+
+    def __init__(self, specs: Optional[Dict[str, AgentSpec]] = None):
+        """
+        Args:
+            specs: Agent definitions by key; defaults to AGENT_SPECS
+        """
+        self.specs = dict(specs if specs is not None else AGENT_SPECS)
+        self._agents: Dict[Tuple[str, str], object] = {}
+
+    def get(self, key: str, model: Optional[str] = "openai"):
+        """
+        The shared agent for a key and provider, built on first use.
+
+        Args:
+            key: Agent key, e.g. "challenge"
+            model: "gemini" for a GeminiAgent; anything else gives an OpenAI Agent
+
+        Raises:
+            KeyError: Unknown agent key
+        """
+        provider = "gemini" if model == "gemini" else "openai"
+        agent = self._agents.get((key, provider))
+        if agent is None:
+            spec = self.specs[key]
+            if provider == "gemini":
+                agent = GeminiAgent(name=spec.name, instructions=spec.instructions)
+            else:
+                agent = Agent(name=spec.name, instructions=spec.instructions,
+                              handoffs=[self.get(handoff) for handoff in spec.handoffs])
+            self._agents[(key, provider)] = agent
+        return agent
+
+    def warm(self):
+        """Build every agent for every provider up front, e.g. at server startup."""
+        for key in self.specs:
+            for provider in PROVIDERS:
+                self.get(key, provider)
+
+    async def run(self, key: str, input_text: str, model: Optional[str] = "openai",
+                  history: Optional[List[Dict[str, str]]] = None) -> str:
+        """
+        Run a shared agent and return its answer.
+
+        Args:
+            key: Agent key
+            input_text: The request data for this call
+            model: "gemini" or "openai"
+            history: Earlier conversation messages (role, content); used by Gemini,
+                OpenAI callers put the conversation into input_text
+
+        Returns:
+            The agent's final output, stripped
+        """
+        agent = self.get(key, model)
+        if isinstance(agent, GeminiAgent):
+            return (await run_gemini_agent(agent, input_text, history)).strip()
+        result = await Runner.run(starting_agent=agent, input=input_text)
+        return result.final_output.strip()
@@ -0,0 +1,132 @@
+"""
+Markdown rendering of repository analyses.
+
+Shared by the command-line interface, which prints the report, and the API,
+which returns it as a chat reply straight from the ``AnalysisResult``.
+"""
+
+from datetime import datetime
+from typing import Any, List
+
+# Analysis fields in display order; streamed sections use the same names
+SECTION_ORDER = ('summary', 'objectives', 'tech_stack', 'concepts',
+                 'key_components', 'architecture', 'recommendations')
+
+CATEGORY_ICONS = {
+    'language': '🔤',
+    'framework': '🏗️',
+    'algorithm': '⚙️',
+    'theory': '📚',
+    'networking': '🌐',
+    'io': '💾',
+    'computation': '🖥️',
+    'data_structure': '📊',
+    'design_pattern': '🎨',
+    'security': '🔒',
+    'testing': '🧪',
+    'other': '🔧'
+}
+
+
+def _join(lines: List[str]) -> str:
+    """Join report lines, each ending in a newline."""
+    return "".join(f"{line}\n" for line in lines)
+
+
+def format_repository_info(metadata) -> str:
+    """Render the repository information block of an analysis."""
+    # Format the timestamp to be human-readable
+    try:
+        analysis_time = datetime.fromisoformat(metadata.analysis_timestamp.replace('Z', '+00:00'))
+        formatted_time = analysis_time.strftime('%Y-%m-%d %H:%M:%S UTC')
+    except (AttributeError, ValueError):
+        formatted_time = metadata.analysis_timestamp
+
+    lines = [
+        "## Repository Information\n",
+        f"**URL:** {metadata.repo_url}  ",
+        f"**Branch:** {metadata.ref}  ",
+        f"**Files Analyzed:** {metadata.analyzed_files}/{metadata.total_files}  ",
+    ]
+    if metadata.dropped_files:
+        lines.append(f"**Files Skipped:** {len(metadata.dropped_files)} duplicate or generated  ")
+    lines.append(f"**Total Lines:** {metadata.total_lines:,}  ")
+    lines.append(f"**Analysis Time:** {formatted_time}\n")
+    return _join(lines)
+
+
+def format_section(name: str, value: Any) -> str:
+    """Render one analysis section; empty sections other than the summary render as ''."""
+    lines = []
+    if name == 'summary':
+        lines.append("## 📝 Summary\n")
+        lines.append(f"{value}\n")
+
+    elif name == 'objectives' and value:
+        lines.append("## 🎯 Objectives\n")
+        lines.extend(f"{i}. {obj}" for i, obj in enumerate(value, 1))
+        lines.append("")
+
+    elif name == 'tech_stack' and value:
+        lines.append("## 🛠️ Technology Stack\n")
+        lines.append(", ".join(f"`{tech}`" for tech in value))
+        lines.append("\n")
+
+    elif name == 'concepts' and value:
+        lines.append("## 🧠 Concepts Identified\n")
+        # Group concepts by category
+        concepts_by_category = {}
+        for concept in value:
+            concepts_by_category.setdefault(concept.get('category', 'other'), []).append(concept)
+
+        for category, concepts in sorted(concepts_by_category.items()):
+            icon = CATEGORY_ICONS.get(category, '•')
+            category_display = category.replace('_', ' ').title()
+            lines.append(f"### {icon} {category_display}\n")
+            for concept in concepts[:3]:  # Show top 3 per category
+                importance = concept.get('importance', 'medium')
+                importance_icon = '🔥' if importance == 'high' else '⭐' if importance == 'medium' else '💡'
+                lines.append(f"- **{importance_icon} {concept.get('name', 'Unknown')}:** "
+                             f"{concept.get('description', 'No description')}")
+            lines.append("")
+
+    elif name == 'key_components' and value:
+        lines.append("## 🔧 Key Components\n")
+        for comp in value[:5]:  # Show top 5
+            comp_name = comp.get('name', 'Unknown')
+            comp_type = comp.get('type', 'Unknown')
+            comp_purpose = comp.get('purpose', 'No description')
+            lines.append(f"- **{comp_name}** (`{comp_type}`) - {comp_purpose}")
+        lines.append("")
+
+    elif name == 'architecture' and value:
+        lines.append("## 🏗️ Architecture\n")
+        if 'pattern' in value:
+            lines.append(f"**Pattern:** {value['pattern']}  ")
+        if 'layers' in value:
+            lines.append(f"**Layers:** {', '.join(value['layers'])}")
+        lines.append("")
+
+    elif name == 'recommendations' and value:
+        lines.append("## 💡 Recommendations\n")
+        lines.extend(f"{i}. {rec}" for i, rec in enumerate(value, 1))
+        lines.append("")
+
+    return _join(lines)
+
+
+def format_file_types(metadata) -> str:
+    """Render the file type distribution table of an analysis."""
+    lines = ["## 📁 File Type Distribution\n", "| Extension | Count |", "|-----------|-------|"]
+    for ext, count in sorted(metadata.file_types.items(), key=lambda x: x[1], reverse=True)[:10]:
+        lines.append(f"| `{ext}` | {count} |")
+    lines.append("")
+    return _join(lines)
+
+
+def format_analysis(result) -> str:
+    """Render a complete AnalysisResult as a markdown report."""
+    parts = ["# 📊 Repository Analysis\n\n", format_repository_info(result.repository_metadata)]
+    parts.extend(format_section(name, getattr(result, name)) for name in SECTION_ORDER)
+    parts.append(format_file_types(result.repository_metadata))
+    return "".join(parts)
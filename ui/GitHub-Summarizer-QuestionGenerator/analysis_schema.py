@@ -0,0 +1,141 @@
+"""
+Typed output schema for the analysis agent.
+
+The analysis agent answers with an ``AnalysisOutput``, so its response is
+validated structurally instead of being grepped out of free text. Output that
+fails validation is handed back as ``MalformedOutput`` rather than raised, so
+the analyzer can repair just the broken part with a small follow-up call.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model, field_validator
+from agents import AgentOutputSchema
+from agents.exceptions import ModelBehaviorError
+
+logger = logging.getLogger(__name__)
+
+CONCEPT_CATEGORIES = ("language", "framework", "algorithm", "theory", "networking", "io", "computation",
+                      "data_structure", "design_pattern", "security", "testing", "other")
+IMPORTANCE_LEVELS = ("high", "medium", "low")
+
+
+class Architecture(BaseModel):
+    """Architecture section of an analysis."""
+    model_config = ConfigDict(extra="allow")
+
+    pattern: str = ""
+    layers: List[str] = Field(default_factory=list)
+    key_directories: Dict[str, str] = Field(default_factory=dict)
+
+
+class KeyComponent(BaseModel):
+    """One key component of the codebase."""
+    model_config = ConfigDict(extra="allow")
+
+    name: str
+    type: str = ""
+    purpose: str = ""
+    location: str = ""
+
+
+class Concept(BaseModel):
+    """A technical concept identified in the code."""
+    model_config = ConfigDict(extra="allow")
+
+    name: str
+    category: str = "other"
+    description: str = ""
+    examples: List[str] = Field(default_factory=list)
+    importance: str = "medium"
+
+    # Free-form labels are folded into the known sets rather than rejected
+    @field_validator("category", mode="before")
+    @classmethod
+    def _known_category(cls, value: Any) -> str:
+        value = str(value or "other").strip().lower().replace(" ", "_")
+        return value if value in CONCEPT_CATEGORIES else "other"
+
+    @field_validator("importance", mode="before")
+    @classmethod
+    def _known_importance(cls, value: Any) -> str:
+        value = str(value or "medium").strip().lower()
+        return value if value in IMPORTANCE_LEVELS else "medium"
+
+
+class AnalysisOutput(BaseModel):
+    """The model's analysis; mirrors the analysis fields of ``AnalysisResult``."""
+    summary: str = Field(min_length=1)
+    objectives: List[str] = Field(default_factory=list)
+    architecture: Architecture = Field(default_factory=Architecture)
+    key_components: List[KeyComponent] = Field(default_factory=list)
+    tech_stack: List[str] = Field(default_factory=list)
+    concepts: List[Concept] = Field(default_factory=list)
+    complexity_score: Optional[int] = Field(default=None, ge=1, le=10)
+    recommendations: List[str] = Field(default_factory=list)
+
+
+# Any subset of the analysis fields; the answer to a repair request
+AnalysisPatch = create_model(
+    "AnalysisPatch",
+    **{name: (Optional[field.annotation], None) for name, field in AnalysisOutput.model_fields.items()}
+)
+
+
+class AnalysisOutputError(ValueError):
+    """The model's output could not be turned into a valid analysis."""
+
+
+@dataclass
+class MalformedOutput:
+    """Model output that failed schema validation, kept for repair."""
+    text: str
+    error: str
+
+
+class LenientOutputSchema(AgentOutputSchema):
+    """Output schema that returns ``MalformedOutput`` instead of failing the run."""
+
+    def validate_json(self, json_str: str) -> Any:
+        try:
+            return super().validate_json(json_str)
+        except ModelBehaviorError as e:
+            return MalformedOutput(json_str, str(e.__cause__ or e))
+
+
+def output_schema(output_type: type) -> LenientOutputSchema:
+    """Agent ``output_type`` for a schema; optional fields and free-form dicts need non-strict mode."""
+    return LenientOutputSchema(output_type, strict_json_schema=False)
+
+
+def extract_json_object(text: str) -> Optional[Dict]:
+    """The outermost JSON object in ``text`` (e.g. inside a code fence), or None."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def validate_analysis(data: Dict) -> Tuple[Optional[AnalysisOutput], Dict[str, str]]:
+    """
+    Validate decoded analysis JSON.
+
+    Returns:
+        (analysis, {}) when valid, otherwise (None, {field: error message})
+        for every top-level field that failed
+    """
+    try:
+        return AnalysisOutput.model_validate(data), {}
+    except ValidationError as e:
+        errors: Dict[str, str] = {}
+        for error in e.errors():
+            field = str(error["loc"][0]) if error["loc"] else "__root__"
+            errors.setdefault(field, error["msg"])
+        return None, errors
@@ -0,0 +1,593 @@
+"""
+SQLite storage for analysis results.
+
+Keeps one connection per thread for the life of the store instead of opening
+a connection per call, runs the database in WAL mode so readers never wait on
+a writer, and stores each analysis as a zlib-compressed JSON blob. Repository
+metadata lives once in its own column and the raw model response in a
+separate compressed blob, so neither is duplicated inside the analysis.
+
+The schema is versioned with ``PRAGMA user_version``; older databases are
+migrated in place when a store is opened.
+"""
+
+import json
+import zlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds a connection waits for another process's write lock
+BUSY_TIMEOUT = 30.0
+
+COMPRESSION_LEVEL = 6
+
+# Columns a stored analysis can be looked up by
+LOOKUP_KEYS = ("commit_sha", "tree_sha", "repo_hash")
+
+# Full-text indexed fields and their bm25 weights
+SEARCH_COLUMNS = (("summary", 1.0), ("objectives", 1.0), ("tech_stack", 2.0),
+                  ("concepts", 1.0), ("components", 1.5))
+
+
+def _fts5_available() -> bool:
+    """Whether the linked SQLite library was built with FTS5."""
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+FTS5_AVAILABLE = _fts5_available()
+
+
+def compress_json(value: Any) -> bytes:
+    """Serialize a value to compact JSON and compress it."""
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode(), COMPRESSION_LEVEL)
+
+
+def decompress_json(blob) -> Any:
+    """Inverse of ``compress_json``; also accepts legacy uncompressed JSON text."""
+    if isinstance(blob, str):
+        return json.loads(blob)
+    return json.loads(zlib.decompress(blob))
+
+
+def search_document(analysis: Dict) -> tuple:
+    """Text of an analysis for each of SEARCH_COLUMNS."""
+    concepts = [f"{concept.get('name', '')}: {concept.get('description', '')}"
+                for concept in analysis.get("concepts") or [] if isinstance(concept, dict)]
+    components = [component.get("name", "") for component in analysis.get("key_components") or []
+                  if isinstance(component, dict)]
+    return (
+        analysis.get("summary") or "",
+        "\n".join(map(str, analysis.get("objectives") or [])),
+        ", ".join(map(str, analysis.get("tech_stack") or [])),
+        "\n".join(concepts),
+        ", ".join(components),
+    )
+
+
+def normalize_name(name: str) -> str:
+    """Grouping key for technology and concept names: case and spacing folded."""
+    return " ".join(str(name).split()).lower()
+
+
+def _write_normalized(conn: sqlite3.Connection, repo_hash: str, analysis: Dict):
+    """Replace the technology and concept rows of one analysis."""
+    conn.execute("DELETE FROM analysis_technologies WHERE repo_hash = ?", (repo_hash,))
+    conn.execute("DELETE FROM analysis_concepts WHERE repo_hash = ?", (repo_hash,))
+    conn.executemany("""
+        INSERT OR IGNORE INTO analysis_technologies (repo_hash, technology, technology_key)
+        VALUES (?, ?, ?)
+    """, [(repo_hash, str(tech).strip(), normalize_name(tech))
+          for tech in analysis.get("tech_stack") or [] if normalize_name(tech)])
+    conn.executemany("""
+        INSERT OR IGNORE INTO analysis_concepts (repo_hash, concept, concept_key, category, importance)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(repo_hash, str(concept["name"]).strip(), normalize_name(concept["name"]),
+           concept.get("category") or "other", concept.get("importance"))
+          for concept in analysis.get("concepts") or []
+          if isinstance(concept, dict) and normalize_name(concept.get("name") or "")])
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query matching all of its terms.
+
+    Every term is quoted so punctuation such as ``C++`` or ``node.js`` is not
+    read as query syntax; a trailing ``*`` keeps prefix matching.
+    """
+    terms = []
+    for term in text.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _create_legacy_table(conn: sqlite3.Connection):
+    """Version 1: the original table plus the content key columns."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS repository_analyses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            repo_hash TEXT UNIQUE NOT NULL,
+            repo_url TEXT NOT NULL,
+            ref_branch TEXT NOT NULL,
+            subfolder TEXT,
+            analysis_timestamp TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            analysis_result TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(repository_analyses)")}
+    for column in ("commit_sha", "tree_sha", "settings_hash"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE repository_analyses ADD COLUMN {column} TEXT")
+
+
+def _compress_results(conn: sqlite3.Connection):
+    """
+    Version 2: compressed analysis and raw response blobs.
+
+    Rebuilds the table, moving ``raw_response`` out of the analysis JSON into
+    its own column and dropping the copy of the metadata.
+    """
+    conn.execute("""
+        CREATE TABLE repository_analyses_v2 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            repo_hash TEXT UNIQUE NOT NULL,
+            repo_url TEXT NOT NULL,
+            ref_branch TEXT NOT NULL,
+            subfolder TEXT,
+            analysis_timestamp TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            analysis_result BLOB NOT NULL,
+            raw_response BLOB,
+            created_at TEXT NOT NULL,
+            commit_sha TEXT,
+            tree_sha TEXT,
+            settings_hash TEXT
+        )
+    """)
+    rows = conn.execute("""
+        SELECT id, repo_hash, repo_url, ref_branch, subfolder, analysis_timestamp, metadata,
+               analysis_result, created_at, commit_sha, tree_sha, settings_hash
+        FROM repository_analyses
+    """)
+    for row in rows.fetchall():
+        analysis = json.loads(row[7])
+        analysis.pop("repository_metadata", None)
+        raw_response = analysis.pop("raw_response", None)
+        conn.execute("""
+            INSERT INTO repository_analyses_v2
+            (id, repo_hash, repo_url, ref_branch, subfolder, analysis_timestamp, metadata,
+             analysis_result, raw_response, created_at, commit_sha, tree_sha, settings_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (*row[:7], compress_json(analysis),
+              None if raw_response is None else zlib.compress(raw_response.encode(), COMPRESSION_LEVEL),
+              *row[8:]))
+    conn.execute("DROP TABLE repository_analyses")
+    conn.execute("ALTER TABLE repository_analyses_v2 RENAME TO repository_analyses")
+    for name, column in (("idx_repo_hash", "repo_hash"), ("idx_repo_url", "repo_url"),
+                         ("idx_subfolder", "subfolder"), ("idx_commit_sha", "commit_sha"),
+                         ("idx_tree_sha", "tree_sha")):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON repository_analyses({column})")
+
+
+def _index_history(conn: sqlite3.Connection):
+    """
+    Version 3: indexes serving newest-first history pages.
+
+    ``(repo_url, created_at)`` also covers lookups by URL alone, so the old
+    single-column index is dropped.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_repo_url_created ON repository_analyses(repo_url, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON repository_analyses(created_at)")
+    conn.execute("DROP INDEX IF EXISTS idx_repo_url")
+
+
+def _create_search_index(conn: sqlite3.Connection):
+    """
+    Version 4: full-text index over the analyses, keyed by row id.
+
+    Skipped when SQLite lacks FTS5; the index is then built the first time the
+    database is opened with an FTS5-enabled SQLite.
+    """
+    if not FTS5_AVAILABLE:
+        logger.warning("SQLite was built without FTS5; analysis search is disabled")
+        return
+    columns = ", ".join(name for name, _ in SEARCH_COLUMNS)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS analysis_search USING fts5({columns}, "
+                 "tokenize='porter unicode61')")
+    conn.execute("DELETE FROM analysis_search")
+    for row_id, blob in conn.execute("SELECT id, analysis_result FROM repository_analyses").fetchall():
+        conn.execute("INSERT INTO analysis_search (rowid, summary, objectives, tech_stack, concepts, components) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", (row_id, *search_document(decompress_json(blob))))
+
+
+def _create_normalized_tables(conn: sqlite3.Connection):
+    """Version 5: per-analysis technology and concept rows for aggregate queries."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_technologies (
+            repo_hash TEXT NOT NULL,
+            technology TEXT NOT NULL,
+            technology_key TEXT NOT NULL,
+            PRIMARY KEY (repo_hash, technology_key)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_concepts (
+            repo_hash TEXT NOT NULL,
+            concept TEXT NOT NULL,
+            concept_key TEXT NOT NULL,
+            category TEXT NOT NULL,
+            importance TEXT,
+            PRIMARY KEY (repo_hash, category, concept_key)
+        ) WITHOUT ROWID
+    """)
+    # Covering indexes: aggregates are answered from the index alone
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_technology_key "
+                 "ON analysis_technologies(technology_key, technology)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_concept_category "
+                 "ON analysis_concepts(category, concept_key, concept, importance)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_concept_key "
+                 "ON analysis_concepts(concept_key, concept, category, importance)")
+    for repo_hash, blob in conn.execute("SELECT repo_hash, analysis_result FROM repository_analyses").fetchall():
+        _write_normalized(conn, repo_hash, decompress_json(blob))
+
+
+def _index_history_cursor(conn: sqlite3.Connection):
+    """
+    Version 6: history indexes ending in ``id``.
+
+    History pages are ordered by ``(created_at, id)`` so rows stored within the
+    same timestamp are neither skipped nor repeated between pages.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_repo_url_created_id "
+                 "ON repository_analyses(repo_url, created_at, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at_id ON repository_analyses(created_at, id)")
+    conn.execute("DROP INDEX IF EXISTS idx_repo_url_created")
+    conn.execute("DROP INDEX IF EXISTS idx_created_at")
+
+
+# Schema migrations; after applying MIGRATIONS[i] the database is at version i + 1
+MIGRATIONS = (_create_legacy_table, _compress_results, _index_history, _create_search_index,
+              _create_normalized_tables, _index_history_cursor)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+class AnalysisStore:
+    """Thread-safe store of analysis results backed by one SQLite file."""
+
+    def __init__(self, db_path: str):
+        """
+        Open the store, creating or migrating the database as needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._migrate()
+
+    def _connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; multi-statement writes use an explicit transaction
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps the database consistent with NORMAL; only the last
+            # commits can be lost on power failure
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one write transaction on this thread's connection."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate(self):
+        """Bring the database schema up to SCHEMA_VERSION."""
+        with self._transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            self.search_enabled = FTS5_AVAILABLE
+            if version >= SCHEMA_VERSION:
+                if FTS5_AVAILABLE and not self._has_table(conn, "analysis_search"):
+                    _create_search_index(conn)
+                return
+            rewritten = version == 0 and self._has_table(conn, "repository_analyses")
+            for migration in MIGRATIONS[version:]:
+                migration(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        logger.info(f"Migrated {self.db_path} from schema version {version} to {SCHEMA_VERSION}")
+        if rewritten:
+            # Give the space of the rewritten rows back to the file system
+            self._connection().execute("VACUUM")
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+        """Whether the database has a table of this name."""
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+    def save(self, analysis: Dict, settings_hash: Optional[str] = None,
+             created_at: Optional[str] = None):
+        """
+        Store an analysis, replacing any earlier one with the same repo hash.
+
+        Args:
+            analysis: Analysis as a dictionary with ``repository_metadata`` and ``raw_response``
+            settings_hash: Hash of the analyzer settings that produced it
+            created_at: Storage timestamp (ISO 8601, default now)
+        """
+        analysis = dict(analysis)
+        metadata = analysis.pop("repository_metadata")
+        raw_response = analysis.pop("raw_response", None)
+        with self._transaction() as conn:
+            if self.search_enabled:
+                # The replaced row's id goes away with it, so drop its index entry too
+                conn.execute("""
+                    DELETE FROM analysis_search WHERE rowid IN
+                    (SELECT id FROM repository_analyses WHERE repo_hash = ?)
+                """, (metadata["repo_hash"],))
+            row_id = conn.execute("""
+                INSERT OR REPLACE INTO repository_analyses
+                (repo_hash, repo_url, ref_branch, subfolder, analysis_timestamp, metadata, analysis_result,
+                 raw_response, created_at, commit_sha, tree_sha, settings_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                metadata["repo_hash"],
+                metadata["repo_url"],
+                metadata["ref"],
+                metadata.get("subfolder"),
+                metadata["analysis_timestamp"],
+                json.dumps(metadata),
+                compress_json(analysis),
+                None if raw_response is None else zlib.compress(raw_response.encode(), COMPRESSION_LEVEL),
+                created_at or datetime.now(timezone.utc).isoformat(),
+                metadata.get("commit_sha"),
+                metadata.get("tree_sha"),
+                settings_hash
+            )).lastrowid
+            _write_normalized(conn, metadata["repo_hash"], analysis)
+            if self.search_enabled:
+                conn.execute("INSERT INTO analysis_search (rowid, summary, objectives, tech_stack, concepts, components) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", (row_id, *search_document(analysis)))
+
+    def _decode(self, row) -> Dict:
+        """Rebuild an analysis dictionary from (metadata, analysis_result, raw_response)."""
+        analysis = decompress_json(row[1])
+        analysis["repository_metadata"] = json.loads(row[0])
+        analysis["raw_response"] = zlib.decompress(row[2]).decode() if row[2] is not None else ""
+        return analysis
+
+    def get(self, repo_hash: str) -> Optional[Dict]:
+        """The analysis stored under a repo hash, if any."""
+        row = self._connection().execute("""
+            SELECT metadata, analysis_result, raw_response FROM repository_analyses
+            WHERE repo_hash = ?
+        """, (repo_hash,)).fetchone()
+        return self._decode(row) if row else None
+
+    def find(self, key: str, sha: str, subfolder: Optional[str],
+             settings_hash: Optional[str]) -> Optional[Dict]:
+        """
+        The latest analysis matching a lookup key, subfolder and settings.
+
+        Args:
+            key: Lookup column, one of LOOKUP_KEYS
+            sha: Value to match
+            subfolder: Subfolder the analysis must cover
+            settings_hash: Analyzer settings the analysis must have been made with
+        """
+        if key not in LOOKUP_KEYS:
+            raise ValueError(f"Unknown content key '{key}'")
+        row = self._connection().execute(f"""
+            SELECT metadata, analysis_result, raw_response FROM repository_analyses
+            WHERE {key} = ? AND subfolder IS ? AND settings_hash = ?
+            ORDER BY created_at DESC
+            LIMIT 1
+        """, (sha, subfolder, settings_hash)).fetchone()
+        return self._decode(row) if row else None
+
+    def iter_history(self, repo_url: Optional[str] = None, limit: Optional[int] = None,
+                     before: Optional[str] = None, since: Optional[str] = None,
+                     before_id: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Stream stored analyses, newest first.
+
+        Entries are ordered by ``(created_at, id)`` and pages are selected by
+        keyset rather than offset: pass the ``created_at`` and ``id`` of the
+        last entry of a page as ``before`` and ``before_id`` to get the next
+        one. Rows are read from the cursor as they are consumed.
+
+        Args:
+            repo_url: Only analyses of this repository URL
+            limit: Maximum entries to yield
+            before: Only analyses stored strictly before this ISO 8601 timestamp,
+                or at it with an id below ``before_id``
+            since: Only analyses stored at or after this ISO 8601 timestamp
+            before_id: Row id completing the ``before`` cursor
+        """
+        conditions, params = [], []
+        if repo_url:
+            conditions.append("repo_url = ?")
+            params.append(repo_url)
+        if before and before_id is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend((before, before_id))
+        elif before:
+            conditions.append("created_at < ?")
+            params.append(before)
+        if since:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        query = """
+            SELECT repo_url, ref_branch, subfolder, analysis_timestamp, created_at, id
+            FROM repository_analyses
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for row in self._connection().execute(query, params):
+            yield {
+                'repo_url': row[0],
+                'ref_branch': row[1],
+                'subfolder': row[2],
+                'analysis_timestamp': row[3],
+                'created_at': row[4],
+                'id': row[5]
+            }
+
+    def history(self, repo_url: Optional[str] = None, **page) -> List[Dict]:
+        """Stored analyses, newest first; takes the paging arguments of ``iter_history``."""
+        return list(self.iter_history(repo_url, **page))
+
+    def search(self, query: str, repo_url: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """
+        Rank stored analyses against a full-text query.
+
+        Args:
+            query: Free text; every term must match (``term*`` matches a prefix)
+            repo_url: Only search analyses of this repository URL
+            limit: Maximum hits to return
+
+        Returns:
+            Hits, best first, with the repository, the matching field's
+            ``snippet`` (matches in ``[brackets]``) and the bm25 ``score``
+            (lower is better)
+        """
+        if not self.search_enabled:
+            raise RuntimeError("Analysis search needs an SQLite library built with FTS5")
+        match = fts_query(query)
+        if not match:
+            return []
+        weights = ", ".join(str(weight) for _, weight in SEARCH_COLUMNS)
+        sql = f"""
+            SELECT a.repo_url, a.ref_branch, a.subfolder, a.analysis_timestamp, a.created_at, a.repo_hash,
+                   snippet(analysis_search, -1, '[', ']', '...', 12),
+                   bm25(analysis_search, {weights}) AS score
+            FROM analysis_search
+            JOIN repository_analyses a ON a.id = analysis_search.rowid
+            WHERE analysis_search MATCH ?
+        """
+        params = [match]
+        if repo_url:
+            sql += " AND a.repo_url = ?"
+            params.append(repo_url)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        return [
+            {
+                'repo_url': row[0],
+                'ref_branch': row[1],
+                'subfolder': row[2],
+                'analysis_timestamp': row[3],
+                'created_at': row[4],
+                'repo_hash': row[5],
+                'snippet': row[6],
+                'score': row[7]
+            }
+            for row in self._connection().execute(sql, params)
+        ]
+
+    def top_technologies(self, limit: int = 20) -> List[Dict]:
+        """
+        Technologies used by the most stored analyses.
+
+        Names are grouped case-insensitively and reported in their first
+        spelling in sort order.
+
+        Returns:
+            Dictionaries with ``technology`` and ``analyses`` (count), most used first
+        """
+        cursor = self._connection().execute("""
+            SELECT MIN(technology), COUNT(*) AS analyses
+            FROM analysis_technologies
+            GROUP BY technology_key
+            ORDER BY analyses DESC, technology_key
+            LIMIT ?
+        """, (limit,))
+        return [{'technology': row[0], 'analyses': row[1]} for row in cursor]
+
+    def top_concepts(self, limit: int = 20, category: Optional[str] = None) -> List[Dict]:
+        """
+        Concepts identified in the most stored analyses.
+
+        Args:
+            limit: Maximum concepts to return
+            category: Only concepts of this category (e.g. "algorithm")
+
+        Returns:
+            Dictionaries with ``concept``, ``category``, ``analyses`` and
+            ``high_importance`` (analyses rating it high), most common first
+        """
+        query = """
+            SELECT MIN(concept), category, COUNT(*) AS analyses, SUM(importance = 'high')
+            FROM analysis_concepts
+        """
+        params = []
+        if category:
+            query += " WHERE category = ?"
+            params.append(category)
+        query += """
+            GROUP BY category, concept_key
+            ORDER BY analyses DESC, concept_key
+            LIMIT ?
+        """
+        params.append(limit)
+        return [{'concept': row[0], 'category': row[1], 'analyses': row[2], 'high_importance': row[3]}
+                for row in self._connection().execute(query, params)]
+
+    def analyses_using(self, technology: str) -> List[Dict]:
+        """Stored analyses whose tech stack includes a technology (any casing), newest first."""
+        cursor = self._connection().execute("""
+            SELECT a.repo_url, a.ref_branch, a.subfolder, a.analysis_timestamp, a.created_at
+            FROM analysis_technologies t
+            JOIN repository_analyses a ON a.repo_hash = t.repo_hash
+            WHERE t.technology_key = ?
+            ORDER BY a.created_at DESC
+        """, (normalize_name(technology),))
+        return [
+            {
+                'repo_url': row[0],
+                'ref_branch': row[1],
+                'subfolder': row[2],
+                'analysis_timestamp': row[3],
+                'created_at': row[4]
+            }
+            for row in cursor
+        ]
+
+    def close(self):
+        """Close the connections of all threads."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -1,26 +1,32 @@
 # api.py
 import os
 import asyncio
+import json
 import re
-import subprocess
 import sys
-import httpx
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Key is loaded
 load_dotenv()
 
-from agents import Agent, Runner  # from openai-agents
-from gemini_helper import GeminiAgent, run_gemini_agent
+from agent_registry import AgentRegistry
 from imessage_sender import send_imessage_async
+from github_analyzer import RepositoryAnalyzer
+from analysis_report import format_analysis
+from job_queue import DEFAULT_JOB_WORKERS, JobFailed, JobQueue, JobQueueFull
+from trends_cache import TrendsCache
+from http_clients import ClientRegistry
 
 # Add bot directory to path for imports
-sys.path.insert(0, os.path.join(os.pathm.dirname(__file__), '..', '..', 'bot'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'bot'))
 try:
     from github_importer import import_repo
     from mcq_generator import generate_mcqs_for_repo
@@ -30,7 +36,26 @@ except ImportError:
     CODE_TUTOR_AVAILABLE = False
     print("Warning: code_tutor modules not available. Code-based MCQs will be disabled.")
 
-app = FastAPI()
+# Outbound HTTP clients (OpenAI, X API), pooled for the lifetime of the app
+_http_clients = ClientRegistry()
+
+# Agents with fixed instructions, shared by all requests
+agent_registry = AgentRegistry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the outbound HTTP clients, build the shared agents and keep the AI trends cache warm."""
+    await _http_clients.start()
+    agent_registry.warm()
+    refresher = asyncio.create_task(_trends_cache.run_refresher())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        await asyncio.gather(refresher, return_exceptions=True)
+        await _http_clients.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -65,6 +90,30 @@ class ChallengeQuestion(BaseModel):
 class ChallengeResponse(BaseModel):
     questions: List[ChallengeQuestion]
 
+# Background job models
+class AnalyzeJobRequest(BaseModel):
+    repo_url: str
+    ref: str = "main"
+    subfolder: Optional[str] = None
+    force_refresh: bool = False
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    coalesced: bool  # True when an identical in-flight job was joined
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str  # "queued", "running", "succeeded" or "failed"
+    stage: Optional[str] = None
+    submissions: int
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Any] = None
+
 # X API Models
 class ProductEngagement(BaseModel):
     likes: int
@@ -132,16 +181,6 @@ class ScheduleDailyChallengeResponse(BaseModel):
     prompt: str
     hint: Optional[str] = None
 
-code_coach = Agent(
-    name="Tutor",
-    instructions="You are a helpful programming and coding assistant. You provide general coding advice, explanations, and help with programming concepts. WRAP ALL MATH in Mathjax and all CODE in ````` (code ticks)"
-)
-assistant = Agent(
-    name="App assistant",
-    instructions="You are a helpful programming and coding assistant. You provide general coding advice, explanations, and help with programming concepts. WRAP ALL MATH in Mathjax and all CODE in ````` (code ticks)",
-    handoffs=[code_coach]
-)
-
 
 def detect_github_url(text: str) -> Optional[str]:
     """Detect GitHub repository URL in text."""
@@ -156,42 +195,62 @@ def detect_github_url(text: str) -> Optional[str]:
         return f"https://github.com/{username}/{repo}"
     return None
 
+_repository_analyzer: Optional[RepositoryAnalyzer] = None
+
+def get_repository_analyzer() -> RepositoryAnalyzer:
+    """Shared in-process analyzer; its store and mirror cache are reused across requests."""
+    global _repository_analyzer
+    if _repository_analyzer is None:
+        _repository_analyzer = RepositoryAnalyzer(show_progress=False)
+    return _repository_analyzer
+
 async def analyze_github_repository(repo_url: str) -> str:
-    """Analyze a GitHub repository using CLI analyzer with clean output."""
+    """
+    Analyze a GitHub repository in-process and render the result as markdown.
+    
+    Runs as an analysis job on the event loop without blocking it: clones and
+    model calls are awaited and file and database work runs on the analyzer's
+    thread pool, so other requests are served while a repository is analyzed.
+    Concurrent requests for the same repository share one job, and a stored
+    analysis of the same commit is returned without a model call.
+    """
     try:
-        # Call the CLI analyzer directly with suppressed progress
-        result = subprocess.run([
-            'python3', 'cli_analyzer.py', 'analyze', repo_url
-        ],
-        capture_output=True,
-        text=True,
-        cwd='.',
-        env={**os.environ, 'SUPPRESS_PROGRESS': '1'}  # Signal to suppress progress
-        )
-        
-        if result.returncode == 0:
-            # Clean up the output - remove progress indicators
-            output = result.stdout
-            
-            # Remove spinner characters and progress bars
-            import re
-            # Remove lines with spinners (⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏)
-            output = re.sub(r'[⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏]\s.*?\n', '', output)
-            # Remove progress bar lines
-            output = re.sub(r'Loading file contents:.*?\n', '', output)
-            # Remove success checkmarks from progress
-            output = re.sub(r'✓\sLoaded.*?\n', '', output)
-            # Remove empty lines at the start
-            output = output.lstrip('\n')
-            
-            return output
-        else:
-            # Handle error case
-            error_msg = result.stderr if result.stderr else "Unknown error occurred"
-            return f"❌ **Error analyzing repository {repo_url}:**\n\nI couldn't analyze this repository. This could be due to:\n• Invalid or inaccessible repository URL\n• Repository is private\n• Network connectivity issues\n• Repository is too large or has unusual structure\n\nError details: {error_msg}\n\nPlease check the URL and try again with a public repository."
-        
+        job, _ = submit_analysis_job(repo_url)
+        result = await get_job_queue().wait(job.id)
+        return result["report"]
     except Exception as e:
-        return f"❌ **Error running repository analysis:**\n\nThere was a problem executing the analysis tool.\n\nError details: {str(e)}"
+        return f"❌ **Error analyzing repository {repo_url}:**\n\nI couldn't analyze this repository. This could be due to:\n• Invalid or inaccessible repository URL\n• Repository is private\n• Network connectivity issues\n• Repository is too large or has unusual structure\n\nError details: {e}\n\nPlease check the URL and try again with a public repository."
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/analyze/stream")
+async def stream_repository_analysis(repo_url: str, ref: str = "main", subfolder: Optional[str] = None,
+                                     force_refresh: bool = False):
+    """
+    Analyze a repository, streaming progress as Server-Sent Events.
+    
+    Emits ``stage``, ``token`` and ``section`` events while the model writes
+    the analysis, then one ``result`` event with the stored analysis (without
+    the raw response), or an ``error`` event.
+    """
+    analyzer = get_repository_analyzer()
+    
+    async def events():
+        try:
+            async for event in analyzer.stream_analysis(repo_url, ref, subfolder, force_refresh):
+                kind = event.pop("event")
+                if kind == "result":
+                    analysis = asdict(event["analysis"])
+                    analysis.pop("raw_response", None)
+                    event["analysis"] = analysis
+                yield sse_event(kind, event)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
@@ -207,18 +266,12 @@ async def chat(req: ChatRequest):
         use_gemini = req.model == "gemini"
         
         if use_gemini:
-            # Use Gemini
-            gemini_agent = GeminiAgent(
-                name="Tutor",
-                instructions="You are a helpful programming and coding assistant. You provide general coding advice, explanations, and help with programming concepts. WRAP ALL MATH in Mathjax and all CODE in ````` (code ticks)"
-            )
-            
-            # Build conversation history for Gemini
+            # Use Gemini with the conversation history
             history = []
             if req.history:
                 history = [{"role": msg.role, "content": msg.content} for msg in req.history[-8:]]
             
-            result = await run_gemini_agent(gemini_agent, req.message, history)
+            result = await agent_registry.run("tutor", req.message, model="gemini", history=history)
             return ChatResponse(reply=result)
         else:
             # Use OpenAI (default)
@@ -235,15 +288,29 @@ async def chat(req: ChatRequest):
             # Join into conversation context
             conversation_context = "\n".join(messages)
             
-            result = await Runner.run(
-                starting_agent=assistant,
-                input=conversation_context,
-            )
+            result = await agent_registry.run("assistant", conversation_context)
             
-            return ChatResponse(reply=result.final_output)
+            return ChatResponse(reply=result)
 
 @app.post("/challenge", response_model=ChallengeResponse)
 async def generate_challenge(req: ChallengeRequest):
+    """
+    Generate challenge questions based on a topic or GitHub repository.
+    
+    Repository challenges run as jobs, so concurrent requests for the same
+    repository share one clone and one set of model calls.
+    """
+    if not detect_github_url(req.topic):
+        return await build_challenge(req)
+    try:
+        job, _ = submit_challenge_job(req)
+        return ChallengeResponse(**await get_job_queue().wait(job.id))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many jobs waiting, try again later: {e}")
+    except JobFailed as e:
+        raise HTTPException(status_code=500, detail=f"Challenge generation failed: {e}")
+
+async def build_challenge(req: ChallengeRequest) -> ChallengeResponse:
     """Generate challenge questions based on a topic or GitHub repository using AI or code analysis."""
     try:
         # Check if topic is a GitHub URL - if so, use code_tutor MCQ generation
@@ -259,10 +326,10 @@ async def generate_challenge(req: ChallengeRequest):
             temp_dir = None
             try:
                 # Import/clone the repository
-                temp_dir = import_repo(github_url)
+                temp_dir = await asyncio.to_thread(import_repo, github_url)
                 
                 # Generate MCQs from the repo using multi-language generator (mode 1 = Code Detective)
-                mcqs = generate_mcqs_for_multilang_repo(temp_dir, mode=1, max_q=5)
+                mcqs = await asyncio.to_thread(generate_mcqs_for_multilang_repo, temp_dir, mode=1, max_q=5)
                 
                 if not mcqs:
                     raise ValueError("No code files found in repository to generate questions from")
@@ -274,23 +341,9 @@ async def generate_challenge(req: ChallengeRequest):
                     # Check if this is an AI-powered question template
                     if mcq.get('type') == 'ai_powered':
                         # Use AI to generate the complete question
-                        use_gemini = req.model == "gemini"
-                        
                         try:
-                            if use_gemini:
-                                ai_agent = GeminiAgent(
-                                    name="Code Question Generator",
-                                    instructions="You are an expert coding educator. Generate educational multiple-choice questions about code."
-                                )
-                                result_text = await run_gemini_agent(ai_agent, mcq['prompt_template'])
-                                response_text = result_text.strip()
-                            else:
-                                ai_agent = Agent(
-                                    name="Code Question Generator",
-                                    instructions="You are an expert coding educator. Generate educational multiple-choice questions about code."
-                                )
-                                result = await Runner.run(starting_agent=ai_agent, input=mcq['prompt_template'])
-                                response_text = result.final_output.strip()
+                            response_text = await agent_registry.run("code_question", mcq['prompt_template'],
+                                                                     model=req.model)
                             
                             # Parse AI response
                             json_match = re.search(r'\{[\s\S]*\}', response_text)
@@ -314,65 +367,14 @@ async def generate_challenge(req: ChallengeRequest):
                     else:
                         # Handle traditional Python MCQs (complete questions)
                         # Use AI to generate multiple choice options
-                        use_gemini = req.model == "gemini"
-                        
-                        if use_gemini:
-                            options_agent = GeminiAgent(
-                                name="MCQ Options Generator",
-                                instructions=f"""You are an expert at creating challenging multiple-choice options for coding questions.
-
-Given a coding question and the correct answer, generate 3 plausible but incorrect options that would challenge students.
-
-The correct answer is: "{mcq['answer']}"
-
-The incorrect options should be:
-1. Plausible enough to seem correct at first glance
-2. Based on common misconceptions or mistakes
-3. Similar in style and length to the correct answer
-
-Format your response EXACTLY as valid JSON:
-{{
-  "incorrect_options": ["Option 1", "Option 2", "Option 3"]
-}}
-
-Return ONLY the JSON, no other text."""
-                            )
-                        else:
-                            options_agent = Agent(
-                                name="MCQ Options Generator",
-                                instructions=f"""You are an expert at creating challenging multiple-choice options for coding questions.
-
-Given a coding question and the correct answer, generate 3 plausible but incorrect options that would challenge students.
-
-The correct answer is: "{mcq['answer']}"
-
-The incorrect options should be:
-1. Plausible enough to seem correct at first glance
-2. Based on common misconceptions or mistakes
-3. Similar in style and length to the correct answer
-
-Format your response EXACTLY as valid JSON:
-{{
-  "incorrect_options": ["Option 1", "Option 2", "Option 3"]
-}}
-
-Return ONLY the JSON, no other text."""
-                            )
-                        
                         try:
                             # Run the agent to generate options
-                            if use_gemini:
-                                result_text = await run_gemini_agent(
-                                    options_agent,
-                                    f"Question: {mcq['question']}\n\nCode:\n{mcq.get('snippet', '')}\n\nGenerate 3 incorrect options."
-                                )
-                                response_text = result_text
-                            else:
-                                result = await Runner.run(
-                                    starting_agent=options_agent,
-                                    input=f"Question: {mcq['question']}\n\nCode:\n{mcq.get('snippet', '')}\n\nGenerate 3 incorrect options.",
-                                )
-                                response_text = result.final_output.strip()
+                            response_text = await agent_registry.run(
+                                "mcq_options",
+                                f"Question: {mcq['question']}\n\nCode:\n{mcq.get('snippet', '')}\n\n"
+                                f"The correct answer is: \"{mcq['answer']}\"\n\nGenerate 3 incorrect options.",
+                                model=req.model
+                            )
                             
                             # Parse AI response
                             json_match = re.search(r'\{[\s\S]*\}', response_text)
@@ -426,52 +428,8 @@ Return ONLY the JSON, no other text."""
                         pass  # Ignore cleanup errors
         
         # Fall back to AI-generated questions for general topics
-        use_gemini = req.model == "gemini"
-        
-        instructions = f"""You are an expert educator creating challenging multiple-choice questions.
-            
-Generate 3-5 high-quality multiple-choice questions about {req.topic}.
-
-For each question:
-1. Make it thought-provoking and educational
-2. Provide 4 options (A, B, C, D)
-3. Mark the correct answer
-4. Include a brief explanation
-
-Format your response EXACTLY as valid JSON:
-{{
-  "questions": [
-    {{
-      "question": "Question text here?",
-      "options": ["Option A", "Option B", "Option C", "Option D"],
-      "answer": "Option A",
-      "explanation": "Explanation here"
-    }}
-  ]
-}}
-
-Make sure to return ONLY the JSON, no other text."""
-        
-        if use_gemini:
-            challenge_agent = GeminiAgent(
-                name="Challenge Question Generator",
-                instructions=instructions
-            )
-            result_text = await run_gemini_agent(
-                challenge_agent,
-                f"Generate challenge questions about: {req.topic}"
-            )
-            response_text = result_text.strip()
-        else:
-            challenge_agent = Agent(
-                name="Challenge Question Generator",
-                instructions=instructions
-            )
-            result = await Runner.run(
-                starting_agent=challenge_agent,
-                input=f"Generate challenge questions about: {req.topic}",
-            )
-            response_text = result.final_output.strip()
+        response_text = await agent_registry.run(
+            "challenge", f"Generate challenge questions about: {req.topic}", model=req.model)
         
         # Parse the JSON response
         import json
@@ -541,115 +499,208 @@ Make sure to return ONLY the JSON, no other text."""
         ]
         return ChallengeResponse(questions=error_questions)
 
-# Cache for AI trends data
-_trends_cache = None
-_cache_timestamp = None
+async def run_analysis_job(params: Dict[str, Any], emit) -> Dict[str, Any]:
+    """Job handler: analyze a repository, reporting stage, token and section events."""
+    result = await get_repository_analyzer().analyze_repository_async(
+        params["repo_url"], params["ref"], params["subfolder"], params["force_refresh"], on_event=emit)
+    analysis = asdict(result)
+    analysis.pop("raw_response", None)
+    return {"report": format_analysis(result), "analysis": analysis}
+
+async def run_challenge_job(params: Dict[str, Any], emit) -> Dict[str, Any]:
+    """Job handler: generate challenge questions for a topic or repository."""
+    emit({"event": "stage", "stage": "Generating challenge questions"})
+    response = await build_challenge(ChallengeRequest(**params))
+    return response.model_dump()
+
+_job_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> JobQueue:
+    """Shared job queue; JOB_WORKERS sets how many jobs run at the same time."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue({"analyze": run_analysis_job, "challenge": run_challenge_job},
+                              workers=int(os.getenv("JOB_WORKERS", DEFAULT_JOB_WORKERS)))
+    return _job_queue
+
+def _normalize_repo_url(repo_url: str) -> str:
+    """Repository URL with spelling differences that name the same repository removed."""
+    repo_url = repo_url.strip().rstrip("/")
+    if repo_url.endswith(".git"):
+        repo_url = repo_url[:-4]
+    return repo_url.lower()
+
+def submit_analysis_job(repo_url: str, ref: str = "main", subfolder: Optional[str] = None,
+                        force_refresh: bool = False):
+    """
+    Queue a repository analysis, joining an in-flight one for the same repository, ref and subfolder.
+
+    Forced re-analyses only join other forced ones, so force_refresh is never
+    answered by a job that may serve a cached analysis.
+    """
+    params = {"repo_url": repo_url, "ref": ref, "subfolder": subfolder, "force_refresh": force_refresh}
+    key = (_normalize_repo_url(repo_url), ref, subfolder or "", force_refresh)
+    return get_job_queue().submit("analyze", params, key=key)
+
+def submit_challenge_job(req: ChallengeRequest):
+    """Queue challenge generation, joining an in-flight one for the same repository (or topic) and model."""
+    github_url = detect_github_url(req.topic)
+    subject = _normalize_repo_url(github_url) if github_url else req.topic.strip().lower()
+    return get_job_queue().submit("challenge", req.model_dump(), key=(subject, req.model))
+
+def _submitted(submission) -> JobSubmitResponse:
+    job, coalesced = submission
+    return JobSubmitResponse(job_id=job.id, status=job.status, coalesced=coalesced)
+
+@app.post("/jobs/analyze", response_model=JobSubmitResponse, status_code=202)
+async def submit_analysis(req: AnalyzeJobRequest):
+    """Start a repository analysis in the background and return its job id."""
+    try:
+        return _submitted(submit_analysis_job(req.repo_url, req.ref, req.subfolder, req.force_refresh))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many jobs waiting, try again later: {e}")
+
+@app.post("/jobs/challenge", response_model=JobSubmitResponse, status_code=202)
+async def submit_challenge(req: ChallengeRequest):
+    """Start challenge generation in the background and return its job id."""
+    try:
+        return _submitted(submit_challenge_job(req))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many jobs waiting, try again later: {e}")
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Status, current stage and, once finished, the result or error of a job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Follow a job as Server-Sent Events.
+    
+    Replays the job's ``status``, ``stage`` and ``section`` events so far,
+    then streams new ones (including ``token`` events) as they happen. Ends
+    with a ``status`` event for the finished job, followed by a ``result``
+    event when it succeeded.
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for event in queue.events(job_id):
+            data = dict(event)
+            yield sse_event(data.pop("event"), data)
+        if job.status == "succeeded":
+            yield sse_event("result", {"result": job.result})
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 CACHE_DURATION = timedelta(hours=6)  # Cache for 6 hours to conserve API quota
 
 @app.get("/ai-trends", response_model=AITrendsResponse)
 async def get_ai_trends():
-    """Fetch live AI product launches from X/Twitter API with caching."""
-    global _trends_cache, _cache_timestamp
+    """
+    AI product launches from X/Twitter, served from memory.
     
-    try:
-        # Check if cache is still valid
-        if _trends_cache and _cache_timestamp:
-            if datetime.now() - _cache_timestamp < CACHE_DURATION:
-                print("Returning cached AI trends data")
-                return _trends_cache
-        
-        # Get X API credentials from environment
-        bearer_token = os.getenv('X_BEARER_TOKEN')
-        
-        if not bearer_token:
-            # Return sample data if no API key configured
-            print("⚠️ X_BEARER_TOKEN not found in environment, using sample data")
-            sample_data = get_sample_ai_trends()
-            _trends_cache = sample_data
-            _cache_timestamp = datetime.now()
-            return sample_data
-        
-        # Validate token format (real tokens are typically 100+ characters)
-        if len(bearer_token) < 50:
-            print(f"⚠️ X_BEARER_TOKEN appears invalid (too short: {len(bearer_token)} chars). Expected 100+ characters.")
-            print("   Get a valid Bearer Token from: https://developer.twitter.com/en/portal/dashboard")
-            print("   Using sample data instead.")
-            sample_data = get_sample_ai_trends()
-            _trends_cache = sample_data
-            _cache_timestamp = datetime.now()
-            return sample_data
-        
-        print(f"✓ Using X API Bearer Token (length: {len(bearer_token)} chars)")
-        
-        # Enhanced search query for AI and tech launches - broader to get more results
-        search_query = (
-            "(AI OR machine learning OR LLM OR GPT OR neural network OR deep learning OR "
-            "framework OR library OR SDK OR API OR launch OR launching OR released OR "
-            "open source OR developer OR coding OR programming OR python OR javascript OR react OR nextjs OR "
-            "webdev OR startup OR SaaS) "
-            "-is:retweet -is:reply lang:en"
-        )
-        
-        # X API v2 endpoint
-        url = "https://api.twitter.com/2/tweets/search/recent"
-        
-        headers = {
-            "Authorization": f"Bearer {bearer_token}"
-        }
-        
-        params = {
-            "query": search_query,
-            "max_results": 25,  # Conservative for Free tier (100 tweets/month)
-            "tweet.fields": "created_at,public_metrics,author_id",
-            "expansions": "author_id",
-            "user.fields": "name,username,profile_image_url"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=15.0)
-            
-            if response.status_code != 200:
-                print(f"❌ X API Error (Status {response.status_code}):")
-                try:
-                    error_data = response.json()
-                    print(f"   {error_data}")
-                except:
-                    print(f"   {response.text}")
-                
-                # Return cached data or sample data on error
-                if _trends_cache:
-                    print("   Returning cached data instead")
-                    return _trends_cache
-                print("   Returning sample data instead")
-                return get_sample_ai_trends()
-            
-            data = response.json()
-            
-            # Parse tweets into AI products
-            products = parse_tweets_to_products(data)
-            
-            # Filter for quality/engagement - lowered threshold to show more results
-            products = [p for p in products if p.relevance_score >= 1][:25]
-            
-            result = AITrendsResponse(
-                products=products,
-                total_count=len(products),
-                last_updated=datetime.now().isoformat()
-            )
-            
-            # Cache the result
-            _trends_cache = result
-            _cache_timestamp = datetime.now()
-            
-            print(f"Fetched and cached {len(products)} AI trends from X API")
-            return result
-            
-    except Exception as e:
-        print(f"Error fetching AI trends: {e}")
-        # Return cached data if available, otherwise sample data
-        if _trends_cache:
-            return _trends_cache
+    The cache is refreshed in the background when it expires; requests get
+    the previous data meanwhile and never wait on the X API once it is warm.
+    """
+    trends = await _trends_cache.get()
+    return trends if trends is not None else get_sample_ai_trends()
+
+async def fetch_ai_trends() -> AITrendsResponse:
+    """
+    Fetch live AI product launches from the X/Twitter API.
+    
+    Returns sample data when no valid bearer token is configured.
+    
+    Raises:
+        RuntimeError: The X API answered with an error
+        httpx.HTTPError: The request failed or timed out
+    """
+    # Get X API credentials from environment
+    bearer_token = os.getenv('X_BEARER_TOKEN')
+    
+    if not bearer_token:
+        # Return sample data if no API key configured
+        print("⚠️ X_BEARER_TOKEN not found in environment, using sample data")
+        return get_sample_ai_trends()
+    
+    # Validate token format (real tokens are typically 100+ characters)
+    if len(bearer_token) < 50:
+        print(f"⚠️ X_BEARER_TOKEN appears invalid (too short: {len(bearer_token)} chars). Expected 100+ characters.")
+        print("   Get a valid Bearer Token from: https://developer.twitter.com/en/portal/dashboard")
+        print("   Using sample data instead.")
         return get_sample_ai_trends()
+    
+    print(f"✓ Using X API Bearer Token (length: {len(bearer_token)} chars)")
+    
+    # Enhanced search query for AI and tech launches - broader to get more results
+    search_query = (
+        "(AI OR machine learning OR LLM OR GPT OR neural network OR deep learning OR "
+        "framework OR library OR SDK OR API OR launch OR launching OR released OR "
+        "open source OR developer OR coding OR programming OR python OR javascript OR react OR nextjs OR "
+        "webdev OR startup OR SaaS) "
+        "-is:retweet -is:reply lang:en"
+    )
+    
+    # X API v2 endpoint, relative to the pooled X client's base URL
+    url = "/2/tweets/search/recent"
+    
+    headers = {
+        "Authorization": f"Bearer {bearer_token}"
+    }
+    
+    params = {
+        "query": search_query,
+        "max_results": 25,  # Conservative for Free tier (100 tweets/month)
+        "tweet.fields": "created_at,public_metrics,author_id",
+        "expansions": "author_id",
+        "user.fields": "name,username,profile_image_url"
+    }
+    
+    response = await _http_clients.get("x").get(url, headers=headers, params=params)
+    
+    if response.status_code != 200:
+        print(f"❌ X API Error (Status {response.status_code}):")
+        try:
+            error_data = response.json()
+            print(f"   {error_data}")
+        except:
+            print(f"   {response.text}")
+        
+        raise RuntimeError(f"X API returned status {response.status_code}")
+    
+    data = response.json()
+    
+    # Parse tweets into AI products
+    products = parse_tweets_to_products(data)
+    
+    # Filter for quality/engagement - lowered threshold to show more results
+    products = [p for p in products if p.relevance_score >= 1][:25]
+    
+    result = AITrendsResponse(
+        products=products,
+        total_count=len(products),
+        last_updated=datetime.now().isoformat()
+    )
+    
+    print(f"Fetched {len(products)} AI trends from X API")
+    return result
+
+# Refreshed once per CACHE_DURATION, by the lifespan refresher or the first request after expiry
+_trends_cache = TrendsCache(fetch_ai_trends, CACHE_DURATION)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime metrics: outbound HTTP pool utilization per upstream service."""
+    return {"http_clients": _http_clients.stats()}
 
 def parse_tweets_to_products(data: dict) -> List[AIProduct]:
     """Parse X API response into AIProduct objects."""
@@ -854,61 +905,9 @@ def get_sample_ai_trends() -> AITrendsResponse:
 async def generate_progress_cards(req: ProgressCardRequest):
     """Generate 5 major milestone cards for long-term career/learning goals using AI."""
     try:
-        use_gemini = req.model == "gemini"
-        
-        instructions = f"""You are an expert career advisor and learning strategist.
-
-Generate exactly 5 MAJOR MILESTONE cards for the long-term career/learning goal: "{req.project_name}"
-
-IMPORTANT: This is a LONG-TERM CAREER or LEARNING GOAL, not a short-term project. Each milestone should represent months or years of work.
-
-Each milestone should be:
-1. A significant, high-level achievement (e.g., "Foundational Knowledge", "Professional Experience", "Career Advancement")
-2. Ordered from beginner to expert level
-3. Represent major phases of the learning/career journey
-4. Brief title (3-5 words EXACTLY) with descriptive explanation of what this phase entails
-
-Format your response EXACTLY as valid JSON:
-{{
-  "cards": [
-    {{
-      "title": "Build Foundational Knowledge",
-      "description": "Learn core concepts, syntax, and fundamental principles through courses, books, and tutorials"
-    }},
-    {{
-      "title": "Develop Practical Skills",
-      "description": "Build real projects, contribute to open source, and gain hands-on experience"
-    }}
-  ]
-}}
-
-IMPORTANT:
-- Titles must be 3-5 words only
-- These are MAJOR phases, not small tasks
-- Think in terms of months/years, not days/weeks
-Generate EXACTLY 5 milestone cards. Return ONLY the JSON, no other text."""
-        
         # Create an AI agent to generate progress cards
-        if use_gemini:
-            progress_agent = GeminiAgent(
-                name="Progress Card Generator",
-                instructions=instructions
-            )
-            result_text = await run_gemini_agent(
-                progress_agent,
-                f"Generate 20 progress cards for: {req.project_name}"
-            )
-            response_text = result_text.strip()
-        else:
-            progress_agent = Agent(
-                name="Progress Card Generator",
-                instructions=instructions
-            )
-            result = await Runner.run(
-                starting_agent=progress_agent,
-                input=f"Generate 20 progress cards for: {req.project_name}",
-            )
-            response_text = result.final_output.strip()
+        response_text = await agent_registry.run(
+            "progress_cards", f"Generate 5 milestone cards for the goal: \"{req.project_name}\"", model=req.model)
         
         # Parse the JSON response
         import json
@@ -980,7 +979,6 @@ async def generate_mini_challenge(req: MiniChallengeRequest):
     
     # Select challenge type
     challenge_type = req.challenge_type if req.challenge_type in challenge_types else random.choice(challenge_types)
-    use_gemini = req.model == "gemini"
     
     # Define prompts for each challenge type
     prompts = {
@@ -993,29 +991,14 @@ async def generate_mini_challenge(req: MiniChallengeRequest):
         "check-in": "Send a supportive, conversational message checking in on their learning journey. Ask about their progress or what they're working on. Be warm and encouraging!"
     }
     
-    instructions = f"""You are a friendly coding tutor creating a MOBILE-FRIENDLY challenge.
-
-Challenge Type: {challenge_type}
+    challenge_input = f"""Challenge Type: {challenge_type}
 
 {prompts[challenge_type]}
 
-CRITICAL RULES:
-- MUST be SHORT enough for mobile screen (max 10 lines total)
-- NO markdown formatting (plain text only for iMessage)
-- Be warm, conversational, and encouraging
-- Use simple, clear language
-- Add relevant emojis for engagement
-
-Format your response as plain text, NOT markdown. Make it feel like a text message from a friend!"""
+Generate a {challenge_type} challenge"""
     
     try:
-        if use_gemini:
-            agent = GeminiAgent(name="Mini Challenge Generator", instructions=instructions)
-            result = await run_gemini_agent(agent, f"Generate a {challenge_type} challenge")
-        else:
-            agent = Agent(name="Mini Challenge Generator", instructions=instructions)
-            result_obj = await Runner.run(starting_agent=agent, input=f"Generate a {challenge_type} challenge")
-            result = result_obj.final_output
+        result = await agent_registry.run("mini_challenge", challenge_input, model=req.model)
         
         # Add hint for certain challenge types
         hint = None
@@ -5,17 +5,26 @@ Command-line interface for GitHub Repository Analyzer
 Usage examples:
     python cli_analyzer.py analyze https://github.com/user/repo
     python cli_analyzer.py analyze https://github.com/user/repo --ref develop
+    python cli_analyzer.py analyze https://github.com/user/repo --stream
+    python cli_analyzer.py batch repos.txt --concurrency 8 > results.ndjson
     python cli_analyzer.py history
+    python cli_analyzer.py search "websockets"
     python cli_analyzer.py export https://github.com/user/repo --output report.json
 """
 
 import argparse
+import asyncio
 import json
 import sys
 import os
+import time
+from dataclasses import asdict
 from pathlib import Path
-from datetime import datetime
-from github_analyzer import RepositoryAnalyzer
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, TextIO, Tuple
+from github_analyzer import AnalysisStats, RepositoryAnalyzer
+from analysis_report import (SECTION_ORDER, format_analysis, format_file_types,
+                             format_repository_info, format_section)
 import logging
 
 def setup_logging(verbose: bool = False):
@@ -27,18 +36,86 @@ def setup_logging(verbose: bool = False):
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
-def analyze_command(args):
-    """Handle repository analysis command."""
-    # Check if progress should be suppressed (e.g., when called from API)
-    suppress_progress = os.environ.get('SUPPRESS_PROGRESS', '').lower() in ('1', 'true', 'yes')
-    
-    analyzer = RepositoryAnalyzer(
+def create_analyzer(args, show_progress: bool) -> RepositoryAnalyzer:
+    """Build a RepositoryAnalyzer from the shared analyzer options."""
+    return RepositoryAnalyzer(
         db_path=args.db_path,
         max_files=args.max_files,
         max_chars_per_file=args.max_chars,
         model=args.model,
-        show_progress=not suppress_progress  # Enable progress indicators for CLI usage unless suppressed
+        show_progress=show_progress,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        ingestion=args.ingestion,
+        exact_totals=not args.approximate_totals,
+        token_budget=args.token_budget,
+        incremental_max_files=args.incremental_max_files,
+        analysis_mode=args.mode,
+        map_concurrency=args.map_concurrency,
+        repair_attempts=args.repair_attempts,
+        filter_files=not args.keep_duplicates
     )
+
+def print_repository_info(metadata):
+    """Print the repository information block of an analysis."""
+    print(format_repository_info(metadata), end="")
+
+def print_section(name: str, value):
+    """Print one analysis section; empty sections other than the summary are skipped."""
+    print(format_section(name, value), end="")
+
+def print_file_types(metadata):
+    """Print the file type distribution table of an analysis."""
+    print(format_file_types(metadata), end="")
+
+def print_analysis(result):
+    """Print a complete analysis as markdown."""
+    print("\n---\n")
+    print(format_analysis(result), end="")
+
+async def stream_analysis_output(analyzer: RepositoryAnalyzer, args):
+    """
+    Run an analysis, printing each section as soon as the model completes it.
+    
+    Sections not streamed (e.g. for stored results) and the repository
+    information are printed once the analysis finishes.
+    
+    Returns:
+        The final AnalysisResult
+    """
+    print("\n---\n")
+    print("# 📊 Repository Analysis\n")
+    printed = set()
+    result = None
+    async for event in analyzer.stream_analysis(args.repo_url, args.ref,
+                                                subfolder=getattr(args, 'subfolder', None),
+                                                force_refresh=args.force):
+        if event['event'] == 'token' and args.show_tokens:
+            sys.stderr.write(event['text'])
+            sys.stderr.flush()
+        elif event['event'] == 'section' and event['name'] in SECTION_ORDER and event['name'] not in printed:
+            print_section(event['name'], event['value'])
+            printed.add(event['name'])
+            sys.stdout.flush()
+        elif event['event'] == 'result':
+            result = event['analysis']
+    
+    if args.show_tokens:
+        sys.stderr.write("\n")
+    for name in SECTION_ORDER:
+        if name not in printed:
+            print_section(name, getattr(result, name))
+    print_repository_info(result.repository_metadata)
+    print_file_types(result.repository_metadata)
+    return result
+
+def analyze_command(args):
+    """Handle repository analysis command."""
+    # Check if progress should be suppressed (e.g., when called from API)
+    suppress_progress = os.environ.get('SUPPRESS_PROGRESS', '').lower() in ('1', 'true', 'yes')
+    
+    # Enable progress indicators for CLI usage unless suppressed
+    analyzer = create_analyzer(args, show_progress=not suppress_progress)
     
     try:
         print(f"Analyzing repository: {args.repo_url}")
@@ -46,111 +123,17 @@ def analyze_command(args):
             print(f"Using branch/ref: {args.ref}")
         if hasattr(args, 'subfolder') and args.subfolder:
             print(f"Analyzing subfolder: {args.subfolder}")
-            
-        result = analyzer.analyze_repository(
-            args.repo_url,
-            args.ref,
-            subfolder=getattr(args, 'subfolder', None),
-            force_refresh=args.force
-        )
-        
-        print("\n---\n")
-        print("# 📊 Repository Analysis\n")
         
-        # Format the timestamp to be human-readable
-        try:
-            analysis_time = datetime.fromisoformat(result.repository_metadata.analysis_timestamp.replace('Z', '+00:00'))
-            formatted_time = analysis_time.strftime('%Y-%m-%d %H:%M:%S UTC')
-        except:
-            formatted_time = result.repository_metadata.analysis_timestamp
-        
-        print("## Repository Information\n")
-        print(f"**URL:** {result.repository_metadata.repo_url}  ")
-        print(f"**Branch:** {result.repository_metadata.ref}  ")
-        print(f"**Files Analyzed:** {result.repository_metadata.analyzed_files}/{result.repository_metadata.total_files}  ")
-        print(f"**Total Lines:** {result.repository_metadata.total_lines:,}  ")
-        print(f"**Analysis Time:** {formatted_time}\n")
-        
-        print("## 📝 Summary\n")
-        print(f"{result.summary}\n")
-        
-        if result.objectives:
-            print("## 🎯 Objectives\n")
-            for i, obj in enumerate(result.objectives, 1):
-                print(f"{i}. {obj}")
-            print()
-        
-        if result.tech_stack:
-            print("## 🛠️ Technology Stack\n")
-            print(", ".join(f"`{tech}`" for tech in result.tech_stack))
-            print("\n")
-        
-        if result.concepts:
-            print("## 🧠 Concepts Identified\n")
-            # Group concepts by category
-            concepts_by_category = {}
-            for concept in result.concepts:
-                category = concept.get('category', 'other')
-                if category not in concepts_by_category:
-                    concepts_by_category[category] = []
-                concepts_by_category[category].append(concept)
-            
-            # Display concepts organized by category
-            category_icons = {
-                'language': '🔤',
-                'framework': '🏗️',
-                'algorithm': '⚙️',
-                'theory': '📚',
-                'networking': '🌐',
-                'io': '💾',
-                'computation': '🖥️',
-                'data_structure': '📊',
-                'design_pattern': '🎨',
-                'security': '🔒',
-                'testing': '🧪',
-                'other': '🔧'
-            }
-            
-            for category, concepts in sorted(concepts_by_category.items()):
-                icon = category_icons.get(category, '•')
-                category_display = category.replace('_', ' ').title()
-                print(f"### {icon} {category_display}\n")
-                for concept in concepts[:3]:  # Show top 3 per category
-                    importance = concept.get('importance', 'medium')
-                    importance_icon = '🔥' if importance == 'high' else '⭐' if importance == 'medium' else '💡'
-                    print(f"- **{importance_icon} {concept.get('name', 'Unknown')}:** {concept.get('description', 'No description')}")
-                print()
-        
-        if result.key_components:
-            print("## 🔧 Key Components\n")
-            for comp in result.key_components[:5]:  # Show top 5
-                comp_name = comp.get('name', 'Unknown')
-                comp_type = comp.get('type', 'Unknown')
-                comp_purpose = comp.get('purpose', 'No description')
-                print(f"- **{comp_name}** (`{comp_type}`) - {comp_purpose}")
-            print()
-        
-        if result.architecture:
-            print("## 🏗️ Architecture\n")
-            if 'pattern' in result.architecture:
-                print(f"**Pattern:** {result.architecture['pattern']}  ")
-            if 'layers' in result.architecture:
-                print(f"**Layers:** {', '.join(result.architecture['layers'])}")
-            print()
-        
-        if result.recommendations:
-            print("## 💡 Recommendations\n")
-            for i, rec in enumerate(result.recommendations, 1):
-                print(f"{i}. {rec}")
-            print()
-        
-        print("## 📁 File Type Distribution\n")
-        print("| Extension | Count |")
-        print("|-----------|-------|")
-        for ext, count in sorted(result.repository_metadata.file_types.items(),
-                               key=lambda x: x[1], reverse=True)[:10]:
-            print(f"| `{ext}` | {count} |")
-        print()
+        if args.stream:
+            result = asyncio.run(stream_analysis_output(analyzer, args))
+        else:
+            result = analyzer.analyze_repository(
+                args.repo_url,
+                args.ref,
+                subfolder=getattr(args, 'subfolder', None),
+                force_refresh=args.force
+            )
+            print_analysis(result)
             
         if args.output:
             output_path = Path(args.output)
@@ -162,19 +145,182 @@ def analyze_command(args):
         print(f"❌ Error during analysis: {e}", file=sys.stderr)
         sys.exit(1)
 
+def read_batch_entries(lines) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Parse batch input lines of the form ``url [ref] [subfolder]``.
+    
+    Blank lines and ``#`` comments are skipped and repeated entries are
+    analyzed once.
+    
+    Returns:
+        List of (repo_url, ref, subfolder) in input order
+    """
+    entries = []
+    for line in lines:
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+        entry = (fields[0], fields[1] if len(fields) > 1 else "main", fields[2] if len(fields) > 2 else None)
+        if entry not in entries:
+            entries.append(entry)
+    return entries
+
+async def run_batch(analyzer: RepositoryAnalyzer, entries: List[Tuple[str, str, Optional[str]]],
+                    concurrency: int = 4, force: bool = False, out: TextIO = sys.stdout) -> Dict:
+    """
+    Analyze many repositories with one shared analyzer.
+    
+    One NDJSON line is written to ``out`` per repository as soon as it
+    finishes, so results stream in completion order rather than input order.
+    The shared analyzer means clones, the mirror cache and stored analyses
+    are reused across entries.
+    
+    Args:
+        analyzer: RepositoryAnalyzer to run every analysis on
+        entries: (repo_url, ref, subfolder) tuples to analyze
+        concurrency: Maximum analyses in flight at once
+        force: Force re-analysis even if cached results exist
+        out: Stream receiving the NDJSON result lines
+        
+    Returns:
+        Summary with totals, failures, cache hits, outcome counts, stage timings
+        and model token usage
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def analyze(repo_url: str, ref: str, subfolder: Optional[str]) -> Dict:
+        stats = AnalysisStats()
+        record = {"repo_url": repo_url, "ref": ref, "subfolder": subfolder}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await analyzer.analyze_repository_async(
+                    repo_url, ref, subfolder=subfolder, force_refresh=force, stats=stats)
+                analysis = asdict(result)
+                analysis.pop("raw_response", None)
+                record.update(status="ok", analysis=analysis)
+            except Exception as e:
+                record.update(status="error", error=str(e))
+            record.update(outcome=stats.outcome if record["status"] == "ok" else None,
+                          cache_hit=record["status"] == "ok" and stats.cache_hit,
+                          seconds=round(time.perf_counter() - start, 3),
+                          timings={name: round(t, 3) for name, t in stats.timings.items()},
+                          usage=stats.usage)
+        return record
+    
+    start = time.perf_counter()
+    outcomes: Dict[str, int] = {}
+    stage_totals: Dict[str, float] = {}
+    usage_totals: Dict[str, int] = {}
+    failures = []
+    tasks = [asyncio.ensure_future(analyze(*entry)) for entry in entries]
+    for future in asyncio.as_completed(tasks):
+        record = await future
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+        if record["status"] == "ok":
+            outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+        else:
+            failures.append({"repo_url": record["repo_url"], "ref": record["ref"],
+                             "subfolder": record["subfolder"], "error": record["error"]})
+        for name, seconds in record["timings"].items():
+            stage_totals[name] = stage_totals.get(name, 0.0) + seconds
+        for name, count in record["usage"].items():
+            usage_totals[name] = usage_totals.get(name, 0) + count
+    
+    return {
+        "total": len(entries),
+        "succeeded": len(entries) - len(failures),
+        "failed": len(failures),
+        "cache_hits": outcomes.get("cached", 0) + outcomes.get("tree_reuse", 0),
+        "outcomes": outcomes,
+        "failures": failures,
+        "stage_seconds": stage_totals,
+        "usage": usage_totals,
+        "wall_seconds": time.perf_counter() - start,
+    }
+
+def print_batch_summary(summary: Dict, stream: TextIO = sys.stderr):
+    """Print a batch summary in human-readable form."""
+    print("\n📦 BATCH SUMMARY", file=stream)
+    print("=" * 60, file=stream)
+    print(f"Repositories: {summary['total']} "
+          f"({summary['succeeded']} succeeded, {summary['failed']} failed)", file=stream)
+    print(f"Cache hits: {summary['cache_hits']}", file=stream)
+    for outcome, count in sorted(summary['outcomes'].items()):
+        print(f"  {outcome}: {count}", file=stream)
+    if summary['stage_seconds']:
+        print("Stage timings (total / mean per repository):", file=stream)
+        for name, seconds in sorted(summary['stage_seconds'].items(), key=lambda x: x[1], reverse=True):
+            mean = seconds / summary['total'] if summary['total'] else 0.0
+            print(f"  {name:<12} {seconds:8.2f}s {mean:8.2f}s", file=stream)
+    usage = summary.get('usage')
+    if usage:
+        print(f"Model tokens: {usage.get('input_tokens', 0):,} input ({usage.get('cached_tokens', 0):,} cached), "
+              f"{usage.get('output_tokens', 0):,} output over {usage.get('requests', 0)} requests", file=stream)
+    print(f"Wall time: {summary['wall_seconds']:.2f}s", file=stream)
+    for failure in summary['failures']:
+        subfolder_text = f" (subfolder: {failure['subfolder']})" if failure['subfolder'] else ""
+        print(f"❌ {failure['repo_url']}#{failure['ref']}{subfolder_text}: {failure['error']}", file=stream)
+
+def batch_command(args):
+    """Handle batch analysis command."""
+    if args.file == '-':
+        entries = read_batch_entries(sys.stdin)
+    else:
+        with open(args.file) as f:
+            entries = read_batch_entries(f)
+    
+    if not entries:
+        print("No repositories to analyze.", file=sys.stderr)
+        sys.exit(1)
+    
+    # Per-repository spinners would interleave, so progress stays off
+    analyzer = create_analyzer(args, show_progress=False)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        summary = asyncio.run(run_batch(analyzer, entries, args.concurrency, args.force, out))
+    finally:
+        if args.output:
+            out.close()
+    
+    print_batch_summary(summary)
+    if summary['failed']:
+        sys.exit(1)
+
+def timestamp_argument(value: str) -> str:
+    """Parse an ISO 8601 date or timestamp into the UTC form stored in the database."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid ISO 8601 timestamp: '{value}'")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def cursor_argument(value: str) -> Tuple[str, Optional[int]]:
+    """Parse a history cursor: an ISO 8601 time, or the 'TIMESTAMP,ID' printed as the next page."""
+    timestamp, _, row_id = value.rpartition(',')
+    if timestamp and row_id.isdigit():
+        return timestamp_argument(timestamp), int(row_id)
+    return timestamp_argument(value), None
+
 def history_command(args):
     """Handle history listing command."""
     analyzer = RepositoryAnalyzer(db_path=args.db_path, show_progress=False)
-    history = analyzer.get_analysis_history(args.repo_url)
-    
-    if not history:
-        print("No analysis history found.")
-        return
-    
-    print("📚 ANALYSIS HISTORY")
-    print("="*80)
+    before, before_id = args.before or (None, None)
+    history = analyzer.iter_analysis_history(args.repo_url, limit=args.limit, before=before,
+                                             since=args.since, before_id=before_id)
     
+    # Entries are printed as they are read rather than collected first
+    count = 0
+    last_entry = None
     for entry in history:
+        if count == 0:
+            print("📚 ANALYSIS HISTORY")
+            print("="*80)
+        count += 1
+        last_entry = entry
         print(f"Repository: {entry['repo_url']}")
         print(f"Branch: {entry['ref_branch']}")
         if 'subfolder' in entry and entry['subfolder']:
@@ -182,6 +328,58 @@ def history_command(args):
         print(f"Analyzed: {entry['analysis_timestamp']}")
         print(f"Stored: {entry['created_at']}")
         print("-" * 40)
+    
+    if count == 0:
+        print("No analysis history found.")
+    elif args.limit is not None and count == args.limit:
+        print(f"Next page: --before {last_entry['created_at']},{last_entry['id']}")
+
+def search_command(args):
+    """Handle full-text search command."""
+    analyzer = RepositoryAnalyzer(db_path=args.db_path, show_progress=False)
+    try:
+        hits = analyzer.search_analyses(args.query, repo_url=args.repo_url, limit=args.limit)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    if not hits:
+        print(f"No analyses match '{args.query}'.")
+        return
+    
+    print(f"🔎 SEARCH RESULTS: {args.query}")
+    print("="*80)
+    
+    for i, hit in enumerate(hits, 1):
+        subfolder_text = f" (subfolder: {hit['subfolder']})" if hit['subfolder'] else ""
+        print(f"{i}. {hit['repo_url']}#{hit['ref_branch']}{subfolder_text}")
+        print(f"   {' '.join(hit['snippet'].split())}")
+        print(f"   Analyzed: {hit['analysis_timestamp']}")
+        print("-" * 40)
+
+def top_command(args):
+    """Handle aggregate technology and concept ranking command."""
+    analyzer = RepositoryAnalyzer(db_path=args.db_path, show_progress=False)
+    
+    if args.kind == 'technologies':
+        rows = analyzer.top_technologies(args.limit)
+        if not rows:
+            print("No analyses stored yet.")
+            return
+        print(f"🛠️ TOP {len(rows)} TECHNOLOGIES")
+        print("="*80)
+        for i, row in enumerate(rows, 1):
+            print(f"{i:>3}. {row['technology']:<40} {row['analyses']} analyses")
+    else:
+        rows = analyzer.top_concepts(args.limit, category=args.category)
+        if not rows:
+            print("No analyses stored yet.")
+            return
+        print(f"🧠 TOP {len(rows)} CONCEPTS")
+        print("="*80)
+        for i, row in enumerate(rows, 1):
+            print(f"{i:>3}. {row['concept']:<40} {row['category']:<16} "
+                  f"{row['analyses']} analyses ({row['high_importance']} high importance)")
 
 def export_command(args):
     """Handle export command."""
@@ -201,6 +399,39 @@ def export_command(args):
     
     print(f"Analysis exported to: {output_path}")
 
+def add_analyzer_arguments(parser):
+    """Add the options shared by commands that run analyses."""
+    parser.add_argument('--max-files', type=int, default=25,
+                        help='Maximum files to analyze (default: 25)')
+    parser.add_argument('--max-chars', type=int, default=6000,
+                        help='Maximum characters per file (default: 6000)')
+    parser.add_argument('--model', default='gpt-4o-mini',
+                        help='OpenAI model to use (default: gpt-4o-mini)')
+    parser.add_argument('--cache-dir', default=os.environ.get('REPO_CACHE_DIR'),
+                        help='Directory for the persistent repository mirror cache\n(default: $REPO_CACHE_DIR; temporary clones when unset)')
+    parser.add_argument('--cache-max-mb', type=int, default=5120,
+                        help='Disk quota for the mirror cache in MB (default: 5120)')
+    parser.add_argument('--ingestion', choices=['worktree', 'objects'], default='worktree',
+                        help='How to read repository contents:\n'
+                             '  worktree - clone and walk a checkout (default)\n'
+                             '  objects  - read blobs straight from the git object database')
+    parser.add_argument('--token-budget', type=int,
+                        help='Token budget for file contents in the prompt; as many files as it\ncan hold are selected and packed by priority to fit it\n(at least --max-files; overrides --max-chars)')
+    parser.add_argument('--mode', choices=['single', 'map_reduce'], default='single',
+                        help='Analysis strategy:\n'
+                             '  single     - one prompt with the top --max-files files (default)\n'
+                             '  map_reduce - summarize each top-level directory, then combine')
+    parser.add_argument('--map-concurrency', type=int, default=4,
+                        help='Concurrent model calls in map_reduce mode (default: 4)')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Do not skip lock files, generated or minified code and duplicated files')
+    parser.add_argument('--repair-attempts', type=int, default=2,
+                        help='Follow-up calls allowed to repair model output that does not match the\nanalysis schema (default: 2)')
+    parser.add_argument('--incremental-max-files', type=int, default=10,
+                        help='Update a stored analysis of an older commit from the git diff when at most\nthis many important files changed (default: 10, 0 disables)')
+    parser.add_argument('--approximate-totals', action='store_true',
+                        help='Only read the selected files and stop scanning early;\nfile and line totals then cover the scanned part only')
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
@@ -210,7 +441,10 @@ def main():
 Examples:
   python cli_analyzer.py analyze https://github.com/user/repo
   python cli_analyzer.py analyze https://github.com/user/repo --subfolder src/frontend
+  python cli_analyzer.py batch repos.txt --concurrency 8 --output results.ndjson
   python cli_analyzer.py history
+  python cli_analyzer.py search "websockets"
+  python cli_analyzer.py top technologies --limit 20
   python cli_analyzer.py export https://github.com/user/repo --output results.json
         """
     )
@@ -233,24 +467,71 @@ Examples:
                                help='Subfolder path to analyze (e.g., src/frontend)')
     analyze_parser.add_argument('--force', '-f', action='store_true',
                                help='Force re-analysis even if cached result exists')
-    analyze_parser.add_argument('--max-files', type=int, default=25,
-                               help='Maximum files to analyze (default: 25)')
-    analyze_parser.add_argument('--max-chars', type=int, default=6000,
-                               help='Maximum characters per file (default: 6000)')
-    analyze_parser.add_argument('--model', default='gpt-4o-mini',
-                               help='OpenAI model to use (default: gpt-4o-mini)')
     analyze_parser.add_argument('--output', '-o',
                                help='Save full results to JSON file')
+    analyze_parser.add_argument('--stream', action='store_true',
+                               help='Print each section as soon as the model has written it')
+    analyze_parser.add_argument('--show-tokens', action='store_true',
+                               help='With --stream, echo the raw model output to stderr as it arrives')
+    add_analyzer_arguments(analyze_parser)
     analyze_parser.set_defaults(func=analyze_command)
     
+    # Batch command
+    batch_parser = subparsers.add_parser(
+        'batch',
+        help='Analyze many repositories concurrently',
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="Analyze every repository listed in a file, one 'url [ref] [subfolder]' per line.\n"
+                    "Writes one JSON line per repository as it finishes and a summary to stderr."
+    )
+    batch_parser.add_argument('file', help="File listing repositories ('-' for stdin)")
+    batch_parser.add_argument('--concurrency', '-c', type=int, default=4,
+                             help='Repositories analyzed at once (default: 4)')
+    batch_parser.add_argument('--force', '-f', action='store_true',
+                             help='Force re-analysis even if cached results exist')
+    batch_parser.add_argument('--output', '-o',
+                             help='Write NDJSON results to this file (default: stdout)')
+    add_analyzer_arguments(batch_parser)
+    batch_parser.set_defaults(func=batch_command)
+    
     # History command
     history_parser = subparsers.add_parser('history',
                                           help='Show analysis history',
                                           formatter_class=argparse.RawTextHelpFormatter)
     history_parser.add_argument('repo_url', nargs='?',
                                help='Filter by repository URL (optional)')
+    history_parser.add_argument('--limit', '-n', type=int,
+                               help='Show at most this many analyses (default: all)')
+    history_parser.add_argument('--before', type=cursor_argument,
+                               help='Only analyses stored before this ISO 8601 time;\npass the printed "Next page" cursor to get the next page')
+    history_parser.add_argument('--since', type=timestamp_argument,
+                               help='Only analyses stored at or after this ISO 8601 time')
     history_parser.set_defaults(func=history_command)
     
+    # Search command
+    search_parser = subparsers.add_parser('search',
+                                         help='Full-text search over stored analyses',
+                                         formatter_class=argparse.RawTextHelpFormatter)
+    search_parser.add_argument('query',
+                              help='Search terms; all must match, term* matches a prefix')
+    search_parser.add_argument('--repo-url',
+                              help='Only search analyses of this repository URL')
+    search_parser.add_argument('--limit', '-n', type=int, default=10,
+                              help='Maximum results (default: 10)')
+    search_parser.set_defaults(func=search_command)
+    
+    # Top command
+    top_parser = subparsers.add_parser('top',
+                                      help='Rank technologies or concepts across stored analyses',
+                                      formatter_class=argparse.RawTextHelpFormatter)
+    top_parser.add_argument('kind', choices=['technologies', 'concepts'],
+                           help='What to rank')
+    top_parser.add_argument('--limit', '-n', type=int, default=20,
+                           help='Number of entries (default: 20)')
+    top_parser.add_argument('--category',
+                           help='Only concepts of this category (e.g. algorithm, framework)')
+    top_parser.set_defaults(func=top_command)
+    
     # Export command
     export_parser = subparsers.add_parser('export',
                                          help='Export analysis results',
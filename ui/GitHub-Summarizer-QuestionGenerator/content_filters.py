@@ -0,0 +1,188 @@
+"""
+Duplicate and generated-file filtering for the GitHub Repository Analyzer.
+
+Vendored copies, generated clients and minified bundles take file slots and
+tokens without telling the model anything new. Well-known generated file names
+are rejected before anything is read; ``ContentFilter`` then checks the loaded
+file heads in priority order and rejects generated or minified source code, exact
+duplicates (content hash) and near-duplicates (MinHash over word shingles,
+bucketed with locality-sensitive hashing) of files already accepted.
+"""
+
+import re
+import hashlib
+from pathlib import PurePosixPath
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# File names produced by build tools and code generators
+GENERATED_NAME_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"\.min\.(js|css|mjs)$",
+    r"[.-]bundle\.(js|css)$",
+    r"\.chunk\.js$",
+    r"\.(js|css)\.map$",
+    r"_pb2(_grpc)?\.pyi?$",
+    r"\.pb(\.gw)?\.go$",
+    r"\.pb\.(cc|h)$",
+    r"_grpc_pb\.(js|d\.ts)$",
+    r"\.(g|freezed)\.dart$",
+    r"[._]generated\.\w+$",
+    r"\.designer\.cs$",
+))
+
+# Dependency lock files: long, machine-written and free of design information
+LOCK_FILES = frozenset({"package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+                        "poetry.lock", "pipfile.lock", "cargo.lock", "composer.lock", "gemfile.lock",
+                        "go.sum"})
+
+# Source files; documentation and data are never treated as generated or minified
+SOURCE_EXTENSIONS = frozenset({'.py', '.pyi', '.js', '.mjs', '.cjs', '.ts', '.jsx', '.tsx', '.css', '.java',
+                               '.go', '.rs', '.cpp', '.cc', '.c', '.h', '.hpp', '.cs', '.php', '.rb',
+                               '.swift', '.kt', '.dart'})
+
+# Markers code generators put in a comment at the top of their output:
+# "@generated" and Go's "Code generated ... DO NOT EDIT."
+GENERATED_HEADER = re.compile(r"@generated\b|\bCode generated .* DO NOT EDIT\b")
+COMMENT_PREFIXES = ("#", "//", "/*", "*", "--", "<!--", '"""', "'''")
+HEADER_LINES = 20
+
+# Minified code: very long lines with almost no whitespace
+MINIFIED_MIN_CHARS = 1000
+MINIFIED_LINE_LENGTH = 500
+MINIFIED_WHITESPACE_RATIO = 0.12
+
+# Near-duplicate detection: one-permutation MinHash with NUM_BINS bins,
+# LSH bands of BAND_SIZE bins, and the estimated Jaccard similarity of the
+# shingle sets above which a file counts as a copy
+SHINGLE_WORDS = 5
+MIN_SHINGLES = 20
+NUM_BINS = 64
+BAND_SIZE = 4
+NEAR_DUPLICATE_THRESHOLD = 0.8
+EMPTY_BIN = 1 << 64
+
+WORD = re.compile(r"\w+")
+
+
+def generated_path_reason(path: str) -> Optional[str]:
+    """Why a file is skipped by name alone (lock file or generated), or None."""
+    name = path.rsplit("/", 1)[-1].lower()
+    if name in LOCK_FILES:
+        return "lock file"
+    if any(pattern.search(name) for pattern in GENERATED_NAME_PATTERNS):
+        return "generated file name"
+    return None
+
+
+def leading_comment_lines(content: str) -> Iterator[str]:
+    """The comment lines at the top of a file, up to the first line of code."""
+    for line in content.splitlines()[:HEADER_LINES]:
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(COMMENT_PREFIXES):
+            return
+        yield line
+
+
+def generated_content_reason(path: str, content: str) -> Optional[str]:
+    """Why a source file's contents mark it as generated or minified, or None."""
+    if PurePosixPath(path).suffix.lower() not in SOURCE_EXTENSIONS:
+        return None
+    if any(GENERATED_HEADER.search(line) for line in leading_comment_lines(content)):
+        return "generated code header"
+    if len(content) >= MINIFIED_MIN_CHARS:
+        longest = max(len(line) for line in content.splitlines())
+        whitespace = sum(1 for char in content if char.isspace())
+        if longest >= MINIFIED_LINE_LENGTH and whitespace / len(content) < MINIFIED_WHITESPACE_RATIO:
+            return "minified"
+    return None
+
+
+def minhash_signature(content: str) -> Optional[Tuple[int, ...]]:
+    """
+    One-permutation MinHash of the word shingles of ``content``.
+
+    Each shingle is hashed once; the low bits pick its bin and the remaining
+    bits compete for the bin minimum, so the cost is linear in the text.
+
+    Returns:
+        NUM_BINS bin minima (EMPTY_BIN for empty bins), or None when the text
+        has fewer than MIN_SHINGLES shingles to compare reliably
+    """
+    words = WORD.findall(content.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    signature = [EMPTY_BIN] * NUM_BINS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+        bin_index, rest = value % NUM_BINS, value // NUM_BINS
+        if rest < signature[bin_index]:
+            signature[bin_index] = rest
+    return tuple(signature)
+
+
+def signature_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    used = matching = 0
+    for x, y in zip(a, b):
+        if x == EMPTY_BIN and y == EMPTY_BIN:
+            continue
+        used += 1
+        matching += x == y
+    return matching / used if used else 0.0
+
+
+class ContentFilter:
+    """
+    Rejects files that add nothing to the files already accepted.
+
+    Files must be checked in order of preference: the first copy of a
+    duplicate is the one kept.
+    """
+
+    def __init__(self, near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._digests: Dict[str, str] = {}
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._bands: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+
+    def check(self, path: str, content: str) -> Optional[str]:
+        """
+        Check a file and accept it if it is new.
+
+        Returns:
+            None when the file is accepted, otherwise why it was rejected
+            (e.g. "minified" or "near-duplicate of src/app.js")
+        """
+        reason = generated_content_reason(path, content)
+        if reason:
+            return reason
+
+        digest = hashlib.sha1(content.encode("utf-8", errors="ignore")).hexdigest()
+        if digest in self._digests:
+            return f"duplicate of {self._digests[digest]}"
+
+        signature = minhash_signature(content)
+        bands = self._band_keys(signature) if signature else []
+        candidates = {other for key in bands for other in self._bands.get(key, ())}
+        for other in sorted(candidates):
+            if signature_similarity(signature, self._signatures[other]) >= self.near_duplicate_threshold:
+                return f"near-duplicate of {other}"
+
+        self._digests[digest] = path
+        if signature:
+            self._signatures[path] = signature
+            for key in bands:
+                self._bands.setdefault(key, []).append(path)
+        return None
+
+    @staticmethod
+    def _band_keys(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        """LSH bucket keys; bands made only of empty bins are left out."""
+        keys = []
+        for start in range(0, NUM_BINS, BAND_SIZE):
+            band = signature[start:start + BAND_SIZE]
+            if any(value != EMPTY_BIN for value in band):
+                keys.append((start, band))
+        return keys
@@ -0,0 +1,199 @@
+"""
+Token-budget-aware context packing for the GitHub Repository Analyzer.
+
+Fits the loaded file contents into a global token budget. The budget is
+shared out by file priority with weighted water-filling: files that fit in
+their share are kept whole and their unused share flows to the others, the
+rest are cut to their share keeping the head and tail of the file.
+
+Tokens are counted with ``tiktoken``. Its encodings are downloaded on first
+use; when that fails, counts are estimated from the character count.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tiktoken encoding can be loaded
+CHARS_PER_TOKEN = 4
+
+# Files whose share falls below this are dropped rather than cut to a stub
+MIN_FILE_TOKENS = 64
+
+# Fraction of a truncated file's share spent on its head (the rest is the tail)
+HEAD_FRACTION = 0.7
+
+OMISSION_MARKER = "\n... [{lines} lines omitted] ...\n"
+
+
+class TokenCounter:
+    """Counts and slices text in tokens of a given model."""
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        """
+        Initialize the counter.
+
+        Args:
+            model: Model whose tokenizer to use (falls back to o200k_base)
+        """
+        self._encoding = None
+        try:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load the tiktoken encoding for {model}, estimating token counts: {e}")
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from the model's tokenizer rather than an estimate."""
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        """Number of tokens in ``text``."""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def head(self, text: str, tokens: int) -> str:
+        """Longest prefix of ``text`` within ``tokens`` tokens."""
+        if tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:tokens])
+        return text[:tokens * CHARS_PER_TOKEN]
+
+    def tail(self, text: str, tokens: int) -> str:
+        """Longest suffix of ``text`` within ``tokens`` tokens."""
+        if tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[-tokens:])
+        return text[-tokens * CHARS_PER_TOKEN:]
+
+
+def file_header(path: str) -> str:
+    """Header placed before each file in the analysis prompt."""
+    return f"=== FILE: {path} ===\n"
+
+
+def truncate_head_tail(text: str, tokens: int, counter: TokenCounter) -> str:
+    """
+    Cut ``text`` to about ``tokens`` tokens, keeping its head and tail.
+
+    Cuts are moved to line boundaries and the omitted part is replaced by a
+    marker stating how many lines were left out.
+    """
+    marker_tokens = counter.count(OMISSION_MARKER.format(lines=0))
+    available = tokens - marker_tokens
+    if available <= 0:
+        return counter.head(text, tokens)
+
+    head_tokens = int(available * HEAD_FRACTION)
+    head = counter.head(text, head_tokens)
+    tail = counter.tail(text[len(head):], available - head_tokens)
+
+    # Snap to whole lines so neither side ends mid-statement
+    if "\n" in head:
+        head = head[:head.rindex("\n") + 1]
+    if "\n" in tail:
+        tail = tail[tail.index("\n") + 1:]
+
+    omitted = text[len(head):len(text) - len(tail)]
+    marker = OMISSION_MARKER.format(lines=omitted.count("\n"))
+    if not head or head.endswith("\n"):
+        marker = marker[1:]
+    return head + marker + tail
+
+
+def allocate_budget(costs: List[int], weights: List[float], budget: int) -> List[int]:
+    """
+    Share a token budget among files by weighted water-filling.
+
+    Every file gets a share proportional to its weight. Files costing less
+    than their share are granted in full and the surplus is shared again among
+    the others, until every remaining file needs more than its share.
+
+    Args:
+        costs: Tokens each file needs to be included whole
+        weights: Relative importance of each file
+        budget: Total tokens available
+
+    Returns:
+        Tokens granted to each file (never more than its cost)
+    """
+    grants = [0] * len(costs)
+    active = set(range(len(costs)))
+    remaining = budget
+
+    while active and remaining > 0:
+        total_weight = sum(weights[i] for i in active)
+        shares = {i: remaining * weights[i] / total_weight for i in active}
+        fitting = [i for i in active if costs[i] <= shares[i]]
+        if not fitting:
+            for i in active:
+                grants[i] = int(shares[i])
+            break
+        for i in fitting:
+            grants[i] = costs[i]
+            remaining -= costs[i]
+            active.discard(i)
+
+    return grants
+
+
+def pack_context(context_chunks: List[Dict], token_budget: int,
+                 model: str = "gpt-4o-mini",
+                 counter: Optional[TokenCounter] = None) -> List[Dict]:
+    """
+    Fit context chunks into a token budget.
+
+    Args:
+        context_chunks: Loaded files with path, content, size, truncated and priority
+        token_budget: Tokens available for the file headers and contents together
+        model: Model whose tokenizer counts the tokens
+        counter: Optional pre-built TokenCounter
+
+    Returns:
+        Packed chunks in the original order with ``content``, ``truncated``
+        and ``tokens`` updated. Files whose share would be too small to be
+        useful are dropped, least important first.
+    """
+    counter = counter or TokenCounter(model)
+    chunks = list(context_chunks)
+    header_costs = [counter.count(file_header(chunk["path"])) for chunk in chunks]
+    content_costs = [counter.count(chunk["content"]) for chunk in chunks]
+
+    grants: List[int] = []
+    while chunks:
+        weights = [1.0 / chunk.get("priority", 1) for chunk in chunks]
+        costs = [h + c for h, c in zip(header_costs, content_costs)]
+        grants = allocate_budget(costs, weights, token_budget)
+
+        # Drop the least important starved file and share its budget again
+        starved = [i for i, grant in enumerate(grants)
+                   if grant < costs[i] and grant - header_costs[i] < MIN_FILE_TOKENS]
+        if not starved:
+            break
+        drop = max(starved, key=lambda i: (chunks[i].get("priority", 1), i))
+        logger.info(f"Dropped {chunks[drop]['path']} from the context: token budget exhausted")
+        del chunks[drop], header_costs[drop], content_costs[drop]
+
+    packed = []
+    for chunk, header_cost, content_cost, grant in zip(chunks, header_costs, content_costs, grants):
+        content_budget = grant - header_cost
+        if content_cost <= content_budget:
+            packed.append({**chunk, "tokens": content_cost})
+            continue
+        content = truncate_head_tail(chunk["content"], content_budget, counter)
+        packed.append({**chunk, "content": content, "truncated": True,
+                       "tokens": counter.count(content)})
+
+    used = sum(chunk["tokens"] + cost for chunk, cost in zip(packed, header_costs))
+    logger.info(f"Packed {len(packed)}/{len(context_chunks)} files into {used}/{token_budget} tokens"
+                f"{'' if counter.exact else ' (estimated)'}")
+    return packed
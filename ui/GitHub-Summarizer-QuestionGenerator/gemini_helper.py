@@ -10,27 +10,36 @@ load_dotenv()
 # Configure Gemini
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
+# One GenerativeModel per model name, shared by all agents using it
+_models = {}
+
+def get_generative_model(model: str) -> genai.GenerativeModel:
+    """Shared GenerativeModel for a model name, created on first use."""
+    if model not in _models:
+        _models[model] = genai.GenerativeModel(model)
+    return _models[model]
+
 class GeminiAgent:
     """Wrapper class to provide OpenAI Agent-like interface for Gemini."""
     
     def __init__(self, name: str, instructions: str, model: str = "gemini-pro-latest"):
         self.name = name
         self.instructions = instructions
-        self.model = genai.GenerativeModel(model)
+        self.model = get_generative_model(model)
     
     async def run(self, input_text: str, conversation_history: list = None) -> str:
         """Run the Gemini model with the given input."""
         try:
-            # Build the full prompt
+            # Build the full prompt; the fixed instructions come first so the prefix can be cached
             full_prompt = f"{self.instructions}\n\n{input_text}"
             
-            # If there's conversation history, include it
+            # If there's conversation history, include it after the instructions
             if conversation_history:
                 history_text = "\n".join([
                     f"{msg['role'].title()}: {msg['content']}"
                     for msg in conversation_history[-8:]
                 ])
-                full_prompt = f"Previous conversation:\n{history_text}\n\n{full_prompt}"
+                full_prompt = f"{self.instructions}\n\nPrevious conversation:\n{history_text}\n\n{input_text}"
             
             # Generate response using run_in_executor for async compatibility
             loop = asyncio.get_event_loop()
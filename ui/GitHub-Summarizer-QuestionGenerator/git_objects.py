@@ -0,0 +1,171 @@
+"""
+Zero-checkout access to repository contents through the git object database.
+
+Files are listed with ``git ls-tree -r -l`` (which reports blob sizes without
+reading the blobs) and selected blobs are read through one long-lived
+``git cat-file --batch`` process, so no working tree is ever written.
+"""
+
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from ``git ls-tree`` at a time
+LIST_READ_SIZE = 64 * 1024
+
+
+class TreeEntry(NamedTuple):
+    """A blob listed from a git tree."""
+    path: str
+    oid: str
+    size: int
+
+
+class GitObjectReader:
+    """Reads trees and blobs of a bare or non-bare repository without checking it out."""
+
+    def __init__(self, git_dir: Path):
+        """
+        Initialize the reader.
+
+        Args:
+            git_dir: Repository (bare mirror or clone) to read objects from
+        """
+        self.git_dir = Path(git_dir)
+        self._batch: Optional[subprocess.Popen] = None
+        self._batch_lock = threading.Lock()
+
+    def _git(self, *args: str) -> str:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=str(self.git_dir),
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        return result.stdout
+
+    def object_type(self, spec: str) -> Optional[str]:
+        """Return the object type of a revision spec (e.g. ``<commit>:src``), or None if missing."""
+        try:
+            return self._git("cat-file", "-t", spec).strip()
+        except subprocess.CalledProcessError:
+            return None
+
+    def list_files(self, commit: str, subfolder: Optional[str] = None) -> Iterator[TreeEntry]:
+        """
+        List regular-file blobs of a commit with their sizes.
+
+        Paths are relative to the repository root. Symlinks and submodules are
+        skipped, matching what a working-tree scan would read. Entries are
+        parsed as ``git ls-tree`` writes them; if the caller stops early the
+        process is terminated instead of listing the rest of the tree.
+        """
+        args = ["git", "ls-tree", "-r", "-l", "-z", "--full-tree", commit]
+        if subfolder:
+            args += ["--", subfolder.strip("/") + "/"]
+        # stderr goes to a file so git never blocks on a full pipe nobody reads
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(args, cwd=str(self.git_dir), stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            pending = b""
+            for chunk in iter(lambda: process.stdout.read1(LIST_READ_SIZE), b""):
+                *records, pending = (pending + chunk).split(b"\0")
+                for record in records:
+                    info, path = record.decode("utf-8", errors="surrogateescape").split("\t", 1)
+                    mode, obj_type, oid, size = info.split()
+                    if obj_type != "blob" or mode == "120000":
+                        continue
+                    yield TreeEntry(path, oid, int(size))
+            if process.wait() != 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(process.returncode, args,
+                                                    stderr=stderr_file.read().decode(errors="replace"))
+        finally:
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+            process.stdout.close()
+            stderr_file.close()
+
+    def count_lines(self, commit: str, subfolder: Optional[str] = None) -> Dict[str, int]:
+        """
+        Count lines of every text blob in scope with ``git grep -c``.
+
+        git reads the blobs itself (multi-threaded) straight from the object
+        database; binary and empty files are omitted from the result.
+        """
+        args = ["grep", "-c", "-I", "-e", "", commit]
+        if subfolder:
+            args += ["--", subfolder.strip("/") + "/"]
+        try:
+            output = self._git(*args)
+        except subprocess.CalledProcessError as e:
+            if e.returncode == 1:  # No matches at all
+                return {}
+            raise
+        prefix = f"{commit}:"
+        counts = {}
+        for line in output.splitlines():
+            if line.startswith(prefix):
+                path, count = line[len(prefix):].rsplit(":", 1)
+                counts[path] = int(count)
+        return counts
+
+    def diff_names(self, base: str, head: str, subfolder: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        List files changed between two commits as ``(status, path)`` pairs.
+
+        Status is git's one-letter code (A, M, D, T). Rename detection is off,
+        so a rename shows up as a deletion plus an addition and only trees are
+        compared, without reading any blob.
+        """
+        args = ["diff", "--no-renames", "--name-status", "-z", base, head]
+        if subfolder:
+            args += ["--", subfolder.strip("/") + "/"]
+        fields = self._git(*args).split("\0")
+        return [(fields[i][0], fields[i + 1]) for i in range(0, len(fields) - 1, 2) if fields[i]]
+
+    def read_blob(self, oid: str) -> bytes:
+        """
+        Read one blob through the shared ``git cat-file --batch`` process.
+
+        ``oid`` may also be a ``<commit>:<path>`` spec.
+        """
+        with self._batch_lock:
+            if self._batch is None:
+                self._batch = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    cwd=str(self.git_dir),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            self._batch.stdin.write(f"{oid}\n".encode())
+            self._batch.stdin.flush()
+            header = self._batch.stdout.readline().decode().split()
+            if len(header) != 3:
+                raise KeyError(f"Object {oid} not found in {self.git_dir}")
+            size = int(header[2])
+            data = self._batch.stdout.read(size)
+            self._batch.stdout.read(1)  # Trailing newline after the object contents
+            return data
+
+    def close(self):
+        """Terminate the ``cat-file`` process."""
+        with self._batch_lock:
+            if self._batch is not None:
+                self._batch.stdin.close()
+                self._batch.wait()
+                self._batch = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
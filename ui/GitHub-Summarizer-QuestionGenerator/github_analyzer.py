@@ -7,19 +7,36 @@ content structuring, efficient OpenAI API usage, and persistent storage.
 
 import os
 import json
+import asyncio
+import time
 import hashlib
 import tempfile
+import functools
+import threading
 import subprocess
-from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, Callable, Dict, Generator, Iterator, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict, field, replace
 from datetime import datetime, timezone
-import sqlite3
+import shutil
 import logging
 
 from dotenv import load_dotenv
-from agents import Agent, Runner
+from agents import Agent, Runner, Usage
 from progress_indicators import LoadingSpinner, ProgressBar, no_progress_context
+from repo_cache import RepoMirrorCache, DEFAULT_CACHE_MAX_BYTES
+from git_objects import GitObjectReader
+from json_stream import JSONSectionParser
+from analysis_schema import (AnalysisOutput, AnalysisOutputError, AnalysisPatch, MalformedOutput,
+                             extract_json_object, output_schema, validate_analysis)
+from context_packer import CHARS_PER_TOKEN, MIN_FILE_TOKENS, pack_context
+from content_filters import ContentFilter, generated_path_reason
+from analysis_store import LOOKUP_KEYS, AnalysisStore
+from repo_scanner import (SKIP_DIRS, SKIP_EXTENSIONS, PrioritySelector, scan_repository,
+                          count_newlines, read_file_head)
 
 # Load environment variables
 load_dotenv()
@@ -28,6 +45,110 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Supported ways of reading repository contents
+INGESTION_BACKENDS = ("worktree", "objects")
+
+# "single": one prompt with the top files; "map_reduce": per-directory summaries reduced into one analysis
+ANALYSIS_MODES = ("single", "map_reduce")
+
+# Analysis fields the model may update incrementally
+INCREMENTAL_FIELDS = ("summary", "objectives", "architecture", "key_components", "tech_stack",
+                      "concepts", "complexity_score", "recommendations")
+
+# Human-readable git diff --name-status codes
+CHANGE_STATUS = {"A": "added", "M": "modified", "D": "deleted", "T": "type changed"}
+
+# Most skipped duplicate and generated files listed in the metadata
+DROPPED_FILES_RECORDED = 100
+
+# Worst priority (main sources) that counts towards saturating the selection;
+# once it is full of such files, later sources and text files cannot improve it
+SATURATION_PRIORITY = 5
+
+# Bump when the prompt or response format changes so stored analyses are not reused
+ANALYSIS_FORMAT_VERSION = 2
+
+# Prompts are split into static instructions (sent first, identical for every
+# analysis so the provider can cache them as a prompt prefix) and a per-call
+# input holding the repository metadata and contents.
+ANALYSIS_INSTRUCTIONS = """
+You are an expert software architect analyzing a codebase. The input describes a repository, or a subfolder
+of it, with its metadata followed by either the contents of its most important files or summaries of its
+directories. Provide a comprehensive analysis of the code in scope as a response in the following JSON format:
+
+{
+    "summary": "Brief 2-3 sentence summary of what the code in scope does",
+    "objectives": ["Main objective 1", "Main objective 2", "..."],
+    "architecture": {
+        "pattern": "Architecture pattern used (MVC, microservices, etc.)",
+        "layers": ["layer1", "layer2", "..."],
+        "key_directories": {"directory": "purpose description"}
+    },
+    "key_components": [
+        {"name": "ComponentName", "type": "class/function/module", "purpose": "what it does", "location": "file path"},
+        ...
+    ],
+    "tech_stack": ["technology1", "technology2", "..."],
+    "concepts": [
+        {"name": "ConceptName", "category": "language|framework|algorithm|theory|networking|io|computation|data_structure|design_pattern|security|testing|other", "description": "Brief description of the concept and how it's used", "examples": ["specific usage example 1", "specific usage example 2"], "importance": "high|medium|low"},
+        ...
+    ],
+    "complexity_score": 1-10,
+    "recommendations": ["improvement suggestion 1", "improvement suggestion 2", "..."]
+}
+
+Focus on:
+1. The overall purpose and functionality of the code in scope
+2. Key architectural patterns and design decisions
+3. Main components and how they interact
+4. Technology stack and dependencies
+5. Programming concepts, algorithms, theories, and technical patterns used
+6. Code quality and potential improvements
+7. Scalability considerations
+8. For a subfolder, how it fits within the larger repository structure
+
+For the concepts section, identify and categorize important technical concepts found in the code:
+- Programming languages and their specific features used
+- Frameworks, libraries, and tools employed
+- Algorithms and data structures implemented
+- Software engineering principles and design patterns
+- Networking protocols and communication methods
+- I/O operations and data handling approaches
+- Low-level computation concepts if applicable
+- Security practices and authentication methods
+- Testing methodologies and quality assurance
+- Any other significant technical concepts
+
+When the input holds directory summaries, combine them into one analysis of the whole scope.
+Provide specific, actionable insights based on the actual code structure and content.
+"""
+
+MAP_INSTRUCTIONS = """
+You are an expert software architect. The input holds the contents of one directory of a repository.
+Your summary will be combined with summaries of the other directories into an analysis of the whole codebase.
+
+Describe in at most 200 words: the purpose of this directory, its main components (name, type, file),
+the technologies and notable programming concepts it uses, and how it connects to the rest of the codebase.
+"""
+
+INCREMENTAL_INSTRUCTIONS = """
+You are an expert software architect keeping the analysis of a codebase up to date.
+
+The input holds your previous analysis of a repository, or a subfolder of it, at an older commit, followed by
+the files that changed since. Update the previous analysis to reflect these changes. Respond with a single JSON
+object using the same keys as the previous analysis. Include only the keys whose value changes, each with its
+complete new value; omit keys that stay the same. Respond with {} if nothing changes.
+"""
+
+REPAIR_INSTRUCTIONS = """
+You fix codebase analysis output that failed validation, keeping its content. Respond with a single JSON object.
+
+Field rules: summary is a non-empty string; objectives, tech_stack and recommendations are lists of strings;
+architecture is an object with pattern, layers and key_directories; key_components is a list of objects with
+name, type, purpose and location; concepts is a list of objects with name, category, description, examples and
+importance; complexity_score is an integer from 1 to 10.
+"""
+
 @dataclass
 class RepositoryMetadata:
     """Metadata about a repository analysis."""
@@ -40,6 +161,11 @@ class RepositoryMetadata:
     file_types: Dict[str, int]
     repo_hash: str
     subfolder: Optional[str] = None
+    totals_exact: bool = True
+    commit_sha: Optional[str] = None
+    tree_sha: Optional[str] = None
+    base_commit_sha: Optional[str] = None
+    dropped_files: List[Dict[str, str]] = field(default_factory=list)  # {"path", "reason"}
 
 @dataclass
 class AnalysisResult:
@@ -55,6 +181,59 @@ class AnalysisResult:
     recommendations: List[str]
     raw_response: str
 
+@dataclass
+class AnalysisStats:
+    """How one analysis was served, how long each stage took and the tokens its model calls used."""
+    outcome: str = "full"  # "cached", "tree_reuse", "incremental" or "full"
+    timings: Dict[str, float] = field(default_factory=dict)
+    usage: Dict[str, int] = field(default_factory=dict)  # requests, input/cached/output tokens
+
+    @property
+    def cache_hit(self) -> bool:
+        """Whether a stored analysis was served without calling the model."""
+        return self.outcome in ("cached", "tree_reuse")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Add the wall-clock time of a block to the named stage."""
+        start = time.perf_counter()
+        token = _active_stats.set(self)
+        try:
+            yield
+        finally:
+            _active_stats.reset(token)
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def add_usage(self, usage: Usage):
+        """Add the token usage of one model run."""
+        for name, value in (("requests", usage.requests), ("input_tokens", usage.input_tokens),
+                            ("cached_tokens", usage.input_tokens_details.cached_tokens),
+                            ("output_tokens", usage.output_tokens)):
+            self.usage[name] = self.usage.get(name, 0) + (value or 0)
+
+# Stats of the analysis stage running in this thread or task; model calls add their usage to it
+_active_stats: ContextVar[Optional[AnalysisStats]] = ContextVar("active_stats", default=None)
+
+def _record_usage(result: Any):
+    """Add a finished run's token usage to the running analysis stage, if any."""
+    stats = _active_stats.get()
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    if not isinstance(usage, Usage):
+        return
+    logger.info(f"Model usage: {usage.input_tokens} input tokens "
+                f"({usage.input_tokens_details.cached_tokens or 0} cached), {usage.output_tokens} output tokens")
+    if stats is not None:
+        stats.add_usage(usage)
+
+def _run_coroutine(coro) -> Any:
+    """Run a coroutine from sync code; inside a running event loop it runs on its own loop in a worker thread."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(copy_context().run, asyncio.run, coro).result()
+
 class RepositoryAnalyzer:
     """Enhanced repository analyzer with OpenAI integration and storage."""
     
@@ -63,50 +242,84 @@ class RepositoryAnalyzer:
                  max_files: int = 25,
                  max_chars_per_file: int = 6000,
                  model: str = "gpt-4o-mini",
-                 show_progress: bool = False):
+                 show_progress: bool = False,
+                 cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 io_workers: int = 8,
+                 ingestion: str = "worktree",
+                 exact_totals: bool = True,
+                 token_budget: Optional[int] = None,
+                 incremental_max_files: int = 10,
+                 analysis_mode: str = "single",
+                 map_concurrency: int = 4,
+                 map_max_groups: int = 32,
+                 repair_attempts: int = 2,
+                 filter_files: bool = True):
         """
         Initialize the repository analyzer.
         
         Args:
             db_path: Path to SQLite database for storing results
-            max_files: Maximum number of files to analyze
+            max_files: Maximum number of files to analyze (with a token_budget,
+                the budget decides how many files fit)
             max_chars_per_file: Maximum characters per file
             model: OpenAI model to use
             show_progress: Whether to show progress indicators (useful for CLI)
+            cache_dir: Directory for the persistent mirror cache (defaults to
+                $REPO_CACHE_DIR; clones go to a temp directory when unset)
+            cache_max_bytes: Disk quota for the mirror cache
+            io_workers: Size of the thread pool used to count and read files
+            ingestion: How repository contents are read: "worktree" (clone and
+                walk a checkout) or "objects" (read straight from the git object
+                database without checking out)
+            exact_totals: Count lines of every important file for the metadata.
+                When False only selected files are read and the scan stops as
+                soon as the selection cannot improve any more
+            token_budget: Token budget for the file contents in the prompt. When
+                set, files are loaded up to the budget instead of
+                max_chars_per_file, and as many files as the budget can hold
+                are selected and packed by priority to fit it (off by default)
+            incremental_max_files: Largest number of changed important files
+                for which a stored analysis of an older commit is updated from
+                the git diff instead of re-analyzed in full (0 disables)
+            analysis_mode: "single" (one prompt with the top max_files files) or
+                "map_reduce" (top max_files files of each top-level directory
+                summarized concurrently, then reduced into one analysis)
+            map_concurrency: Maximum concurrent model calls in map-reduce mode
+            map_max_groups: Maximum directories summarized in map-reduce mode
+                (the ones with the most important files)
+            repair_attempts: Follow-up calls allowed to repair analysis output
+                that does not match the schema before the analysis fails
+            filter_files: Skip lock files, generated and minified code, and
+                exact or near duplicates of selected files, refilling their
+                slots with the next files in priority order
         """
+        if ingestion not in INGESTION_BACKENDS:
+            raise ValueError(f"Unknown ingestion backend '{ingestion}', expected one of {INGESTION_BACKENDS}")
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode '{analysis_mode}', expected one of {ANALYSIS_MODES}")
         self.db_path = db_path
         self.max_files = max_files
         self.max_chars_per_file = max_chars_per_file
         self.model = model
         self.show_progress = show_progress
-        self._init_database()
-        
-    def _init_database(self):
-        """Initialize SQLite database for storing analysis results."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS repository_analyses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    repo_hash TEXT UNIQUE NOT NULL,
-                    repo_url TEXT NOT NULL,
-                    ref_branch TEXT NOT NULL,
-                    subfolder TEXT,
-                    analysis_timestamp TEXT NOT NULL,
-                    metadata TEXT NOT NULL,
-                    analysis_result TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_repo_hash ON repository_analyses(repo_hash)
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_repo_url ON repository_analyses(repo_url)
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_subfolder ON repository_analyses(subfolder)
-            """)
-
+        self.io_workers = max(1, io_workers)
+        self.ingestion = ingestion
+        self.exact_totals = exact_totals
+        self.token_budget = token_budget
+        self.incremental_max_files = incremental_max_files
+        self.analysis_mode = analysis_mode
+        self.map_concurrency = max(1, map_concurrency)
+        self.map_max_groups = max(1, map_max_groups)
+        self.repair_attempts = max(0, repair_attempts)
+        self.filter_files = filter_files
+        cache_dir = cache_dir or os.getenv("REPO_CACHE_DIR")
+        self.repo_cache = RepoMirrorCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # Bounded pool for blocking work (scans, SQLite, mirror updates) of async analyses
+        self._blocking_executor = ThreadPoolExecutor(max_workers=self.io_workers,
+                                                     thread_name_prefix="analyzer-io")
+        self.store = AnalysisStore(db_path)
+        
     def _generate_repo_hash(self, repo_url: str, ref: str, subfolder: Optional[str] = None) -> str:
         """Generate a hash for caching based on repo URL, ref, and subfolder."""
         content = f"{repo_url}#{ref}"
@@ -114,8 +327,111 @@ class RepositoryAnalyzer:
             content += f"@{subfolder}"
         return hashlib.sha256(content.encode()).hexdigest()[:16]
 
-    def _clone_repo_to_tmp(self, repo_url: str, ref: str = "main") -> Path:
-        """Clone a GitHub repository to a temporary directory."""
+    def _settings_hash(self) -> str:
+        """Hash of the analyzer settings that change what the model is shown."""
+        settings = {
+            "model": self.model,
+            "max_files": self.max_files,
+            "max_chars_per_file": self.max_chars_per_file,
+            "token_budget": self.token_budget,
+            "analysis_mode": self.analysis_mode,
+            "filter_files": self.filter_files,
+            "format_version": ANALYSIS_FORMAT_VERSION
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _resolve_commit(self, repo_url: str, ref: str = "main") -> Optional[str]:
+        """
+        Resolve a ref to the commit SHA it currently points to.
+        
+        Uses the mirror cache when configured (refreshing it, which the
+        checkout needs anyway), otherwise ``git ls-remote`` without cloning.
+        
+        Returns:
+            Commit SHA, or None if the ref cannot be resolved
+        """
+        try:
+            if self.repo_cache:
+                self.repo_cache.ensure_mirror(repo_url)
+                return self.repo_cache.resolve_ref(repo_url, ref)
+            
+            if len(ref) == 40 and all(c in "0123456789abcdef" for c in ref.lower()):
+                return ref.lower()
+            
+            output = subprocess.run(
+                ["git", "ls-remote", repo_url, ref, f"{ref}^{{}}"],
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout
+            return self._pick_remote_ref(output, ref)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Could not resolve {repo_url}#{ref}: {e.stderr}")
+        return None
+
+    async def _resolve_commit_async(self, repo_url: str, ref: str = "main") -> Optional[str]:
+        """Async variant of ``_resolve_commit`` running ``git ls-remote`` as an asyncio subprocess."""
+        if self.repo_cache:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._blocking_executor, self._resolve_commit, repo_url, ref)
+        
+        if len(ref) == 40 and all(c in "0123456789abcdef" for c in ref.lower()):
+            return ref.lower()
+        
+        try:
+            output = await self._run_git_async(["ls-remote", repo_url, ref, f"{ref}^{{}}"])
+            return self._pick_remote_ref(output, ref)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Could not resolve {repo_url}#{ref}: {e.stderr}")
+        return None
+
+    def _pick_remote_ref(self, ls_remote_output: str, ref: str) -> Optional[str]:
+        """Pick the commit a ref name points to from ``git ls-remote`` output."""
+        refs = {}
+        for line in ls_remote_output.splitlines():
+            sha, name = line.split("\t", 1)
+            refs[name] = sha
+        # Peeled annotated tags first, then branches, then anything else
+        for name in (f"refs/tags/{ref}^{{}}", f"refs/heads/{ref}", f"refs/tags/{ref}", ref):
+            if name in refs:
+                return refs[name]
+        return None
+
+    async def _run_git_async(self, args: List[str], cwd: Optional[Path] = None) -> str:
+        """Run a git command without blocking the event loop, raising CalledProcessError on failure."""
+        process = await asyncio.create_subprocess_exec(
+            "git", *args,
+            cwd=str(cwd) if cwd else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, ["git", *args],
+                                                stdout.decode(), stderr.decode())
+        return stdout.decode()
+
+    def _rev_parse(self, git_dir: Path, spec: str) -> Optional[str]:
+        """Resolve a revision spec in a local repository, or None if it does not exist."""
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--verify", "--quiet", spec],
+                cwd=str(git_dir),
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout.strip()
+        except subprocess.CalledProcessError:
+            return None
+
+    def _clone_repo_to_tmp(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Path:
+        """
+        Clone a GitHub repository to a temporary directory.
+        
+        When a subfolder is given, a blobless partial clone with a cone-mode
+        sparse checkout is used, so only the blobs of that subfolder and of the
+        root-level manifest files are downloaded.
+        """
         tmp_dir = Path(tempfile.mkdtemp(prefix="repo-analysis-"))
         
         progress_ctx = LoadingSpinner(
@@ -124,24 +440,93 @@ class RepositoryAnalyzer:
         
         try:
             with progress_ctx:
-                subprocess.run(
-                    ["git", "clone", "--depth", "1", "--branch", ref, repo_url, str(tmp_dir)],
-                    check=True,
-                    capture_output=True,
-                    text=True
-                )
-                logger.info(f"Successfully cloned {repo_url}#{ref} to {tmp_dir}")
+                if subfolder:
+                    subprocess.run(
+                        ["git", "clone", "--depth", "1", "--filter=blob:none", "--sparse",
+                         "--branch", ref, repo_url, str(tmp_dir)],
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    )
+                    subprocess.run(
+                        ["git", "sparse-checkout", "set", "--cone", "--", subfolder],
+                        cwd=str(tmp_dir),
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    )
+                    logger.info(f"Successfully cloned {repo_url}#{ref} (sparse: {subfolder}) to {tmp_dir}")
+                else:
+                    subprocess.run(
+                        ["git", "clone", "--depth", "1", "--branch", ref, repo_url, str(tmp_dir)],
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    )
+                    logger.info(f"Successfully cloned {repo_url}#{ref} to {tmp_dir}")
                 
             if self.show_progress:
                 progress_ctx.stop(f"Repository cloned successfully")
             return tmp_dir
         except subprocess.CalledProcessError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
             if self.show_progress:
                 progress_ctx.stop()
                 print(f"✗ Failed to clone repository: {e.stderr}")
             logger.error(f"Failed to clone repository: {e.stderr}")
             raise
 
+    async def _clone_repo_to_tmp_async(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Path:
+        """Async variant of ``_clone_repo_to_tmp`` running git as asyncio subprocesses."""
+        tmp_dir = Path(tempfile.mkdtemp(prefix="repo-analysis-"))
+        try:
+            if subfolder:
+                await self._run_git_async(["clone", "--depth", "1", "--filter=blob:none", "--sparse",
+                                           "--branch", ref, repo_url, str(tmp_dir)])
+                await self._run_git_async(["sparse-checkout", "set", "--cone", "--", subfolder], cwd=tmp_dir)
+                logger.info(f"Successfully cloned {repo_url}#{ref} (sparse: {subfolder}) to {tmp_dir}")
+            else:
+                await self._run_git_async(["clone", "--depth", "1", "--branch", ref, repo_url, str(tmp_dir)])
+                logger.info(f"Successfully cloned {repo_url}#{ref} to {tmp_dir}")
+            return tmp_dir
+        except subprocess.CalledProcessError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.error(f"Failed to clone repository: {e.stderr}")
+            raise
+
+    @contextmanager
+    def _checkout_from_cache(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Iterator[Path]:
+        """
+        Check out a repository ref (sparsely, for subfolders) from the persistent mirror cache.
+        
+        The worktree is leased until the block exits, so concurrent checkouts
+        cannot evict it while it is being read.
+        """
+        progress_ctx = LoadingSpinner(
+            f"Updating cached mirror of {repo_url}#{ref}"
+        ) if self.show_progress else no_progress_context()
+        
+        with ExitStack() as lease:
+            try:
+                with progress_ctx:
+                    worktree = lease.enter_context(self.repo_cache.use_worktree(repo_url, ref, subfolder))
+                    
+                if self.show_progress:
+                    progress_ctx.stop(f"Repository checked out from cache")
+            except subprocess.CalledProcessError as e:
+                if self.show_progress:
+                    progress_ctx.stop()
+                    print(f"✗ Failed to update cached repository: {e.stderr}")
+                logger.error(f"Failed to update cached repository: {e.stderr}")
+                raise
+            yield worktree
+
+    def _mirror_lease(self, repo_url: str):
+        """Keep the cached mirror of a repository from being evicted while it is read."""
+        if self.repo_cache:
+            return self.repo_cache.lease(self.repo_cache.mirror_path(repo_url))
+        return nullcontext()
+
     def _is_important_file(self, path: Path, subfolder_depth: int = 0) -> Tuple[bool, int]:
         """
         Determine if a file is important for analysis and assign priority.
@@ -158,15 +543,11 @@ class RepositoryAnalyzer:
         parts = [p.lower() for p in path.parts]
         
         # Skip these directories entirely
-        skip_dirs = {'.git', 'node_modules', 'dist', 'build', '.next',
-                    '.cache', '__pycache__', '.venv', 'venv', 'env'}
-        if any(part in skip_dirs for part in parts):
+        if any(part in SKIP_DIRS for part in parts):
             return False, 999
             
         # Skip binary and generated files
-        skip_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.exe',
-                          '.zip', '.tar', '.gz', '.bin', '.so', '.dll', '.dylib'}
-        if suffix in skip_extensions:
+        if suffix in SKIP_EXTENSIONS:
             return False, 999
             
         # Priority 1: Critical documentation (adjust for subfolder context)
@@ -220,6 +601,217 @@ class RepositoryAnalyzer:
             type_counts[ext] = type_counts.get(ext, 0) + 1
         return type_counts
 
+    def _char_limit(self) -> int:
+        """Characters loaded per file; with a token budget the packer does the cutting."""
+        if self.token_budget:
+            return max(self.max_chars_per_file, self.token_budget * CHARS_PER_TOKEN)
+        return self.max_chars_per_file
+
+    def _file_limit(self) -> int:
+        """Files selected per prompt: max_files, or as many as the token budget can hold."""
+        if self.token_budget:
+            return max(self.max_files, self.token_budget // MIN_FILE_TOKENS)
+        return self.max_files
+
+    def _directory_group(self, subfolder: Optional[str] = None) -> Callable[[str], str]:
+        """Group files by top-level directory of the analysis scope (scope-root files form their own group)."""
+        scope = PurePosixPath(subfolder.strip('/')) if subfolder else PurePosixPath()
+        
+        def group_of(path: str) -> str:
+            parts = PurePosixPath(path).relative_to(scope).parts
+            return str(scope / parts[0]) if len(parts) > 1 else str(scope)
+        
+        return group_of
+
+    def _select_and_load(self, candidates: Iterator[Tuple[Any, str, int, int]],
+                         read_head, count_lines,
+                         group_by: Optional[Callable[[str], str]] = None) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        Stream candidate files into a bounded priority selection and load it.
+        
+        Args:
+            candidates: Iterator of (key, path relative to repo root, size, priority)
+            read_head: Callable(key) -> (content, line_count, truncated)
+            count_lines: Callable(key) -> line_count
+            group_by: Optional Callable(path) -> group name. Each group then
+                gets its own selection (map-reduce mode) and chunks
+                carry their group
+        
+        Returns:
+            (context_chunks, totals) where totals holds total_files, total_lines,
+            file_types, totals_exact and dropped_files
+        
+        Memory and reads are bounded by the file limit (max_files, or what the
+        token budget can hold, see _file_limit): candidates that cannot make
+        the selection are never opened unless exact totals are requested, in
+        which case they are only line-counted on the bounded pool. Without
+        exact totals the scan stops once the selection is full of files of
+        SATURATION_PRIORITY or better.
+        Every file is read at most once.
+        
+        With filter_files, lock files and generated file names never enter the
+        selection, and twice the file limit is kept per group so files
+        whose contents turn out to be generated, minified or duplicates can be
+        replaced by the next ones in priority order.
+        """
+        file_limit = self._file_limit()
+        capacity = file_limit * 2 if self.filter_files else file_limit
+        selectors: Dict[str, PrioritySelector] = {}
+        group_sizes: Dict[str, int] = {}
+        total_files = 0
+        file_types: Dict[str, int] = {}
+        dropped_files: List[Dict[str, str]] = []
+        line_total = [0]
+        line_lock = threading.Lock()
+        stopped_early = False
+        
+        with ThreadPoolExecutor(max_workers=self.io_workers) as executor:
+            in_flight = threading.BoundedSemaphore(self.io_workers * 4)
+            
+            def on_counted(future):
+                in_flight.release()
+                try:
+                    lines = future.result()
+                except OSError:
+                    return  # Skip files that can't be read
+                with line_lock:
+                    line_total[0] += lines
+            
+            for candidate in candidates:
+                total_files += 1
+                ext = PurePosixPath(candidate[1]).suffix.lower() or 'no_extension'
+                file_types[ext] = file_types.get(ext, 0) + 1
+                
+                reason = generated_path_reason(candidate[1]) if self.filter_files else None
+                if reason:
+                    dropped_files.append({"path": candidate[1], "reason": reason})
+                    if self.exact_totals:
+                        in_flight.acquire()
+                        executor.submit(count_lines, candidate[0]).add_done_callback(on_counted)
+                    continue
+                
+                group = group_by(candidate[1]) if group_by else ""
+                group_sizes[group] = group_sizes.get(group, 0) + 1
+                if group not in selectors:
+                    selectors[group] = PrioritySelector(capacity)
+                selector = selectors[group]
+                
+                dropped = selector.offer(candidate, candidate[3])
+                if dropped is not None and self.exact_totals:
+                    in_flight.acquire()
+                    executor.submit(count_lines, dropped[0]).add_done_callback(on_counted)
+                
+                if (group_by is None and not self.exact_totals
+                        and selector.count_within(SATURATION_PRIORITY) >= selector.capacity):
+                    stopped_early = True
+                    break
+            
+            # Map-reduce covers the largest groups; the rest only count towards totals
+            kept_groups = sorted(selectors, key=lambda g: (-group_sizes[g], g))[:self.map_max_groups]
+            if group_by and len(selectors) > len(kept_groups):
+                logger.info(f"Summarizing the {len(kept_groups)} largest of {len(selectors)} directories")
+                for group in set(selectors) - set(kept_groups):
+                    for candidate in selectors[group].selected():
+                        if self.exact_totals:
+                            in_flight.acquire()
+                            executor.submit(count_lines, candidate[0]).add_done_callback(on_counted)
+            
+            selected = [(group, candidate) for group in sorted(kept_groups)
+                        for candidate in selectors[group].selected()]
+            
+            # Build context chunks with progress
+            if self.show_progress and selected:
+                file_progress = ProgressBar(len(selected), "Loading file contents")
+            
+            loaded = {}
+            read_futures = {executor.submit(read_head, c[0]): c for _, c in selected}
+            for future in as_completed(read_futures):
+                key, path, _, _ = read_futures[future]
+                try:
+                    content, lines, truncated = future.result()
+                    with line_lock:
+                        line_total[0] += lines
+                    loaded[path] = (content, truncated)
+                except Exception as e:
+                    logger.warning(f"Could not read file {path}: {e}")
+                if self.show_progress:
+                    file_progress.update()
+        
+        # Filter in order of preference (priority, then shallower paths) so originals beat copies
+        content_filter = ContentFilter() if self.filter_files else None
+        kept: Dict[str, int] = {}
+        keep = set()
+        for group, (_, path, _, priority) in sorted(selected, key=lambda s: (s[1][3], s[1][1].count("/"))):
+            if path not in loaded or kept.get(group, 0) >= file_limit:
+                continue
+            reason = content_filter.check(path, loaded[path][0]) if content_filter else None
+            if reason:
+                dropped_files.append({"path": path, "reason": reason})
+                continue
+            kept[group] = kept.get(group, 0) + 1
+            keep.add(path)
+        
+        context_chunks = []
+        for group, (_, path, size, priority) in selected:
+            if path not in keep:
+                continue
+            content, truncated = loaded[path]
+            chunk = {
+                "path": path,
+                "content": content,
+                "size": size,
+                "truncated": truncated,
+                "priority": priority
+            }
+            if group_by:
+                chunk["group"] = group
+            context_chunks.append(chunk)
+        
+        if self.show_progress and selected:
+            file_progress.finish(f"Loaded {len(context_chunks)} files successfully")
+        
+        if stopped_early:
+            logger.info(f"Stopped scan early after {total_files} files: selection saturated")
+        if dropped_files:
+            logger.info(f"Skipped {len(dropped_files)} duplicate or generated files")
+        totals = {
+            "total_files": total_files,
+            "total_lines": line_total[0],
+            "file_types": file_types,
+            "totals_exact": self.exact_totals and not stopped_early,
+            "dropped_files": dropped_files[:DROPPED_FILES_RECORDED]
+        }
+        return context_chunks, totals
+
+    def _build_metadata(self, repo_url: str, ref: str, subfolder: Optional[str],
+                        context_chunks: List[Dict], totals: Dict[str, Any],
+                        git_dir: Optional[Path] = None, commit: str = "HEAD") -> RepositoryMetadata:
+        """Create repository metadata from the scan totals and the analyzed commit and tree."""
+        commit_sha = tree_sha = None
+        if git_dir is not None:
+            commit_sha = self._rev_parse(git_dir, f"{commit}^{{commit}}")
+            scope = subfolder.strip('/') if subfolder else ""
+            tree_sha = self._rev_parse(git_dir, f"{commit}:{scope}" if scope else f"{commit}^{{tree}}")
+
+        metadata = RepositoryMetadata(
+            repo_url=repo_url,
+            ref=ref,
+            analysis_timestamp=datetime.now(timezone.utc).isoformat(),
+            total_files=totals["total_files"],
+            analyzed_files=len(context_chunks),
+            total_lines=totals["total_lines"],
+            file_types=totals["file_types"],
+            repo_hash=self._generate_repo_hash(repo_url, ref, subfolder),
+            subfolder=subfolder,
+            totals_exact=totals["totals_exact"],
+            commit_sha=commit_sha,
+            tree_sha=tree_sha,
+            dropped_files=totals.get("dropped_files", [])
+        )
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
+        logger.info(f"Loaded {len(context_chunks)}/{totals['total_files']} files for {scope_text} analysis")
+        return metadata
+
     def _load_repository_context(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Tuple[List[Dict], RepositoryMetadata]:
         """
         Load repository contents with intelligent file selection and metadata.
@@ -232,119 +824,202 @@ class RepositoryAnalyzer:
         Returns:
             (context_chunks, metadata)
         """
-        repo_path = self._clone_repo_to_tmp(repo_url, ref)
-        repo_hash = self._generate_repo_hash(repo_url, ref, subfolder)
+        if self.ingestion == "objects":
+            return self._load_context_from_objects(repo_url, ref, subfolder)
         
+        if self.repo_cache:
+            # Cached worktrees are kept for reuse
+            with self._checkout_from_cache(repo_url, ref, subfolder) as repo_path:
+                return self._load_from_checkout(repo_url, ref, subfolder, repo_path)
+        
+        repo_path = self._clone_repo_to_tmp(repo_url, ref, subfolder)
+        try:
+            return self._load_from_checkout(repo_url, ref, subfolder, repo_path)
+        finally:
+            # Cleanup temp directory
+            shutil.rmtree(repo_path, ignore_errors=True)
+
+    async def _load_repository_context_async(self, repo_url: str, ref: str = "main",
+                                             subfolder: Optional[str] = None) -> Tuple[List[Dict], RepositoryMetadata]:
+        """
+        Async variant of ``_load_repository_context``.
+        
+        Temporary clones run as asyncio subprocesses and the scan runs on the
+        bounded blocking executor. Mirror cache updates (which hold file locks)
+        and object-database reads (one long-lived ``git cat-file`` process) run
+        entirely on the executor.
+        """
+        loop = asyncio.get_running_loop()
+        if self.ingestion == "objects" or self.repo_cache:
+            return await loop.run_in_executor(self._blocking_executor, self._load_repository_context,
+                                              repo_url, ref, subfolder)
+        
+        repo_path = await self._clone_repo_to_tmp_async(repo_url, ref, subfolder)
+        try:
+            return await loop.run_in_executor(self._blocking_executor, self._load_from_checkout,
+                                              repo_url, ref, subfolder, repo_path)
+        finally:
+            await loop.run_in_executor(self._blocking_executor,
+                                       functools.partial(shutil.rmtree, repo_path, ignore_errors=True))
+
+    def _load_from_checkout(self, repo_url: str, ref: str, subfolder: Optional[str],
+                            repo_path: Path) -> Tuple[List[Dict], RepositoryMetadata]:
+        """Scan a checked-out repository and load the selected files."""
+        # Determine analysis path
+        if subfolder:
+            analysis_path = repo_path / subfolder
+            if not analysis_path.exists():
+                raise ValueError(f"Subfolder '{subfolder}' does not exist in repository")
+            if not analysis_path.is_dir():
+                raise ValueError(f"Subfolder '{subfolder}' is not a directory")
+            logger.info(f"Analyzing subfolder: {subfolder}")
+        else:
+            analysis_path = repo_path
+            logger.info("Analyzing entire repository")
+        
+        # Calculate subfolder depth for priority adjustment
+        subfolder_depth = len(subfolder.split('/')) if subfolder else 0
+        
+        # Collect all files with priority scoring
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
+        progress_ctx = LoadingSpinner(
+            f"Scanning and prioritizing files in {scope_text}"
+        ) if self.show_progress else no_progress_context()
+        
+        def candidates():
+            # Priority scoring uses paths relative to the analysis root
+            classify = lambda relative: self._is_important_file(relative, subfolder_depth)
+            for scanned in scan_repository(analysis_path, classify):
+                # Paths in the context are relative to the original repo root
+                relative_path = scanned.path.relative_to(repo_path).as_posix()
+                yield scanned.path, relative_path, scanned.size, scanned.priority
+        
+        with progress_ctx:
+            context_chunks, totals = self._select_and_load(
+                candidates(),
+                read_head=lambda path: read_file_head(path, self._char_limit(), exact_lines=self.exact_totals),
+                count_lines=count_newlines,
+                group_by=self._directory_group(subfolder) if self.analysis_mode == "map_reduce" else None
+            )
+        
+        metadata = self._build_metadata(repo_url, ref, subfolder, context_chunks, totals, repo_path)
+        return context_chunks, metadata
+
+    def _open_object_repository(self, repo_url: str, ref: str = "main") -> Tuple[Path, str]:
+        """
+        Get a local repository holding the objects of ``ref`` without checking it out.
+        
+        Uses the mirror cache when configured, otherwise a shallow bare clone in
+        a temporary directory (the caller removes it).
+        
+        Returns:
+            (git_dir, commit_sha)
+        """
+        progress_ctx = LoadingSpinner(
+            f"Fetching objects for {repo_url}#{ref}"
+        ) if self.show_progress else no_progress_context()
+        
+        tmp_dir = None
         try:
-            # Determine analysis path
-            if subfolder:
-                analysis_path = repo_path / subfolder
-                if not analysis_path.exists():
-                    raise ValueError(f"Subfolder '{subfolder}' does not exist in repository")
-                if not analysis_path.is_dir():
-                    raise ValueError(f"Subfolder '{subfolder}' is not a directory")
-                logger.info(f"Analyzing subfolder: {subfolder}")
-            else:
-                analysis_path = repo_path
-                logger.info("Analyzing entire repository")
-            
-            # Calculate subfolder depth for priority adjustment
-            subfolder_depth = len(subfolder.split('/')) if subfolder else 0
-            
-            # Collect all files with priority scoring
-            scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
-            progress_ctx = LoadingSpinner(
-                f"Scanning and prioritizing files in {scope_text}"
-            ) if self.show_progress else no_progress_context()
-            
-            file_priority_pairs = []
-            total_lines = 0
-            
             with progress_ctx:
-                for path in analysis_path.rglob("*"):
-                    if path.is_file():
-                        # Calculate relative path from analysis root for priority scoring
-                        try:
-                            relative_from_analysis = path.relative_to(analysis_path)
-                            is_important, priority = self._is_important_file(relative_from_analysis, subfolder_depth)
-                            if is_important:
-                                file_priority_pairs.append((path, priority))
-                                
-                                # Count lines for metadata
-                                try:
-                                    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                                        total_lines += sum(1 for _ in f)
-                                except:
-                                    pass  # Skip files that can't be read
-                        except ValueError:
-                            # Skip files that can't be made relative to analysis path
-                            continue
-                            
-            if self.show_progress:
-                progress_ctx.stop(f"Found {len(file_priority_pairs)} analyzable files")
-            
-            # Sort by priority and limit
-            file_priority_pairs.sort(key=lambda x: x[1])
-            selected_files = [fp[0] for fp in file_priority_pairs[:self.max_files]]
+                if self.repo_cache:
+                    git_dir = self.repo_cache.ensure_mirror(repo_url)
+                    commit = self.repo_cache.resolve_ref(repo_url, ref)
+                else:
+                    tmp_dir = Path(tempfile.mkdtemp(prefix="repo-analysis-"))
+                    subprocess.run(
+                        ["git", "clone", "--bare", "--depth", "1", "--branch", ref, repo_url, str(tmp_dir)],
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    )
+                    git_dir = tmp_dir
+                    commit = subprocess.run(
+                        ["git", "rev-parse", "--verify", f"{ref}^{{commit}}"],
+                        cwd=str(tmp_dir),
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    ).stdout.strip()
+                logger.info(f"Reading {repo_url}#{ref} ({commit[:12]}) from the object database")
             
-            # Build context chunks with progress
-            if self.show_progress and selected_files:
-                file_progress = ProgressBar(len(selected_files), "Loading file contents")
+            if self.show_progress:
+                progress_ctx.stop(f"Repository objects ready")
+            return git_dir, commit
+        except subprocess.CalledProcessError as e:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            if self.show_progress:
+                progress_ctx.stop()
+                print(f"✗ Failed to fetch repository: {e.stderr}")
+            logger.error(f"Failed to fetch repository: {e.stderr}")
+            raise
+
+    def _load_context_from_objects(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Tuple[List[Dict], RepositoryMetadata]:
+        """
+        Load repository context straight from the git object database.
+        
+        Files and sizes come from ``git ls-tree -r -l``, line totals from
+        ``git grep -c`` (skipped without exact totals) and only the selected blobs are read, through one
+        ``git cat-file --batch`` process. No working tree is written.
+        """
+        with self._mirror_lease(repo_url):
+            git_dir, commit = self._open_object_repository(repo_url, ref)
             
-            context_chunks = []
-            for i, file_path in enumerate(selected_files):
-                try:
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                    trimmed_content = content[:self.max_chars_per_file]
+            try:
+                with GitObjectReader(git_dir) as reader:
+                    if subfolder:
+                        object_type = reader.object_type(f"{commit}:{subfolder.strip('/')}")
+                        if object_type is None:
+                            raise ValueError(f"Subfolder '{subfolder}' does not exist in repository")
+                        if object_type != "tree":
+                            raise ValueError(f"Subfolder '{subfolder}' is not a directory")
+                        logger.info(f"Analyzing subfolder: {subfolder}")
+                    else:
+                        logger.info("Analyzing entire repository")
                     
-                    # Create path relative to the original repo root for context
-                    relative_path = str(file_path.relative_to(repo_path))
+                    subfolder_depth = len(subfolder.split('/')) if subfolder else 0
+                    scope_root = PurePosixPath(subfolder.strip('/')) if subfolder else PurePosixPath()
                     
-                    context_chunks.append({
-                        "path": relative_path,
-                        "content": trimmed_content,
-                        "size": len(content),
-                        "truncated": len(content) > self.max_chars_per_file
-                    })
+                    def candidates():
+                        for entry in reader.list_files(commit, subfolder):
+                            relative = PurePosixPath(entry.path).relative_to(scope_root)
+                            is_important, priority = self._is_important_file(relative, subfolder_depth)
+                            if is_important:
+                                yield entry, entry.path, entry.size, priority
                     
-                    if self.show_progress:
-                        file_progress.update()
-                        
-                except Exception as e:
-                    logger.warning(f"Could not read file {file_path}: {e}")
-                    if self.show_progress:
-                        file_progress.update()
-            
-            if self.show_progress and selected_files:
-                file_progress.finish(f"Loaded {len(context_chunks)} files successfully")
-            
-            # Create metadata
-            all_files = [fp[0] for fp in file_priority_pairs]
-            file_types = self._analyze_file_types(all_files)
-            
-            metadata = RepositoryMetadata(
-                repo_url=repo_url,
-                ref=ref,
-                analysis_timestamp=datetime.now(timezone.utc).isoformat(),
-                total_files=len(all_files),
-                analyzed_files=len(context_chunks),
-                total_lines=total_lines,
-                file_types=file_types,
-                repo_hash=repo_hash,
-                subfolder=subfolder
-            )
-            
-            scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
-            logger.info(f"Loaded {len(context_chunks)}/{len(all_files)} files for {scope_text} analysis")
-            return context_chunks, metadata
-            
-        finally:
-            # Cleanup temp directory
-            import shutil
-            shutil.rmtree(repo_path, ignore_errors=True)
+                    # Only a full total needs every blob line-counted
+                    line_counts = reader.count_lines(commit, subfolder) if self.exact_totals else None
+                    
+                    char_limit = self._char_limit()
+                    
+                    def read_head(entry):
+                        data = reader.read_blob(entry.oid)
+                        # UTF-8 needs at most 4 bytes per character
+                        content = data[:char_limit * 4].decode('utf-8', errors='ignore')
+                        truncated = len(content) > char_limit or len(data) > char_limit * 4
+                        if line_counts is not None:
+                            lines = line_counts.get(entry.path, 0)
+                        else:
+                            lines = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+                        return content[:char_limit], lines, truncated
+                    
+                    context_chunks, totals = self._select_and_load(
+                        candidates(),
+                        read_head=read_head,
+                        count_lines=lambda entry: line_counts.get(entry.path, 0),
+                                group_by=self._directory_group(subfolder) if self.analysis_mode == "map_reduce" else None
+                    )
+                
+                metadata = self._build_metadata(repo_url, ref, subfolder, context_chunks, totals, git_dir, commit)
+                return context_chunks, metadata
+                
+            finally:
+                if not self.repo_cache:
+                    shutil.rmtree(git_dir, ignore_errors=True)
 
     def _create_analysis_prompt(self, context_chunks: List[Dict], metadata: RepositoryMetadata) -> str:
-        """Create a comprehensive analysis prompt for OpenAI."""
+        """Create the per-call input of an analysis; the static part is ANALYSIS_INSTRUCTIONS."""
         
         # Build file listing with context
         file_listing = "\n".join([
@@ -358,14 +1033,18 @@ class RepositoryAnalyzer:
             for chunk in context_chunks
         ])
         
-        # Determine analysis scope description
-        scope_description = f"subfolder '{metadata.subfolder}'" if metadata.subfolder else "entire repository"
-        analysis_context = f"This analysis focuses on the {scope_description} of the repository."
-        
-        prompt = f"""
-You are an expert software architect analyzing a codebase. Please provide a comprehensive analysis of this {scope_description}.
+        return f"""{self._describe_scope(metadata)}
+FILES ANALYZED:
+{file_listing}
+
+CODEBASE CONTENTS:
+{codebase_content}
+"""
 
-ANALYSIS SCOPE: {analysis_context}
+    def _describe_scope(self, metadata: RepositoryMetadata) -> str:
+        """Analysis scope and repository metadata block opening the analysis inputs."""
+        scope_description = f"subfolder '{metadata.subfolder}'" if metadata.subfolder else "entire repository"
+        return f"""ANALYSIS SCOPE: This analysis focuses on the {scope_description} of the repository.
 
 REPOSITORY METADATA:
 - URL: {metadata.repo_url}
@@ -375,112 +1054,10 @@ REPOSITORY METADATA:
 - Analyzed Files: {metadata.analyzed_files}
 - Total Lines of Code: {metadata.total_lines}
 - File Types: {json.dumps(metadata.file_types, indent=2)}
-
-FILES ANALYZED:
-{file_listing}
-
-CODEBASE CONTENTS:
-{codebase_content}
-
-Please analyze this codebase and provide a response in the following JSON format:
-
-{{
-    "summary": "Brief 2-3 sentence summary of what this {scope_description} does",
-    "objectives": ["Main objective 1", "Main objective 2", "..."],
-    "architecture": {{
-        "pattern": "Architecture pattern used (MVC, microservices, etc.)",
-        "layers": ["layer1", "layer2", "..."],
-        "key_directories": {{"directory": "purpose description"}}
-    }},
-    "key_components": [
-        {{"name": "ComponentName", "type": "class/function/module", "purpose": "what it does", "location": "file path"}},
-        ...
-    ],
-    "tech_stack": ["technology1", "technology2", "..."],
-    "concepts": [
-        {{"name": "ConceptName", "category": "language|framework|algorithm|theory|networking|io|computation|data_structure|design_pattern|security|testing|other", "description": "Brief description of the concept and how it's used", "examples": ["specific usage example 1", "specific usage example 2"], "importance": "high|medium|low"}},
-        ...
-    ],
-    "complexity_score": 1-10,
-    "recommendations": ["improvement suggestion 1", "improvement suggestion 2", "..."]
-}}
-
-Focus on:
-1. The overall purpose and functionality of this {scope_description}
-2. Key architectural patterns and design decisions
-3. Main components and how they interact
-4. Technology stack and dependencies
-5. Programming concepts, algorithms, theories, and technical patterns used
-6. Code quality and potential improvements
-7. Scalability considerations
-{f"8. How this subfolder fits within the larger repository structure" if metadata.subfolder else ""}
-
-For the concepts section, identify and categorize important technical concepts found in the code:
-- Programming languages and their specific features used
-- Frameworks, libraries, and tools employed
-- Algorithms and data structures implemented
-- Software engineering principles and design patterns
-- Networking protocols and communication methods
-- I/O operations and data handling approaches
-- Low-level computation concepts if applicable
-- Security practices and authentication methods
-- Testing methodologies and quality assurance
-- Any other significant technical concepts
-
-Provide specific, actionable insights based on the actual code structure and content.
 """
-        return prompt
 
-    def _parse_openai_response(self, raw_response: str, metadata: RepositoryMetadata) -> AnalysisResult:
-        """Parse OpenAI response into structured format."""
-        try:
-            # Try to extract JSON from the response
-            import re
-            json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-            if json_match:
-                parsed = json.loads(json_match.group())
-            else:
-                # Fallback to basic parsing
-                parsed = {
-                    "summary": raw_response[:200] + "..." if len(raw_response) > 200 else raw_response,
-                    "objectives": [],
-                    "architecture": {},
-                    "key_components": [],
-                    "tech_stack": [],
-                    "concepts": [],
-                    "complexity_score": None,
-                    "recommendations": []
-                }
-                
-            return AnalysisResult(
-                repository_metadata=metadata,
-                summary=parsed.get("summary", ""),
-                objectives=parsed.get("objectives", []),
-                architecture=parsed.get("architecture", {}),
-                key_components=parsed.get("key_components", []),
-                tech_stack=parsed.get("tech_stack", []),
-                concepts=parsed.get("concepts", []),
-                complexity_score=parsed.get("complexity_score"),
-                recommendations=parsed.get("recommendations", []),
-                raw_response=raw_response
-            )
-        except Exception as e:
-            logger.error(f"Error parsing OpenAI response: {e}")
-            # Return basic result with raw response
-            return AnalysisResult(
-                repository_metadata=metadata,
-                summary="Analysis completed but could not parse structured response",
-                objectives=[],
-                architecture={},
-                key_components=[],
-                tech_stack=[],
-                concepts=[],
-                complexity_score=None,
-                recommendations=[],
-                raw_response=raw_response
-            )
-
-    def analyze_repository(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None, force_refresh: bool = False) -> AnalysisResult:
+    def analyze_repository(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None, force_refresh: bool = False,
+                           stats: Optional[AnalysisStats] = None) -> AnalysisResult:
         """
         Analyze a GitHub repository or subfolder using OpenAI.
         
@@ -489,134 +1066,881 @@ Provide specific, actionable insights based on the actual code structure and con
             ref: Branch or tag reference
             subfolder: Optional subfolder path to analyze
             force_refresh: Force re-analysis even if cached result exists
+            stats: Optional AnalysisStats filled with the outcome and stage timings
             
         Returns:
             AnalysisResult object containing structured analysis
+        
+        Stored analyses are keyed by content: the commit the ref resolves to
+        (so new pushes are picked up) plus subfolder and analyzer settings. A
+        result stored for the same commit or the same subfolder tree under any
+        URL, e.g. a fork, is reused. When only an older commit of this ref was
+        analyzed and few files changed since, just those files are sent to the
+        model and merged into the stored analysis.
         """
+        stats = stats if stats is not None else AnalysisStats()
         repo_hash = self._generate_repo_hash(repo_url, ref, subfolder)
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
         
-        # Check for existing analysis
+        # Check for existing analysis of the same commit
         if not force_refresh:
-            existing = self._get_stored_analysis(repo_hash)
+            with stats.stage("resolve"):
+                commit_sha = self._resolve_commit(repo_url, ref)
+            with stats.stage("lookup"):
+                existing = self._find_cached_analysis(repo_url, ref, subfolder, commit_sha)
+                previous = None if existing else self._find_incremental_base(repo_hash, subfolder, commit_sha)
             if existing:
-                scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
-                logger.info(f"Using cached analysis for {repo_url}#{ref} ({scope_text})")
+                stats.outcome = "cached"
                 return existing
+            
+            if previous:
+                with stats.stage("incremental"):
+                    updated = self._analyze_incrementally(previous, repo_url, ref, subfolder, commit_sha)
+                if updated:
+                    stats.outcome = "incremental"
+                    return updated
         
-        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
         logger.info(f"Starting analysis of {repo_url}#{ref} ({scope_text})")
         
         try:
             # Load repository context
-            context_chunks, metadata = self._load_repository_context(repo_url, ref, subfolder)
+            with stats.stage("load"):
+                context_chunks, metadata = self._load_repository_context(repo_url, ref, subfolder)
+            
+            # A different commit can still carry an already analyzed tree
+            if not force_refresh:
+                with stats.stage("lookup"):
+                    existing = self._find_tree_analysis(repo_url, ref, subfolder, metadata)
+                if existing:
+                    stats.outcome = "tree_reuse"
+                    return existing
             
             if not context_chunks:
                 scope_error = f"subfolder '{subfolder}'" if subfolder else "repository"
                 raise ValueError(f"No analyzable files found in {scope_error}")
             
-            # Create analysis prompt
-            prompt = self._create_analysis_prompt(context_chunks, metadata)
+            with stats.stage("model"):
+                if self.analysis_mode == "map_reduce":
+                    output = self._run_map_reduce(context_chunks, metadata, scope_text)
+                else:
+                    context_chunks, prompt = self._prepare_prompt(context_chunks, metadata)
+                    
+                    # Run OpenAI analysis with progress indicator
+                    output = self._run_analysis_agent(ANALYSIS_INSTRUCTIONS, prompt, context_chunks,
+                                                      f"Analyzing {scope_text}")
             
-            # Run OpenAI analysis with progress indicator
-            agent = Agent(
-                model=self.model,
-                name="Advanced Codebase Analyzer",
-                instructions=prompt
-            )
+            with stats.stage("store"):
+                return self._finish_analysis(output, metadata)
             
-            logger.info("Sending request to OpenAI...")
+        except Exception as e:
+            logger.error(f"Error during repository analysis: {e}")
+            raise
+
+    async def analyze_repository_async(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None,
+                                       force_refresh: bool = False,
+                                       stats: Optional[AnalysisStats] = None,
+                                       on_event: Optional[Callable[[Dict], None]] = None) -> AnalysisResult:
+        """
+        Analyze a GitHub repository or subfolder without blocking the event loop.
+        
+        Same behavior and caching as ``analyze_repository``, but model calls
+        await ``Runner.run``, temporary clones and ``git ls-remote`` run as
+        asyncio subprocesses, and blocking file and database work runs on a
+        thread pool bounded by io_workers. Many analyses can run concurrently
+        in one event loop.
+        
+        Args:
+            repo_url: GitHub repository URL
+            ref: Branch or tag reference
+            subfolder: Optional subfolder path to analyze
+            force_refresh: Force re-analysis even if cached result exists
+            stats: Optional AnalysisStats filled with the outcome and stage timings
+            on_event: Optional callback receiving progress events as dictionaries:
+                ``{"event": "stage", "stage": ...}`` when loading and model
+                calls start, ``{"event": "token", "text": ...}`` for each
+                piece of the model's answer, and ``{"event": "section",
+                "name": ..., "value": ...}`` as each top-level field of the
+                analysis is complete. Model calls are then streamed.
             
-            analysis_progress_ctx = LoadingSpinner(
-                f"Analyzing {scope_text} with {self.model}"
-            ) if self.show_progress else no_progress_context()
+        Returns:
+            AnalysisResult object containing structured analysis
+        """
+        stats = stats if stats is not None else AnalysisStats()
+        emit = on_event or (lambda event: None)
+        loop = asyncio.get_running_loop()
+        
+        def blocking(func, *args):
+            return loop.run_in_executor(self._blocking_executor, func, *args)
+        
+        repo_hash = self._generate_repo_hash(repo_url, ref, subfolder)
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
+        
+        # Check for existing analysis of the same commit
+        if not force_refresh:
+            with stats.stage("resolve"):
+                commit_sha = await self._resolve_commit_async(repo_url, ref)
+            with stats.stage("lookup"):
+                existing = await blocking(self._find_cached_analysis, repo_url, ref, subfolder, commit_sha)
+                previous = None if existing else await blocking(self._find_incremental_base,
+                                                                repo_hash, subfolder, commit_sha)
+            if existing:
+                stats.outcome = "cached"
+                return existing
             
-            with analysis_progress_ctx:
-                result = Runner.run_sync(agent, prompt, context=context_chunks)
-                raw_response = result.final_output
-                
-            if self.show_progress:
-                analysis_progress_ctx.stop(f"Analysis completed by {self.model}")
+            if previous:
+                with stats.stage("incremental"):
+                    updated = await self._analyze_incrementally_async(previous, repo_url, ref, subfolder, commit_sha)
+                if updated:
+                    stats.outcome = "incremental"
+                    return updated
+        
+        logger.info(f"Starting analysis of {repo_url}#{ref} ({scope_text})")
+        
+        try:
+            # Load repository context
+            emit({"event": "stage", "stage": "load"})
+            with stats.stage("load"):
+                context_chunks, metadata = await self._load_repository_context_async(repo_url, ref, subfolder)
             
-            # Parse response
-            analysis_result = self._parse_openai_response(raw_response, metadata)
+            # A different commit can still carry an already analyzed tree
+            if not force_refresh:
+                with stats.stage("lookup"):
+                    existing = await blocking(self._find_tree_analysis, repo_url, ref, subfolder, metadata)
+                if existing:
+                    stats.outcome = "tree_reuse"
+                    return existing
             
-            # Store result
-            self._store_analysis_result(analysis_result)
+            if not context_chunks:
+                scope_error = f"subfolder '{subfolder}'" if subfolder else "repository"
+                raise ValueError(f"No analyzable files found in {scope_error}")
+            
+            emit({"event": "stage", "stage": "model"})
+            with stats.stage("model"):
+                if self.analysis_mode == "map_reduce":
+                    output = await self._map_reduce_async(self._group_chunks(context_chunks), metadata, on_event)
+                else:
+                    context_chunks, prompt = await blocking(self._prepare_prompt, context_chunks, metadata)
+                    output = await self._run_analysis_agent_async(ANALYSIS_INSTRUCTIONS, prompt, context_chunks,
+                                                                  on_event)
             
-            logger.info("Analysis completed successfully")
-            return analysis_result
+            with stats.stage("store"):
+                return await blocking(self._finish_analysis, output, metadata)
             
         except Exception as e:
             logger.error(f"Error during repository analysis: {e}")
             raise
 
+    async def stream_analysis(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None,
+                              force_refresh: bool = False) -> AsyncIterator[Dict]:
+        """
+        Analyze a repository, yielding progress as it happens.
+        
+        Yields the events described for ``analyze_repository_async`` while the
+        analysis runs, then ``{"event": "result", "outcome": ..., "analysis":
+        AnalysisResult}`` once it is parsed and stored. Stored and incremental
+        results produce no token or section events. Errors are raised from the
+        iteration; closing the iterator early cancels the analysis.
+        
+        Args:
+            repo_url: GitHub repository URL
+            ref: Branch or tag reference
+            subfolder: Optional subfolder path to analyze
+            force_refresh: Force re-analysis even if cached result exists
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        stats = AnalysisStats()
+        task = asyncio.ensure_future(self.analyze_repository_async(
+            repo_url, ref, subfolder, force_refresh, stats=stats, on_event=queue.put_nowait))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            yield {"event": "result", "outcome": stats.outcome, "analysis": task.result()}
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _find_cached_analysis(self, repo_url: str, ref: str, subfolder: Optional[str],
+                              commit_sha: Optional[str]) -> Optional[AnalysisResult]:
+        """Stored analysis of the resolved commit, or of this URL and ref when it can't be resolved."""
+        if commit_sha:
+            existing = self._find_stored_analysis("commit_sha", commit_sha, subfolder)
+        else:
+            # Ref can't be resolved (e.g. offline): fall back to the last stored result
+            existing = self._get_stored_analysis(self._generate_repo_hash(repo_url, ref, subfolder))
+        if not existing:
+            return None
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
+        logger.info(f"Using cached analysis for {repo_url}#{ref} ({scope_text})")
+        return self._reuse_analysis(existing, repo_url, ref, subfolder)
+
+    def _find_incremental_base(self, repo_hash: str, subfolder: Optional[str],
+                               commit_sha: Optional[str]) -> Optional[AnalysisResult]:
+        """Stored analysis of an older commit of this URL and ref that can be updated incrementally."""
+        if not commit_sha or self.incremental_max_files <= 0:
+            return None
+        previous = self._find_stored_analysis("repo_hash", repo_hash, subfolder)
+        if previous and previous.repository_metadata.commit_sha:
+            return previous
+        return None
+
+    def _find_tree_analysis(self, repo_url: str, ref: str, subfolder: Optional[str],
+                            metadata: RepositoryMetadata) -> Optional[AnalysisResult]:
+        """Stored analysis of the same subfolder tree reached through a different commit."""
+        if not metadata.tree_sha:
+            return None
+        existing = self._find_stored_analysis("tree_sha", metadata.tree_sha, subfolder)
+        if not existing:
+            return None
+        logger.info(f"Reusing analysis of identical tree {metadata.tree_sha[:12]} for {repo_url}#{ref}")
+        return self._reuse_analysis(existing, repo_url, ref, subfolder, metadata)
+
+    def _prepare_prompt(self, context_chunks: List[Dict], metadata: RepositoryMetadata) -> Tuple[List[Dict], str]:
+        """Fit the context into the token budget and build the single-prompt analysis prompt."""
+        # Fit file contents into the token budget
+        if self.token_budget:
+            context_chunks = pack_context(context_chunks, self.token_budget, self.model)
+        
+        # Create analysis prompt
+        return context_chunks, self._create_analysis_prompt(context_chunks, metadata)
+
+    def _finish_analysis(self, output: AnalysisOutput, metadata: RepositoryMetadata) -> AnalysisResult:
+        """Build and store the analysis from the model's validated output."""
+        analysis_result = AnalysisResult(
+            repository_metadata=metadata,
+            raw_response=output.model_dump_json(indent=2),
+            **output.model_dump()
+        )
+        
+        # Store result
+        self._store_analysis_result(analysis_result)
+        
+        logger.info("Analysis completed successfully")
+        return analysis_result
+
+    def _run_analysis_agent(self, instructions: str, prompt: str, context_chunks: List[Dict], progress_text: str,
+                            structured: bool = True) -> Any:
+        """
+        Send an analysis prompt to the model.
+        
+        The static ``instructions`` go out as the system prompt and only the
+        per-call ``prompt`` as input, so the codebase is sent once.
+        
+        Returns:
+            The validated AnalysisOutput, or the raw response text when not
+            ``structured`` (incremental updates answer with a partial object)
+        """
+        agent = Agent(
+            model=self.model,
+            name="Advanced Codebase Analyzer",
+            instructions=instructions,
+            output_type=output_schema(AnalysisOutput) if structured else None
+        )
+        
+        logger.info("Sending request to OpenAI...")
+        
+        analysis_progress_ctx = LoadingSpinner(
+            f"{progress_text} with {self.model}"
+        ) if self.show_progress else no_progress_context()
+        
+        with analysis_progress_ctx:
+            result = Runner.run_sync(agent, prompt, context=context_chunks)
+            _record_usage(result)
+            output = result.final_output
+            if structured:
+                output = self._repair_analysis_output_sync(output)
+            
+        if self.show_progress:
+            analysis_progress_ctx.stop(f"Analysis completed by {self.model}")
+        return output
+
+    async def _run_analysis_agent_async(self, instructions: str, prompt: str, context_chunks: List[Dict],
+                                        on_event: Optional[Callable[[Dict], None]] = None,
+                                        structured: bool = True) -> Any:
+        """Async variant of ``_run_analysis_agent`` awaiting ``Runner.run``."""
+        logger.info("Sending request to OpenAI...")
+        return await self._run_agent_async("Advanced Codebase Analyzer", instructions, prompt, context_chunks,
+                                           on_event, structured)
+
+    async def _run_agent_async(self, name: str, instructions: str, prompt: str, context: Any = None,
+                               on_event: Optional[Callable[[Dict], None]] = None,
+                               structured: bool = False) -> Any:
+        """
+        Run one model call and return its final output.
+        
+        With ``on_event`` the call is streamed with ``Runner.run_streamed``:
+        every text delta is emitted as a token event, and each top-level JSON
+        member as a section event once complete. A ``structured`` call answers
+        with an AnalysisOutput, repaired if necessary.
+        """
+        agent = Agent(model=self.model, name=name, instructions=instructions,
+                      output_type=output_schema(AnalysisOutput) if structured else None)
+        if on_event is None:
+            result = await Runner.run(agent, prompt, context=context)
+            _record_usage(result)
+            return await self._repair_analysis_output(result.final_output) if structured else result.final_output
+        
+        result = Runner.run_streamed(agent, prompt, context=context)
+        parser = JSONSectionParser()
+        async for event in result.stream_events():
+            if event.type != "raw_response_event" or getattr(event.data, "type", None) != "response.output_text.delta":
+                continue
+            on_event({"event": "token", "text": event.data.delta})
+            for section, value in parser.feed(event.data.delta):
+                on_event({"event": "section", "name": section, "value": value})
+        _record_usage(result)
+        return await self._repair_analysis_output(result.final_output) if structured else result.final_output
+
+    def _repair_steps(self, output: Any) -> Generator[Tuple[str, type], Any, AnalysisOutput]:
+        """
+        Turn the analysis agent's output into a valid AnalysisOutput.
+        
+        Output that failed validation is repaired with up to repair_attempts
+        follow-up calls. When the JSON decoded, only the invalid fields are
+        sent back and the corrected fields are merged in; otherwise the broken
+        text is sent to be rewritten. Repair calls never resend the codebase.
+        
+        Yields (prompt, output_type) for each repair call and receives its
+        result, so the sync and async callers share the same steps.
+        
+        Raises:
+            AnalysisOutputError: The output is still invalid after all attempts,
+                so nothing degraded reaches the store
+        """
+        if isinstance(output, AnalysisOutput):
+            return output
+        if isinstance(output, dict):
+            text, data = json.dumps(output), output
+        else:
+            text = output.text if isinstance(output, MalformedOutput) else str(output)
+            data = extract_json_object(text)
+        
+        for attempt in range(self.repair_attempts + 1):
+            errors = {"__root__": "not a JSON object"} if data is None else None
+            if data is not None:
+                analysis, errors = validate_analysis(data)
+                if analysis:
+                    return analysis
+            if attempt == self.repair_attempts:
+                break
+            
+            logger.warning(f"Analysis output invalid ({', '.join(sorted(errors))}), repair attempt {attempt + 1}")
+            if data is None:
+                repaired = yield self._create_repair_prompt(text, errors), AnalysisOutput
+                data = repaired if isinstance(repaired, dict) else extract_json_object(str(repaired))
+                text = json.dumps(repaired) if isinstance(repaired, dict) else str(repaired)
+            else:
+                fragment = {name: data.get(name) for name in errors if name in AnalysisOutput.model_fields}
+                patch = yield self._create_repair_prompt(json.dumps(fragment, indent=2), errors), AnalysisPatch
+                if not isinstance(patch, dict):
+                    patch = extract_json_object(str(patch)) or {}
+                data = {**data, **{name: value for name, value in patch.items() if name in errors}}
+        
+        raise AnalysisOutputError(f"Analysis output still invalid after {self.repair_attempts} repair attempts: "
+                                  + "; ".join(f"{name}: {message}" for name, message in errors.items()))
+
+    async def _repair_analysis_output(self, output: Any) -> AnalysisOutput:
+        """Repair the analysis agent's output (see ``_repair_steps``), awaiting each repair call."""
+        steps = self._repair_steps(output)
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(await self._run_repair_agent(*request))
+        except StopIteration as done:
+            return done.value
+
+    def _repair_analysis_output_sync(self, output: Any) -> AnalysisOutput:
+        """Repair the analysis agent's output (see ``_repair_steps``) with ``Runner.run_sync`` calls."""
+        steps = self._repair_steps(output)
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(self._run_repair_agent_sync(*request))
+        except StopIteration as done:
+            return done.value
+
+    def _repair_agent(self, output_type: type) -> Agent:
+        """The agent for one repair call answering with ``output_type``."""
+        return Agent(model=self.model, name="Analysis Output Repairer", instructions=REPAIR_INSTRUCTIONS,
+                     output_type=output_schema(output_type))
+
+    def _repair_result(self, result: Any) -> Any:
+        """The corrected fields of a repair run as a dict, or the raw text."""
+        _record_usage(result)
+        output = result.final_output
+        if isinstance(output, (AnalysisOutput, AnalysisPatch)):
+            return output.model_dump(exclude_none=True)
+        return output.text if isinstance(output, MalformedOutput) else output
+
+    async def _run_repair_agent(self, prompt: str, output_type: type) -> Any:
+        """Run one repair call; returns the corrected fields as a dict, or the raw text."""
+        return self._repair_result(await Runner.run(self._repair_agent(output_type), prompt))
+
+    def _run_repair_agent_sync(self, prompt: str, output_type: type) -> Any:
+        """Sync variant of ``_run_repair_agent`` using ``Runner.run_sync``."""
+        return self._repair_result(Runner.run_sync(self._repair_agent(output_type), prompt))
+
+    def _create_repair_prompt(self, fragment: str, errors: Dict[str, str]) -> str:
+        """Create the input asking the model to fix invalid analysis output; rules are in REPAIR_INSTRUCTIONS."""
+        problems = "\n".join(f"- {name}: {message}" for name, message in errors.items())
+        if "__root__" in errors:
+            task = "Rewrite this output as one analysis object with all fields."
+        else:
+            task = "These fields failed validation. Return an object with corrected values for exactly these fields."
+        return f"""{task}
+
+PROBLEMS:
+{problems}
+
+OUTPUT TO FIX:
+{fragment}
+"""
+
+    def _run_map_reduce(self, context_chunks: List[Dict], metadata: RepositoryMetadata,
+                        scope_text: str) -> AnalysisOutput:
+        """Summarize each directory group concurrently, then reduce the summaries into one analysis."""
+        groups = self._group_chunks(context_chunks)
+        
+        logger.info(f"Map-reduce analysis of {len(groups)} directories, {self.map_concurrency} at a time")
+        
+        analysis_progress_ctx = LoadingSpinner(
+            f"Summarizing {len(groups)} directories of {scope_text} with {self.model}"
+        ) if self.show_progress else no_progress_context()
+        
+        with analysis_progress_ctx:
+            output = _run_coroutine(self._map_reduce_async(groups, metadata))
+            
+        if self.show_progress:
+            analysis_progress_ctx.stop(f"Analysis completed by {self.model}")
+        return output
+
+    def _group_chunks(self, context_chunks: List[Dict]) -> Dict[str, List[Dict]]:
+        """Split map-reduce context chunks by directory group."""
+        groups: Dict[str, List[Dict]] = {}
+        for chunk in context_chunks:
+            groups.setdefault(chunk["group"], []).append(chunk)
+        return groups
+
+    async def _map_reduce_async(self, groups: Dict[str, List[Dict]], metadata: RepositoryMetadata,
+                                on_event: Optional[Callable[[Dict], None]] = None) -> AnalysisOutput:
+        """
+        Run the map and reduce model calls.
+        
+        Map calls for all groups are started together and bounded by a
+        semaphore of map_concurrency, so wall-clock time grows with the number
+        of groups divided by the concurrency rather than linearly. A failed
+        directory summary is logged and left out of the reduce step. With
+        ``on_event`` the reduce call is streamed.
+        """
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+        
+        async def run_agent(name: str, instructions: str, prompt: str,
+                            on_event: Optional[Callable[[Dict], None]] = None, structured: bool = False) -> Any:
+            async with semaphore:
+                return await self._run_agent_async(name, instructions, prompt, on_event=on_event,
+                                                   structured=structured)
+        
+        async def summarize(group: str, chunks: List[Dict]) -> Tuple[str, Optional[str]]:
+            if self.token_budget:
+                chunks = pack_context(chunks, self.token_budget, self.model)
+            try:
+                return group, await run_agent("Directory Summarizer", MAP_INSTRUCTIONS,
+                                              self._create_map_prompt(group, chunks, metadata))
+            except Exception as e:
+                logger.warning(f"Could not summarize directory {group}: {e}")
+                return group, None
+        
+        results = await asyncio.gather(*(summarize(group, chunks) for group, chunks in groups.items()))
+        summaries = {group: summary for group, summary in results if summary}
+        if not summaries:
+            raise RuntimeError("No directory could be summarized")
+        
+        if on_event:
+            on_event({"event": "stage", "stage": "reduce"})
+        return await run_agent("Advanced Codebase Analyzer", ANALYSIS_INSTRUCTIONS,
+                               self._create_reduce_prompt(summaries, groups, metadata), on_event, structured=True)
+
+    def _create_map_prompt(self, group: str, context_chunks: List[Dict], metadata: RepositoryMetadata) -> str:
+        """Create the input summarizing one directory; the static part is MAP_INSTRUCTIONS."""
+        directory = "the top level" if group == "." else f"directory '{group}'"
+        codebase_content = "\n\n".join([
+            f"=== FILE: {chunk['path']} ===\n{chunk['content']}"
+            for chunk in context_chunks
+        ])
+        return f"""Summarize {directory} of the repository {metadata.repo_url} (branch/ref: {metadata.ref}).
+
+CONTENTS OF {group}:
+{codebase_content}
+"""
+
+    def _create_reduce_prompt(self, summaries: Dict[str, str], groups: Dict[str, List[Dict]],
+                              metadata: RepositoryMetadata) -> str:
+        """Create the input combining directory summaries; the static part is ANALYSIS_INSTRUCTIONS."""
+        directory_summaries = "\n\n".join(
+            f"=== DIRECTORY: {group} ({len(groups[group])} files read) ===\n{summary.strip()}"
+            for group, summary in sorted(summaries.items())
+        )
+        return f"""{self._describe_scope(metadata)}
+The scope was too large to read in one pass, so each directory has been summarized separately.
+
+DIRECTORY SUMMARIES:
+{directory_summaries}
+"""
+
+    def _open_diff_repository(self, repo_url: str, base: str, head: str) -> Tuple[Path, bool]:
+        """
+        Get a local repository holding the trees of two commits.
+        
+        Uses the mirror cache when configured. Otherwise both commits are
+        fetched shallow and blobless into a temporary bare repository; blobs
+        read later are fetched on demand.
+        
+        Returns:
+            (git_dir, is_temporary)
+        """
+        if self.repo_cache:
+            return self.repo_cache.mirror_path(repo_url), False
+        
+        tmp_dir = Path(tempfile.mkdtemp(prefix="repo-diff-"))
+        try:
+            for args in (["init", "--quiet", "--bare"],
+                         ["remote", "add", "origin", repo_url],
+                         ["fetch", "--quiet", "--depth", "1", "--filter=blob:none", "origin", base, head]):
+                subprocess.run(["git", *args], cwd=str(tmp_dir), check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return tmp_dir, True
+
+    def _analyze_incrementally(self, previous: AnalysisResult, repo_url: str, ref: str,
+                               subfolder: Optional[str], commit_sha: str) -> Optional[AnalysisResult]:
+        """
+        Update a stored analysis of an older commit from the git diff.
+        
+        Only the important files changed between the stored commit and
+        ``commit_sha`` are read and sent to the model together with the stored
+        analysis; the model's update is merged into it and the merged analysis
+        is validated (and repaired) like a full one.
+        
+        Returns:
+            Updated AnalysisResult, or None when a full analysis is needed
+            (diff too large, old commit unavailable, or unusable response)
+        """
+        prepared = self._prepare_incremental(previous, repo_url, ref, subfolder, commit_sha)
+        if prepared is None:
+            return None
+        metadata, prompt, context_chunks = prepared
+        if prompt is None:
+            return self._finish_incremental(previous, metadata)
+        
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
+        raw_response = self._run_analysis_agent(INCREMENTAL_INSTRUCTIONS, prompt, context_chunks,
+                                                f"Updating {scope_text} analysis", structured=False)
+        merged = self._merge_incremental_response(previous, raw_response)
+        if merged is None:
+            logger.warning("Could not parse incremental update, running full analysis")
+            return None
+        try:
+            output = self._repair_analysis_output_sync(merged)
+        except AnalysisOutputError as e:
+            logger.warning(f"Invalid incremental update, running full analysis: {e}")
+            return None
+        return self._finish_incremental(previous, metadata, output, raw_response)
+
+    async def _analyze_incrementally_async(self, previous: AnalysisResult, repo_url: str, ref: str,
+                                           subfolder: Optional[str], commit_sha: str) -> Optional[AnalysisResult]:
+        """Async variant of ``_analyze_incrementally``."""
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(self._blocking_executor, self._prepare_incremental,
+                                              previous, repo_url, ref, subfolder, commit_sha)
+        if prepared is None:
+            return None
+        metadata, prompt, context_chunks = prepared
+        if prompt is None:
+            return await loop.run_in_executor(self._blocking_executor, self._finish_incremental, previous, metadata)
+        
+        raw_response = await self._run_analysis_agent_async(INCREMENTAL_INSTRUCTIONS, prompt, context_chunks,
+                                                            structured=False)
+        merged = self._merge_incremental_response(previous, raw_response)
+        if merged is None:
+            logger.warning("Could not parse incremental update, running full analysis")
+            return None
+        try:
+            output = await self._repair_analysis_output(merged)
+        except AnalysisOutputError as e:
+            logger.warning(f"Invalid incremental update, running full analysis: {e}")
+            return None
+        return await loop.run_in_executor(self._blocking_executor, self._finish_incremental,
+                                          previous, metadata, output, raw_response)
+
+    def _prepare_incremental(self, previous: AnalysisResult, repo_url: str, ref: str,
+                             subfolder: Optional[str], commit_sha: str
+                             ) -> Optional[Tuple[RepositoryMetadata, Optional[str], List[Dict]]]:
+        """
+        Diff against the stored commit and build the incremental update prompt.
+        
+        Returns:
+            (metadata, prompt, context_chunks), with prompt None when no
+            important file changed, or None when a full analysis is needed
+        """
+        base = previous.repository_metadata.commit_sha
+        scope_text = f"subfolder '{subfolder}'" if subfolder else "repository"
+        
+        with self._mirror_lease(repo_url):
+            try:
+                git_dir, is_temporary = self._open_diff_repository(repo_url, base, commit_sha)
+            except subprocess.CalledProcessError as e:
+                logger.info(f"Cannot diff against stored commit {base[:12]}, running full analysis: {e.stderr}")
+                return None
+            
+            try:
+                with GitObjectReader(git_dir) as reader:
+                    changes = reader.diff_names(base, commit_sha, subfolder)
+                    
+                    subfolder_depth = len(subfolder.split('/')) if subfolder else 0
+                    scope_root = PurePosixPath(subfolder.strip('/')) if subfolder else PurePosixPath()
+                    important = []
+                    for status, path in changes:
+                        relative = PurePosixPath(path).relative_to(scope_root)
+                        is_important, priority = self._is_important_file(relative, subfolder_depth)
+                        if is_important:
+                            important.append((priority, status, path))
+                    
+                    if len(important) > self.incremental_max_files:
+                        logger.info(f"{len(important)} important files changed since {base[:12]}, running full analysis")
+                        return None
+                    
+                    scope = subfolder.strip('/') if subfolder else ""
+                    metadata = replace(
+                        previous.repository_metadata,
+                        repo_url=repo_url,
+                        ref=ref,
+                        repo_hash=self._generate_repo_hash(repo_url, ref, subfolder),
+                        analysis_timestamp=datetime.now(timezone.utc).isoformat(),
+                        commit_sha=commit_sha,
+                        tree_sha=self._rev_parse(git_dir, f"{commit_sha}:{scope}" if scope else f"{commit_sha}^{{tree}}"),
+                        base_commit_sha=base,
+                        totals_exact=False
+                    )
+                    
+                    if not important:
+                        logger.info(f"No important files changed in {scope_text} since {base[:12]}, reusing analysis")
+                        return metadata, None, []
+                    
+                    logger.info(f"Updating analysis of {repo_url}#{ref} from {len(important)} changed files since {base[:12]}")
+                    char_limit = self._char_limit()
+                    changed_files = []
+                    context_chunks = []
+                    for priority, status, path in sorted(important):
+                        changed_files.append({"path": path, "status": status})
+                        if status == "D":
+                            continue
+                        data = reader.read_blob(f"{commit_sha}:{path}")
+                        content = data[:char_limit * 4].decode('utf-8', errors='ignore')
+                        context_chunks.append({
+                            "path": path,
+                            "content": content[:char_limit],
+                            "size": len(data),
+                            "truncated": len(content) > char_limit or len(data) > char_limit * 4,
+                            "priority": priority
+                        })
+                
+                if self.token_budget:
+                    context_chunks = pack_context(context_chunks, self.token_budget, self.model)
+                
+                prompt = self._create_incremental_prompt(previous, changed_files, context_chunks, metadata)
+                return metadata, prompt, context_chunks
+                
+            except (subprocess.CalledProcessError, KeyError) as e:
+                logger.info(f"Incremental analysis unavailable, running full analysis: {e}")
+                return None
+            finally:
+                if is_temporary:
+                    shutil.rmtree(git_dir, ignore_errors=True)
+
+    def _finish_incremental(self, previous: AnalysisResult, metadata: RepositoryMetadata,
+                            output: Optional[AnalysisOutput] = None,
+                            raw_response: Optional[str] = None) -> AnalysisResult:
+        """Store a validated incremental update (no output: relabel the stored analysis)."""
+        if output is None:
+            updated = replace(previous, repository_metadata=metadata)
+        else:
+            updated = replace(previous, repository_metadata=metadata, raw_response=raw_response,
+                              **output.model_dump())
+        
+        self._store_analysis_result(updated)
+        logger.info("Incremental analysis completed successfully")
+        return updated
+
+    def _create_incremental_prompt(self, previous: AnalysisResult, changed_files: List[Dict],
+                                   context_chunks: List[Dict], metadata: RepositoryMetadata) -> str:
+        """Create the input updating a stored analysis for changed files; the static part is INCREMENTAL_INSTRUCTIONS."""
+        scope_description = f"subfolder '{metadata.subfolder}'" if metadata.subfolder else "entire repository"
+        
+        previous_analysis = {
+            field: getattr(previous, field)
+            for field in INCREMENTAL_FIELDS
+        }
+        
+        change_listing = "\n".join(
+            f"{CHANGE_STATUS.get(change['status'], 'changed')}: {change['path']}"
+            for change in changed_files
+        )
+        
+        codebase_content = "\n\n".join([
+            f"=== FILE: {chunk['path']} ===\n{chunk['content']}"
+            for chunk in context_chunks
+        ])
+        
+        return f"""Previous analysis of the {scope_description} of {metadata.repo_url} (branch/ref: {metadata.ref})
+at commit {metadata.base_commit_sha}, followed by the files that changed up to commit {metadata.commit_sha}.
+
+PREVIOUS ANALYSIS:
+{json.dumps(previous_analysis, indent=2)}
+
+CHANGED FILES:
+{change_listing}
+
+NEW CONTENTS OF ADDED AND MODIFIED FILES:
+{codebase_content or "(only deletions)"}
+"""
+
+    def _merge_incremental_response(self, previous: AnalysisResult, raw_response: str) -> Optional[Dict]:
+        """
+        Merge the model's changed fields into the stored analysis fields.
+        
+        Returns:
+            The merged, not yet validated analysis fields, or None if the
+            response holds no JSON object
+        """
+        updates = extract_json_object(raw_response)
+        if updates is None:
+            return None
+        merged = {field: getattr(previous, field) for field in INCREMENTAL_FIELDS}
+        merged.update((field, updates[field]) for field in INCREMENTAL_FIELDS if field in updates)
+        return merged
+
     def _store_analysis_result(self, analysis: AnalysisResult):
         """Store analysis result in database."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO repository_analyses
-                (repo_hash, repo_url, ref_branch, subfolder, analysis_timestamp, metadata, analysis_result, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                analysis.repository_metadata.repo_hash,
-                analysis.repository_metadata.repo_url,
-                analysis.repository_metadata.ref,
-                analysis.repository_metadata.subfolder,
-                analysis.repository_metadata.analysis_timestamp,
-                json.dumps(asdict(analysis.repository_metadata)),
-                json.dumps(asdict(analysis)),
-                datetime.now(timezone.utc).isoformat()
-            ))
+        self.store.save(asdict(analysis), settings_hash=self._settings_hash())
             
+    def _row_to_analysis(self, analysis_data: Dict) -> AnalysisResult:
+        """Reconstruct an AnalysisResult from its stored dictionary."""
+        metadata = RepositoryMetadata(**analysis_data['repository_metadata'])
+        # Rows stored before concept extraction have no concepts
+        return AnalysisResult(**{'concepts': [], **analysis_data, 'repository_metadata': metadata})
+    
     def _get_stored_analysis(self, repo_hash: str) -> Optional[AnalysisResult]:
         """Retrieve stored analysis result."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    SELECT analysis_result FROM repository_analyses 
-                    WHERE repo_hash = ?
-                """, (repo_hash,))
-                row = cursor.fetchone()
-                
-                if row:
-                    analysis_data = json.loads(row[0])
-                    # Reconstruct AnalysisResult
-                    metadata_data = analysis_data['repository_metadata']
-                    metadata = RepositoryMetadata(**metadata_data)
-                    analysis_data['repository_metadata'] = metadata
-                    return AnalysisResult(**analysis_data)
+            stored = self.store.get(repo_hash)
+            if stored:
+                return self._row_to_analysis(stored)
                     
         except Exception as e:
             logger.error(f"Error retrieving stored analysis: {e}")
         return None
+    
+    def _find_stored_analysis(self, key: str, sha: str, subfolder: Optional[str] = None) -> Optional[AnalysisResult]:
+        """
+        Find the latest analysis of the same content made with the current settings.
+        
+        Args:
+            key: Lookup column: "commit_sha" or "tree_sha" (content, under any
+                repository URL) or "repo_hash" (the last analysis of a URL and ref)
+            sha: Value to match
+            subfolder: Subfolder the analysis must cover
+        """
+        if key not in LOOKUP_KEYS:
+            raise ValueError(f"Unknown content key '{key}'")
+        try:
+            stored = self.store.find(key, sha, subfolder, self._settings_hash())
+            if stored:
+                return self._row_to_analysis(stored)
+                    
+        except Exception as e:
+            logger.error(f"Error retrieving stored analysis: {e}")
+        return None
+    
+    def _reuse_analysis(self, existing: AnalysisResult, repo_url: str, ref: str,
+                        subfolder: Optional[str],
+                        metadata: Optional[RepositoryMetadata] = None) -> AnalysisResult:
+        """
+        Serve a stored analysis for a repository URL and ref.
+        
+        When the stored result was made for another URL or ref (a fork, or a
+        branch at the same commit) it is re-labelled and stored under this one,
+        so history and exports for this repository find it too.
+        """
+        stored = existing.repository_metadata
+        if stored.repo_url == repo_url and stored.ref == ref and metadata is None:
+            return existing
+        
+        repo_metadata = replace(
+            metadata or stored,
+            repo_url=repo_url,
+            ref=ref,
+            subfolder=subfolder,
+            repo_hash=self._generate_repo_hash(repo_url, ref, subfolder),
+            analysis_timestamp=datetime.now(timezone.utc).isoformat()
+        )
+        reused = replace(existing, repository_metadata=repo_metadata)
+        self._store_analysis_result(reused)
+        return reused
+
+    def iter_analysis_history(self, repo_url: Optional[str] = None, limit: Optional[int] = None,
+                              before: Optional[str] = None, since: Optional[str] = None,
+                              before_id: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Stream the history of analyses, newest first.
+        
+        Args:
+            repo_url: Only analyses of this repository URL
+            limit: Maximum entries to return
+            before: Only analyses stored before this ISO 8601 timestamp (the
+                ``created_at`` of the last entry of the previous page)
+            since: Only analyses stored at or after this ISO 8601 timestamp
+            before_id: The ``id`` of the last entry of the previous page, so
+                entries sharing its timestamp are not skipped
+        """
+        return self.store.iter_history(repo_url, limit=limit, before=before, since=since, before_id=before_id)
 
-    def get_analysis_history(self, repo_url: Optional[str] = None) -> List[Dict]:
+    def get_analysis_history(self, repo_url: Optional[str] = None, limit: Optional[int] = None,
+                             before: Optional[str] = None, since: Optional[str] = None,
+                             before_id: Optional[int] = None) -> List[Dict]:
         """Get history of analyses."""
-        with sqlite3.connect(self.db_path) as conn:
-            if repo_url:
-                cursor = conn.execute("""
-                    SELECT repo_url, ref_branch, subfolder, analysis_timestamp, created_at
-                    FROM repository_analyses
-                    WHERE repo_url = ?
-                    ORDER BY created_at DESC
-                """, (repo_url,))
-            else:
-                cursor = conn.execute("""
-                    SELECT repo_url, ref_branch, subfolder, analysis_timestamp, created_at
-                    FROM repository_analyses
-                    ORDER BY created_at DESC
-                """)
-            
-            return [
-                {
-                    'repo_url': row[0],
-                    'ref_branch': row[1],
-                    'subfolder': row[2],
-                    'analysis_timestamp': row[3],
-                    'created_at': row[4]
-                }
-                for row in cursor.fetchall()
-            ]
+        return list(self.iter_analysis_history(repo_url, limit, before, since, before_id))
+
+    def search_analyses(self, query: str, repo_url: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """
+        Full-text search over stored analyses.
+        
+        Matches summaries, objectives, tech stacks, concepts and component names.
+        
+        Args:
+            query: Search terms; all must match (``term*`` matches a prefix)
+            repo_url: Only search analyses of this repository URL
+            limit: Maximum hits to return
+            
+        Returns:
+            Ranked hits with repository, ref, subfolder, snippet and score
+        """
+        return self.store.search(query, repo_url=repo_url, limit=limit)
+
+    def top_technologies(self, limit: int = 20) -> List[Dict]:
+        """Technologies in the most stored analyses, with their analysis counts."""
+        return self.store.top_technologies(limit)
+
+    def top_concepts(self, limit: int = 20, category: Optional[str] = None) -> List[Dict]:
+        """Concepts in the most stored analyses, optionally of one category."""
+        return self.store.top_concepts(limit, category)
+
+    def find_analyses_by_technology(self, technology: str) -> List[Dict]:
+        """Stored analyses whose tech stack includes a technology."""
+        return self.store.analyses_using(technology)
 
     def export_analysis(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Optional[Dict]:
         """Export analysis result as dictionary."""
@@ -0,0 +1,185 @@
+"""
+Shared outbound HTTP clients for the API server.
+
+One ``httpx.AsyncClient`` per upstream service, created once when the app
+starts and closed when it stops. Connections are kept alive and reused, so
+calls skip the TCP and TLS handshake. Each client has its own connection
+limits and timeouts, which bounds the sockets open to any one host. Requests
+are counted by the transport, through httpx's public transport API. HTTP/2 is
+used when the optional ``h2`` package is installed. The OpenAI client used by
+the Agents SDK runs on the ``openai`` pool.
+"""
+
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  # enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """Connection settings for one upstream service."""
+    base_url: str = ""
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
+
+
+# Upstream services; model calls are long, the X API is quick and rate limited
+DEFAULT_CLIENTS = {
+    "openai": ClientConfig(timeout=600.0, max_connections=50, max_keepalive_connections=20),
+    "x": ClientConfig(base_url="https://api.twitter.com", timeout=15.0, max_connections=4,
+                      max_keepalive_connections=2),
+}
+
+
+class ClientRegistry:
+    """Named HTTP clients with keep-alive pools, limits and pool utilization stats."""
+
+    def __init__(self, configs: Optional[Dict[str, ClientConfig]] = None):
+        """
+        Args:
+            configs: Client settings by name; defaults to DEFAULT_CLIENTS
+        """
+        self.configs = dict(configs if configs is not None else DEFAULT_CLIENTS)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._openai = None
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """
+        The client for a service, created on first use.
+
+        Raises:
+            KeyError: No configuration for this name
+        """
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name, self.configs[name])
+        return client
+
+    def openai_client(self):
+        """
+        An ``AsyncOpenAI`` client on the ``openai`` pool, or None without OPENAI_API_KEY.
+
+        The key, base URL and organization are read from the environment as usual.
+        """
+        if self._openai is None and os.getenv("OPENAI_API_KEY"):
+            from openai import AsyncOpenAI
+            config = self.configs["openai"]
+            self._openai = AsyncOpenAI(http_client=self.get("openai"), timeout=config.timeout)
+        return self._openai
+
+    async def start(self):
+        """Create every configured client and make the Agents SDK use the OpenAI one."""
+        for name in self.configs:
+            self.get(name)
+        openai_client = self.openai_client()
+        if openai_client is not None:
+            from agents import set_default_openai_client
+            set_default_openai_client(openai_client, use_for_tracing=False)
+        logger.info(f"HTTP clients ready: {', '.join(self.configs)} (HTTP/2: {HTTP2_AVAILABLE})")
+
+    async def aclose(self):
+        """Close all clients and their pooled connections."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._openai = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Pool utilization per client.
+
+        Returns:
+            For each client: total requests sent, requests in flight (sent and
+            response not yet closed), how many of those exceed max_connections
+            and so wait for a connection (HTTP/1.1), max_connections and
+            utilization (busy connections / max)
+        """
+        stats = {}
+        for name, client in self._clients.items():
+            config = self.configs[name]
+            counts = self._counts.get(name, {})
+            in_flight = counts.get("in_flight", 0)
+            stats[name] = {
+                "requests": counts.get("requests", 0),
+                "in_flight": in_flight,
+                "waiting": max(in_flight - config.max_connections, 0),
+                "max_connections": config.max_connections,
+                "utilization": round(min(in_flight, config.max_connections) / config.max_connections, 3),
+                "http2": HTTP2_AVAILABLE,
+                "closed": client.is_closed,
+            }
+        return stats
+
+    def _create(self, name: str, config: ClientConfig) -> httpx.AsyncClient:
+        """Build a pooled client for one service."""
+        transport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=config.max_connections,
+                                max_keepalive_connections=config.max_keepalive_connections,
+                                keepalive_expiry=config.keepalive_expiry),
+        )
+        counts = self._counts.setdefault(name, {"requests": 0, "in_flight": 0})
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            transport=CountingTransport(transport, counts),
+        )
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport and counts requests sent and in flight until their response is closed."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, counts: Dict[str, int]):
+        self._transport = transport
+        self.counts = counts
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.counts["requests"] += 1
+        self.counts["in_flight"] += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.counts["in_flight"] -= 1
+            raise
+        response.stream = _ClosingStream(response.stream, self._finished)
+        return response
+
+    def _finished(self):
+        self.counts["in_flight"] -= 1
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class _ClosingStream(httpx.AsyncByteStream):
+    """Response body stream that reports once when it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            self._on_close()
+        await self._stream.aclose()
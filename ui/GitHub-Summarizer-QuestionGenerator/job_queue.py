@@ -0,0 +1,302 @@
+"""
+Background jobs for long-running API work.
+
+Repository analyses and repository-based challenges take minutes. Instead of
+holding an HTTP request open for that long, the API submits a job and returns
+its id right away. A fixed number of worker tasks run the jobs, so only that
+many clones and model calls are in progress at once. Clients poll the job or
+follow its events as they happen.
+
+Jobs submitted with the same key while an earlier one is still queued or
+running are coalesced. They get the earlier job back, so duplicate
+submissions share one clone and one set of model calls.
+"""
+
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Worker tasks, i.e. jobs running at the same time
+DEFAULT_JOB_WORKERS = 2
+
+# Jobs waiting for a worker before new submissions are refused
+DEFAULT_MAX_PENDING = 50
+
+# How long finished jobs stay available to GET /jobs/{id}
+DEFAULT_JOB_RETENTION = timedelta(hours=1)
+
+# Events kept per job and replayed to late subscribers; token events are live only
+MAX_JOB_EVENTS = 200
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# A job handler receives the job parameters and a callback for progress events
+JobHandler = Callable[[Dict[str, Any], Callable[[Dict], None]], Awaitable[Any]]
+
+
+class JobQueueFull(RuntimeError):
+    """Too many jobs are waiting for a worker."""
+
+
+class JobFailed(RuntimeError):
+    """The job finished with an error."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Job:
+    """One submitted job and its progress."""
+    id: str
+    kind: str
+    key: Hashable
+    params: Dict[str, Any]
+    status: str = QUEUED
+    stage: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    submissions: int = 1
+    created_at: str = field(default_factory=_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    events: List[Dict] = field(default_factory=list, repr=False)
+    _subscribers: List[asyncio.Queue] = field(default_factory=list, repr=False)
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        """JSON-ready view of the job."""
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "submissions": self.submissions,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """Bounded worker pool running jobs by kind, with coalescing of identical jobs."""
+
+    def __init__(self, handlers: Dict[str, JobHandler],
+                 workers: int = DEFAULT_JOB_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 retention: timedelta = DEFAULT_JOB_RETENTION):
+        """
+        Args:
+            handlers: Coroutine function per job kind, called as
+                ``handler(params, emit)``; its return value is the job result
+            workers: Number of jobs run at the same time
+            max_pending: Queued jobs beyond which ``submit`` raises JobQueueFull
+            retention: How long finished jobs can still be looked up
+        """
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.retention = retention
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[Tuple[str, Hashable], Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(self, kind: str, params: Dict[str, Any], key: Hashable = None) -> Tuple[Job, bool]:
+        """
+        Queue a job, or join an identical one that has not finished.
+
+        Must be called from the event loop that runs the jobs.
+
+        Args:
+            kind: Job kind, one of the handler names
+            params: Arguments passed to the handler
+            key: Identity used for coalescing; defaults to no coalescing
+
+        Returns:
+            (job, coalesced) where coalesced is True when an in-flight job was reused
+
+        Raises:
+            ValueError: Unknown job kind
+            JobQueueFull: max_pending jobs are already waiting
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self._ensure_workers()
+        self._prune()
+
+        if key is not None:
+            existing = self._inflight.get((kind, key))
+            if existing is not None:
+                existing.submissions += 1
+                logger.info(f"Coalesced {kind} job into {existing.id} ({existing.submissions} submissions)")
+                return existing, True
+
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already waiting")
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, key=key, params=params)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._inflight[(kind, key)] = job
+        self._queue.put_nowait(job)
+        self._publish(job, {"event": "status", "status": QUEUED})
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this id, or None if unknown or expired."""
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> Any:
+        """
+        Wait for a job to finish.
+
+        Returns:
+            The job result
+
+        Raises:
+            KeyError: Unknown job id
+            JobFailed: The job failed
+        """
+        job = self._jobs[job_id]
+        await job._done.wait()
+        if job.status == FAILED:
+            raise JobFailed(job.error)
+        return job.result
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict]:
+        """
+        Events of a job: the events so far, then live ones until it finishes.
+
+        Each event is a dictionary with an ``event`` name (``status``,
+        ``stage``, ``section``, ``token``, ...). The last one is a ``status``
+        event with status succeeded or failed.
+
+        Raises:
+            KeyError: Unknown job id
+        """
+        job = self._jobs[job_id]
+        backlog = list(job.events)
+        if job.status in FINISHED:
+            for event in backlog:
+                yield event
+            return
+
+        # Subscribe before the first await, so no event falls between backlog and queue
+        queue: asyncio.Queue = asyncio.Queue()
+        job._subscribers.append(queue)
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if queue in job._subscribers:
+                job._subscribers.remove(queue)
+
+    async def close(self):
+        """Cancel the workers; queued and running jobs are marked failed."""
+        for task in self._worker_tasks:
+            task.cancel()
+        if self._worker_tasks:
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._abandon("job queue closed")
+        self._worker_tasks = []
+        self._queue = None
+        self._loop = None
+
+    def _ensure_workers(self):
+        """Start the workers on the running event loop (again, if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            # The previous loop is gone, and its workers and queue with it
+            self._abandon("event loop closed")
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    def _abandon(self, reason: str):
+        """Fail every job that has not finished."""
+        for job in list(self._jobs.values()):
+            if job.status not in FINISHED:
+                self._finish(job, FAILED, error=reason)
+
+    async def _work(self):
+        """Worker loop: run queued jobs one at a time."""
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status not in FINISHED:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        """Run one job through its handler and record the outcome."""
+        job.status = RUNNING
+        job.started_at = _now()
+        self._publish(job, {"event": "status", "status": RUNNING})
+
+        def emit(event: Dict):
+            if event.get("event") == "stage":
+                job.stage = event.get("stage")
+            self._publish(job, event)
+
+        try:
+            result = await self.handlers[job.kind](job.params, emit)
+        except asyncio.CancelledError:
+            self._finish(job, FAILED, error="cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"{job.kind} job {job.id} failed: {e}")
+            self._finish(job, FAILED, error=str(e))
+        else:
+            self._finish(job, SUCCEEDED, result=result)
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        """Record a job's outcome, release its key and wake its waiters and subscribers."""
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = _now()
+        if self._inflight.get((job.kind, job.key)) is job:
+            del self._inflight[(job.kind, job.key)]
+        self._publish(job, {"event": "status", "status": status, "error": error})
+        for queue in job._subscribers:
+            queue.put_nowait(None)
+        job._subscribers.clear()
+        job._done.set()
+
+    def _publish(self, job: Job, event: Dict):
+        """Send an event to the job's subscribers and keep it for late ones."""
+        if event.get("event") != "token":
+            if len(job.events) >= MAX_JOB_EVENTS:
+                # Keep the first event and the most recent half
+                del job.events[1:len(job.events) - MAX_JOB_EVENTS // 2]
+            job.events.append(event)
+        for queue in job._subscribers:
+            queue.put_nowait(event)
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period."""
+        cutoff = (datetime.now(timezone.utc) - self.retention).isoformat()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.status in FINISHED and job.finished_at < cutoff]:
+            del self._jobs[job_id]
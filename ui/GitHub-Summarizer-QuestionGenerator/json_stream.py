@@ -0,0 +1,84 @@
+"""
+Incremental parsing of a streamed JSON object.
+
+The analysis model answers with one JSON object. While its tokens arrive,
+``JSONSectionParser`` reports each top-level member (``summary``,
+``tech_stack``, ``concepts``...) as soon as its value is complete, so callers
+can show sections long before the whole response has been generated.
+"""
+
+import json
+import logging
+from typing import Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JSONSectionParser:
+    """Yields the completed top-level members of a JSON object fed in pieces."""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Add streamed text.
+
+        Text before the opening brace (e.g. a markdown code fence) and after
+        the closing brace is ignored.
+
+        Returns:
+            (key, value) pairs of the members completed by this piece, in order
+        """
+        if self.done:
+            return []
+        self._text += text
+        sections = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0 and char != "{":
+                continue  # Prose or a code fence before the object
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = i + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    sections.extend(self._complete(i))
+                    self.done = True
+                    self._pos = i + 1
+                    return sections
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                sections.extend(self._complete(i))
+                self._member_start = i + 1
+        self._pos = len(text)
+        return sections
+
+    def _complete(self, end: int) -> List[Tuple[str, Any]]:
+        """Parse the member between the last separator and ``end``."""
+        member = self._text[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            return list(json.loads("{" + member + "}").items())
+        except json.JSONDecodeError:
+            logger.debug(f"Could not parse streamed member: {member[:80]}")
+            return []
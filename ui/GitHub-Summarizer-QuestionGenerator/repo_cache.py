@@ -0,0 +1,360 @@
+"""
+Persistent mirror cache for repository clones.
+
+Each repository URL gets one local bare mirror of its branches and tags that
+is refreshed with an incremental ``git fetch``. Analyses check out per-ref
+worktrees from the mirror instead of cloning over the network every time. The
+cache is bounded by a disk quota and evicts least-recently-used worktrees and
+mirrors, using the sizes recorded when each entry was created or fetched.
+Entries leased by a running analysis are never evicted.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MAX_BYTES = 5 * 1024 ** 3
+MARKER_FILE = "prenup-cache.json"
+
+# Mirrors hold branches and tags only, not pull request or other hosting refs
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+def _run_git(args: List[str], cwd: Optional[Path] = None) -> str:
+    """Run a git command and return its stdout, raising CalledProcessError on failure."""
+    result = subprocess.run(
+        ["git"] + args,
+        cwd=str(cwd) if cwd else None,
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    return result.stdout
+
+
+def _dir_size(path: Path) -> int:
+    """Total size in bytes of all regular files under a directory."""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class RepoMirrorCache:
+    """Bare-mirror cache keyed by repository URL with LRU eviction."""
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 min_fetch_interval: float = 60.0):
+        """
+        Initialize the mirror cache.
+
+        Args:
+            cache_dir: Directory holding mirrors and worktrees
+            max_bytes: Disk quota for the whole cache; LRU entries are evicted above it
+            min_fetch_interval: Seconds during which a fresh mirror is not fetched again
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_bytes = max_bytes
+        self.min_fetch_interval = min_fetch_interval
+        self.mirrors_dir = self.cache_dir / "mirrors"
+        self.worktrees_dir = self.cache_dir / "worktrees"
+        self.locks_dir = self.cache_dir / "locks"
+        for directory in (self.mirrors_dir, self.worktrees_dir, self.locks_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._leases: Dict[Path, int] = {}
+
+    def _key(self, repo_url: str) -> str:
+        """Stable cache key for a repository URL."""
+        normalized = repo_url.strip().rstrip("/")
+        if normalized.endswith(".git"):
+            normalized = normalized[:-4]
+        return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+    def mirror_path(self, repo_url: str) -> Path:
+        """Location of the bare mirror for a repository."""
+        return self.mirrors_dir / f"{self._key(repo_url)}.git"
+
+    @contextmanager
+    def _locked(self, key: str):
+        """Serialize mirror operations for one repository across threads and processes."""
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault(key, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.locks_dir / f"{key}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_marker(self, mirror: Path) -> Dict:
+        try:
+            return json.loads((mirror / MARKER_FILE).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_marker(self, mirror: Path, **updates):
+        marker = self._read_marker(mirror)
+        marker.update(updates)
+        (mirror / MARKER_FILE).write_text(json.dumps(marker))
+
+    def _git_size(self, mirror: Path) -> int:
+        """Bytes of loose and packed objects in a mirror, from ``git count-objects``."""
+        counts = dict(line.split(": ", 1) for line in
+                      _run_git(["count-objects", "-v"], cwd=mirror).splitlines() if ": " in line)
+        return (int(counts.get("size", 0)) + int(counts.get("size-pack", 0))) * 1024
+
+    def _lease_file(self, path: Path) -> Path:
+        return self.locks_dir / f"{path.parent.name}-{path.name}.lease"
+
+    @contextmanager
+    def lease(self, *paths: Path) -> Iterator[None]:
+        """
+        Mark cache entries as in use so eviction skips them until the block exits.
+
+        Leases can be taken before the entry exists. They are counted within the
+        process and held as shared file locks, so other processes using the same
+        cache directory respect them too.
+        """
+        with self._locks_guard:
+            for path in paths:
+                self._leases[path] = self._leases.get(path, 0) + 1
+        lease_files = []
+        try:
+            if fcntl is not None:
+                for path in paths:
+                    lease_file = open(self._lease_file(path), "w")
+                    lease_files.append(lease_file)
+                    fcntl.flock(lease_file, fcntl.LOCK_SH)
+            yield
+        finally:
+            for lease_file in lease_files:
+                lease_file.close()
+            with self._locks_guard:
+                for path in paths:
+                    self._leases[path] -= 1
+                    if not self._leases[path]:
+                        del self._leases[path]
+
+    @contextmanager
+    def _claim(self, path: Path) -> Iterator[bool]:
+        """Take an entry for removal; yields False if it is leased."""
+        with self._locks_guard:
+            if self._leases.get(path):
+                yield False
+                return
+        if fcntl is None:
+            yield True
+            return
+        with open(self._lease_file(path), "w") as lease_file:
+            try:
+                fcntl.flock(lease_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lease_file, fcntl.LOCK_UN)
+
+    def _touch(self, path: Path):
+        """Record a use of a cache entry for LRU ordering."""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def ensure_mirror(self, repo_url: str) -> Path:
+        """
+        Create or refresh the mirror for a repository.
+
+        A missing mirror is cloned with ``git clone --bare``; an existing one
+        is updated with an incremental ``git fetch --prune`` of its branches and
+        tags unless it was fetched less than ``min_fetch_interval`` seconds ago.
+        The mirror's size is recorded in its marker after each clone or fetch.
+        Hold a ``lease`` on ``mirror_path(repo_url)`` while reading the mirror.
+        """
+        key = self._key(repo_url)
+        mirror = self.mirror_path(repo_url)
+
+        with self._locked(key):
+            if mirror.exists():
+                marker = self._read_marker(mirror)
+                if time.time() - marker.get("last_fetch", 0) >= self.min_fetch_interval:
+                    _run_git(["fetch", "--prune", "--quiet", "origin", *MIRROR_REFSPECS], cwd=mirror)
+                    self._write_marker(mirror, last_fetch=time.time(), size=self._git_size(mirror))
+                    logger.info(f"Fetched updates for cached mirror of {repo_url}")
+            else:
+                # Clone next to the final location and rename, so an interrupted
+                # clone never leaves a half-written mirror behind.
+                partial = mirror.with_name(f"{mirror.name}.tmp-{os.getpid()}")
+                shutil.rmtree(partial, ignore_errors=True)
+                try:
+                    _run_git(["clone", "--bare", "--quiet", repo_url, str(partial)])
+                    _run_git(["config", "--replace-all", "remote.origin.fetch", MIRROR_REFSPECS[0]], cwd=partial)
+                    _run_git(["config", "--add", "remote.origin.fetch", MIRROR_REFSPECS[1]], cwd=partial)
+                    partial.rename(mirror)
+                finally:
+                    shutil.rmtree(partial, ignore_errors=True)
+                self._write_marker(mirror, url=repo_url, last_fetch=time.time(), size=self._git_size(mirror))
+                logger.info(f"Created cached mirror of {repo_url}")
+            self._touch(mirror)
+
+        return mirror
+
+    def resolve_ref(self, repo_url: str, ref: str) -> str:
+        """Resolve a branch, tag or commit to a commit SHA in the mirror."""
+        mirror = self.mirror_path(repo_url)
+        return _run_git(["rev-parse", "--verify", f"{ref}^{{commit}}"], cwd=mirror).strip()
+
+    @contextmanager
+    def use_mirror(self, repo_url: str) -> Iterator[Path]:
+        """Create or refresh the mirror and lease it for the duration of the block."""
+        with self.lease(self.mirror_path(repo_url)):
+            yield self.ensure_mirror(repo_url)
+
+    @contextmanager
+    def use_worktree(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Iterator[Path]:
+        """
+        Check out ``ref`` and lease the worktree and its mirror for the duration of the block.
+
+        Worktrees are keyed by the resolved commit, so they are immutable once
+        created and can be shared by concurrent readers of the same ref. When a
+        subfolder is given the worktree uses a cone-mode sparse checkout that
+        materializes only that subfolder plus the files at the repository root.
+        """
+        key = self._key(repo_url)
+        with self.use_mirror(repo_url) as mirror:
+            commit = self.resolve_ref(repo_url, ref)
+            name = commit[:16]
+            if subfolder:
+                name += "-" + hashlib.sha256(subfolder.encode()).hexdigest()[:8]
+            worktree = self.worktrees_dir / key / name
+
+            with self.lease(worktree):
+                with self._locked(key):
+                    if not worktree.exists():
+                        worktree.parent.mkdir(parents=True, exist_ok=True)
+                        if subfolder:
+                            _run_git(["worktree", "add", "--no-checkout", "--detach", "--force",
+                                      str(worktree), commit], cwd=mirror)
+                            _run_git(["sparse-checkout", "set", "--cone", "--", subfolder], cwd=worktree)
+                            _run_git(["checkout", "--quiet", "--detach"], cwd=worktree)
+                        else:
+                            _run_git(["worktree", "add", "--detach", "--force", str(worktree), commit], cwd=mirror)
+                        worktree_sizes = self._read_marker(mirror).get("worktrees", {})
+                        worktree_sizes[name] = _dir_size(worktree)
+                        self._write_marker(mirror, worktrees=worktree_sizes)
+                        logger.info(f"Checked out {repo_url}#{ref} ({commit[:12]}) from mirror cache")
+                    self._touch(worktree)
+                    self._touch(mirror)
+
+                self.evict()
+                yield worktree
+
+    def checkout(self, repo_url: str, ref: str = "main", subfolder: Optional[str] = None) -> Path:
+        """
+        Return a worktree of ``ref`` checked out from the refreshed mirror.
+
+        The worktree is not leased, so a later checkout may evict it; use
+        ``use_worktree`` while reading it.
+        """
+        with self.use_worktree(repo_url, ref, subfolder) as worktree:
+            return worktree
+
+    def _entries(self) -> List[Tuple[float, Path, Optional[Path], int]]:
+        """List cache entries as (last_used, path, owning_mirror_or_None, size)."""
+        entries = []
+        for mirror in self.mirrors_dir.glob("*.git"):
+            marker = self._read_marker(mirror)
+            worktree_sizes = marker.get("worktrees", {})
+            try:
+                entries.append((mirror.stat().st_mtime, mirror, None, marker.get("size", 0)))
+                for worktree in (self.worktrees_dir / mirror.name[:-4]).glob("*"):
+                    entries.append((worktree.stat().st_mtime, worktree, mirror,
+                                    worktree_sizes.get(worktree.name, 0)))
+            except OSError:  # Removed concurrently
+                continue
+        return entries
+
+    def _remove(self, path: Path, mirror: Optional[Path]) -> bool:
+        """
+        Remove a worktree (mirror given) or a mirror and all of its worktrees.
+
+        Returns:
+            False if the entry is leased and was kept
+        """
+        key = (mirror or path).name[:-4]
+        with self._locked(key), self._claim(path) as claimed:
+            if not claimed:
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+            if mirror is not None:
+                if mirror.exists():
+                    try:
+                        _run_git(["worktree", "prune"], cwd=mirror)
+                    except subprocess.CalledProcessError:
+                        pass
+                    worktree_sizes = self._read_marker(mirror).get("worktrees", {})
+                    worktree_sizes.pop(path.name, None)
+                    self._write_marker(mirror, worktrees=worktree_sizes)
+            else:
+                shutil.rmtree(self.worktrees_dir / key, ignore_errors=True)
+            return True
+
+    def evict(self) -> int:
+        """
+        Evict least-recently-used entries until the cache fits its quota.
+
+        Sizes come from the cache markers, so no directory is walked. Worktrees
+        are cheap to recreate and go first; mirrors are evicted only when
+        removing worktrees is not enough. Leased entries are skipped. Returns
+        the number of bytes freed.
+        """
+        entries = self._entries()
+        total = sum(size for _, _, _, size in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        freed = 0
+        removed_paths = set()
+        for _, path, mirror, size in sorted(entries, key=lambda e: (e[2] is None, e[0])):
+            if total - freed <= self.max_bytes:
+                break
+            if path in removed_paths or mirror in removed_paths:
+                continue
+            if mirror is None:
+                size += sum(entry_size for _, p, owner, entry_size in entries
+                            if owner == path and p not in removed_paths)
+            if not self._remove(path, mirror):
+                continue
+            removed_paths.add(path)
+            freed += size
+            logger.info(f"Evicted {path.name} from repository cache ({size} bytes)")
+        return freed
@@ -0,0 +1,196 @@
+"""
+Single-pass repository scanner for the GitHub Repository Analyzer.
+
+Walks a checkout with ``os.scandir``, pruning dependency and build directories
+before descending into them, and yields each important file together with its
+size and priority in one pass. Also provides the streaming file selector and
+the bounded, byte-level file readers used by the load stage.
+"""
+
+import os
+import codecs
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Directories that never contain files worth analyzing
+SKIP_DIRS = frozenset({'.git', 'node_modules', 'dist', 'build', '.next',
+                       '.cache', '__pycache__', '.venv', 'venv', 'env'})
+
+# Binary and generated file extensions
+SKIP_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.exe',
+                             '.zip', '.tar', '.gz', '.bin', '.so', '.dll', '.dylib'})
+
+
+# Read size for byte-level line counting and bounded content reads
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ScannedFile(NamedTuple):
+    """An important file found by the scanner."""
+    path: Path
+    size: int
+    priority: int
+
+
+def scan_repository(root: Path,
+                    classify: Callable[[Path], Tuple[bool, int]]) -> Iterator[ScannedFile]:
+    """
+    Yield the important files under ``root``.
+
+    Args:
+        root: Directory to scan
+        classify: Callable taking a path relative to ``root`` and returning
+            ``(is_important, priority)``
+
+    Skip directories are pruned before descending, symlinked directories are
+    not followed, and file sizes come from the cached ``DirEntry`` stat.
+    Entries are visited in name order so results are deterministic.
+    """
+    stack = [(str(root), ())]
+    while stack:
+        directory, rel_parts = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name.lower() not in SKIP_DIRS:
+                        subdirs.append((entry.path, rel_parts + (entry.name,)))
+                    continue
+                if not entry.is_file():
+                    continue
+                is_important, priority = classify(Path(*rel_parts, entry.name))
+                if is_important:
+                    yield ScannedFile(Path(entry.path), entry.stat().st_size, priority)
+            except OSError:
+                continue  # Broken symlinks, permission errors, files removed mid-scan
+
+        # Push in reverse so directories are visited in name order
+        stack.extend(reversed(subdirs))
+
+
+def count_newlines(path: Path) -> int:
+    """
+    Count lines in a file at byte level without decoding it.
+
+    A final line without a trailing newline still counts as a line, matching
+    iteration over a text file.
+    """
+    lines = 0
+    last = b""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            lines += chunk.count(b"\n")
+            last = chunk
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+def read_file_head(path: Path, max_chars: int, exact_lines: bool = True) -> Tuple[str, int, bool]:
+    """
+    Read at most ``max_chars`` characters of a file while counting its lines.
+
+    The file is opened once: decoding stops as soon as ``max_chars`` characters
+    are available. With ``exact_lines`` the remainder is only scanned for
+    newlines; without it reading stops there and the line count is
+    extrapolated from the part read and the file size.
+
+    Returns:
+        (content, line_count, truncated)
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+    chars = 0
+    lines = 0
+    bytes_read = 0
+    last = b""
+    truncated = False
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            lines += chunk.count(b"\n")
+            bytes_read += len(chunk)
+            last = chunk
+            if chars <= max_chars:
+                text = decoder.decode(chunk)
+                parts.append(text)
+                chars += len(text)
+            else:
+                truncated = True
+            if chars > max_chars and not exact_lines:
+                size = os.fstat(f.fileno()).st_size
+                if size > bytes_read:
+                    truncated = True
+                    lines = round(lines * size / bytes_read)
+                    last = b"\n"
+                break
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    content = "".join(parts)
+    if len(content) > max_chars:
+        truncated = True
+        content = content[:max_chars]
+    return content, lines, truncated
+
+
+class PrioritySelector:
+    """
+    Streaming top-N file selector with per-priority buckets.
+
+    Keeps at most ``capacity`` items across buckets. Ties keep the earliest
+    offered item, matching a stable sort by priority followed by a cut.
+    Memory is bounded by ``capacity`` regardless of how many files are offered.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buckets: Dict[int, List[Any]] = {}
+        self._count = 0
+
+    @property
+    def is_full(self) -> bool:
+        return self._count >= self.capacity
+
+    @property
+    def worst_priority(self) -> Optional[int]:
+        """Largest (least important) priority currently held."""
+        return max(self._buckets) if self._buckets else None
+
+    def count_within(self, priority: int) -> int:
+        """Number of items held with this priority or a better one."""
+        return sum(len(items) for bucket, items in self._buckets.items() if bucket <= priority)
+
+    def accepts(self, priority: int) -> bool:
+        """Whether an item of this priority would be kept if offered now."""
+        if self.capacity <= 0:
+            return False
+        return not self.is_full or priority < self.worst_priority
+
+    def offer(self, item: Any, priority: int) -> Optional[Any]:
+        """
+        Offer an item to the selector.
+
+        Returns the item that no longer fits: the offered item itself when it
+        is rejected, an evicted lower-priority item, or None.
+        """
+        if not self.accepts(priority):
+            return item
+        self._buckets.setdefault(priority, []).append(item)
+        self._count += 1
+        if self._count <= self.capacity:
+            return None
+        worst = self.worst_priority
+        evicted = self._buckets[worst].pop()
+        if not self._buckets[worst]:
+            del self._buckets[worst]
+        self._count -= 1
+        return evicted
+
+    def selected(self) -> List[Any]:
+        """Items in priority order."""
+        return [item for priority in sorted(self._buckets) for item in self._buckets[priority]]
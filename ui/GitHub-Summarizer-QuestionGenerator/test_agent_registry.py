@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared agent registry.
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from agent_registry import AGENT_SPECS, PROVIDERS, AgentRegistry
+from gemini_helper import GeminiAgent
+
+
+def test_agents_built_once():
+    """Test that each agent is built once per provider and reused."""
+    print("🧪 Testing agent reuse...")
+
+    registry = AgentRegistry()
+    registry.warm()
+    assert len(registry._agents) == len(AGENT_SPECS) * len(PROVIDERS)
+    assert registry.get("challenge") is registry.get("challenge", "openai")
+    assert isinstance(registry.get("challenge", "gemini"), GeminiAgent)
+    print("  ✓ Warm-up built every agent for both providers, later lookups reuse them")
+
+    assert registry.get("assistant").handoffs == [registry.get("tutor")]
+    assert registry.get("tutor", "gemini").model is registry.get("challenge", "gemini").model
+    assert len(registry._agents) == len(AGENT_SPECS) * len(PROVIDERS)
+    print("  ✓ Handoffs point at the shared agents and Gemini agents share one model")
+
+
+def test_request_data_in_input():
+    """Test that endpoints send fixed instructions and put request data in the input."""
+    print("🧪 Testing fixed instructions across requests...")
+
+    import api
+
+    calls = []
+
+    async def fake_run(starting_agent, input, **kwargs):
+        calls.append((starting_agent, input))
+        if starting_agent.name == "Progress Card Generator":
+            cards = [{"title": f"Step {i}", "description": "Work"} for i in range(5)]
+            return MagicMock(final_output=json.dumps({"cards": cards}))
+        return MagicMock(final_output="🐛 Find the bug!")
+
+    with patch('agent_registry.Runner.run', side_effect=fake_run):
+        for goal in ("Learn Rust", "Become a data engineer"):
+            response = asyncio.run(api.generate_progress_cards(api.ProgressCardRequest(project_name=goal)))
+            assert response.cards[0].title == "Step 0"
+        for challenge_type in ("debug", "check-in"):
+            response = asyncio.run(api.generate_mini_challenge(api.MiniChallengeRequest(challenge_type=challenge_type)))
+            assert response.challenge_type == challenge_type
+
+    (cards_a, input_a), (cards_b, input_b), (mini_a, mini_input_a), (mini_b, mini_input_b) = calls
+    assert cards_a is cards_b and mini_a is mini_b
+    assert "Learn Rust" in input_a and "Learn Rust" not in cards_a.instructions
+    assert "Become a data engineer" in input_b
+    print("  ✓ Progress cards: same agent and instructions, goal in the input")
+
+    assert "Challenge Type: debug" in mini_input_a and "Challenge Type: check-in" in mini_input_b
+    assert "debug" not in mini_a.instructions
+    print("  ✓ Mini challenges: same agent and instructions, challenge type in the input")
+
+
+if __name__ == "__main__":
+    test_agents_built_once()
+    test_request_data_in_input()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite analysis store.
+"""
+
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from analysis_store import FTS5_AVAILABLE, SCHEMA_VERSION, AnalysisStore
+
+
+def make_analysis(repo_hash, repo_url="https://github.com/test/repo", raw_response="Raw response " * 50):
+    """An analysis dictionary as produced by ``asdict(AnalysisResult)``."""
+    return {
+        "repository_metadata": {
+            "repo_url": repo_url,
+            "ref": "main",
+            "analysis_timestamp": "2023-01-01T00:00:00Z",
+            "total_files": 10,
+            "analyzed_files": 5,
+            "total_lines": 1000,
+            "file_types": {".py": 3, ".md": 2},
+            "repo_hash": repo_hash,
+            "subfolder": None,
+            "commit_sha": "a" * 40,
+        },
+        "summary": "Test repository",
+        "objectives": ["Test objective"],
+        "architecture": {"pattern": "MVC"},
+        "key_components": [],
+        "tech_stack": ["Python"],
+        "concepts": [],
+        "complexity_score": 5,
+        "recommendations": [],
+        "raw_response": raw_response,
+    }
+
+
+def test_legacy_migration():
+    """Test that a database written by the per-call connection code is migrated in place."""
+    print("🧪 Testing legacy database migration...")
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-store-"))
+    db_path = str(tmp_dir / "legacy.db")
+    try:
+        analysis = make_analysis("legacy123")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE repository_analyses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    repo_hash TEXT UNIQUE NOT NULL,
+                    repo_url TEXT NOT NULL,
+                    ref_branch TEXT NOT NULL,
+                    subfolder TEXT,
+                    analysis_timestamp TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    analysis_result TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                INSERT INTO repository_analyses
+                (repo_hash, repo_url, ref_branch, subfolder, analysis_timestamp, metadata, analysis_result, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, ("legacy123", "https://github.com/test/repo", "main", None, "2023-01-01T00:00:00Z",
+                  json.dumps(analysis["repository_metadata"]), json.dumps(analysis), "2023-01-01T00:00:00Z"))
+        conn.close()
+
+        store = AnalysisStore(db_path)
+        conn = store._connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        print("  ✓ Schema upgraded and WAL enabled")
+
+        assert store.get("legacy123") == analysis
+        blob = conn.execute("SELECT analysis_result FROM repository_analyses").fetchone()[0]
+        assert isinstance(blob, bytes) and b"repository_metadata" not in blob
+        print("  ✓ Legacy row readable and stored compressed without duplicated metadata")
+
+        store.close()
+        assert AnalysisStore(db_path).history()[0]["repo_url"] == "https://github.com/test/repo"
+        print("  ✓ Reopening a migrated database is a no-op")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_round_trip_and_lookup():
+    """Test that stored analyses round-trip and are found by content key."""
+    print("🧪 Testing store round trip and lookups...")
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-store-"))
+    try:
+        store = AnalysisStore(str(tmp_dir / "store.db"))
+        analysis = make_analysis("hash1")
+        store.save(analysis, settings_hash="s1")
+
+        assert store.get("hash1") == analysis
+        assert store.get("missing") is None
+        print("  ✓ Analysis round-trips through compression")
+
+        assert store.find("commit_sha", "a" * 40, None, "s1") == analysis
+        assert store.find("commit_sha", "a" * 40, None, "s2") is None
+        assert store.find("commit_sha", "a" * 40, "src", "s1") is None
+        print("  ✓ Lookups honour subfolder and settings hash")
+
+        size = store._connection().execute(
+            "SELECT length(analysis_result) + length(raw_response) FROM repository_analyses").fetchone()[0]
+        assert size < len(json.dumps(analysis)) / 3
+        print("  ✓ Stored blobs are several times smaller than the JSON")
+        store.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_concurrent_readers_and_writer():
+    """Test that readers in other threads and stores never see 'database is locked'."""
+    print("🧪 Testing concurrent store access...")
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-store-"))
+    try:
+        db_path = str(tmp_dir / "store.db")
+        writer = AnalysisStore(db_path)
+        writer.save(make_analysis("hash0"))
+        readers = [AnalysisStore(db_path) for _ in range(2)]
+        errors = []
+
+        def write():
+            try:
+                for i in range(1, 50):
+                    writer.save(make_analysis(f"hash{i}"))
+            except Exception as e:
+                errors.append(e)
+
+        def read(store):
+            try:
+                for _ in range(100):
+                    assert store.get("hash0") is not None
+                    store.history()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write)]
+        threads += [threading.Thread(target=read, args=(store,)) for store in readers for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors, errors
+        assert len(writer.history()) == 50
+        assert len(readers[0]._connections) == 3  # opening thread plus two readers
+        print("  ✓ Four reader threads ran alongside a writer without errors")
+        print("  ✓ Each thread reuses its own connection")
+
+        for store in (writer, *readers):
+            store.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_history_pagination():
+    """Test keyset-paginated history served from the created_at indexes."""
+    print("🧪 Testing history pagination...")
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-store-"))
+    try:
+        store = AnalysisStore(str(tmp_dir / "store.db"))
+        for i in range(25):
+            repo_url = f"https://github.com/test/repo{i % 2}"
+            store.save(make_analysis(f"hash{i}", repo_url=repo_url), created_at=f"2024-01-01T00:00:{i:02d}+00:00")
+        for i in range(25, 30):  # Stored within the same timestamp, across a page boundary
+            store.save(make_analysis(f"hash{i}"), created_at="2024-01-01T00:00:16+00:00")
+
+        pages, before, before_id = [], None, None
+        while True:
+            page = store.history(limit=10, before=before, before_id=before_id)
+            if not page:
+                break
+            pages.append(page)
+            before, before_id = page[-1]["created_at"], page[-1]["id"]
+        keys = [(entry["created_at"], entry["id"]) for page in pages for entry in page]
+        assert [len(page) for page in pages] == [10, 10, 10]
+        assert keys == sorted(keys, reverse=True) and len(set(keys)) == 30
+        print("  ✓ Pages follow each other without gaps or repeats, even within one timestamp")
+
+        entries = store.history("https://github.com/test/repo1", since="2024-01-01T00:00:20+00:00")
+        assert [entry["created_at"][-8:-6] for entry in entries] == ["23", "21"]
+        assert not isinstance(store.iter_history(), list)
+        print("  ✓ Repository and time window filters apply, results stream")
+
+        conn = store._connection()
+        for query, params in (
+            ("SELECT * FROM repository_analyses WHERE repo_url = ? ORDER BY created_at DESC, id DESC LIMIT 10",
+             ("x",)),
+            ("SELECT * FROM repository_analyses WHERE (created_at, id) < (?, ?) "
+             "ORDER BY created_at DESC, id DESC LIMIT 10", ("x", 1)),
+        ):
+            plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+            assert "USING INDEX" in plan and "TEMP B-TREE" not in plan, plan
+        print("  ✓ History pages are read in index order without sorting")
+        store.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_full_text_search():
+    """Test ranked full-text search kept current as analyses are stored and replaced."""
+    print("🧪 Testing full-text search...")
+
+    if not FTS5_AVAILABLE:
+        print("  ⚠️ SQLite built without FTS5, skipping")
+        return
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-store-"))
+    try:
+        store = AnalysisStore(str(tmp_dir / "store.db"))
+        chat = make_analysis("chat", repo_url="https://github.com/test/chat")
+        chat.update(summary="A realtime chat server", tech_stack=["Node.js", "WebSockets"],
+                    concepts=[{"name": "Event loop", "description": "Non-blocking socket handling"}],
+                    key_components=[{"name": "SocketGateway", "type": "class", "purpose": "push"}])
+        blog = make_analysis("blog", repo_url="https://github.com/test/blog")
+        blog.update(summary="A static blog that mentions websockets once", tech_stack=["C++", "Hugo"])
+        store.save(chat)
+        store.save(blog)
+
+        hits = store.search("websockets")
+        assert [hit["repo_url"] for hit in hits] == ["https://github.com/test/chat", "https://github.com/test/blog"]
+        assert "[WebSockets]" in hits[0]["snippet"]
+        print("  ✓ Tech stack matches outrank passing mentions, with snippets")
+
+        assert [hit["repo_hash"] for hit in store.search("socketgateway")] == ["chat"]
+        assert [hit["repo_hash"] for hit in store.search("non-block*")] == ["chat"]
+        assert [hit["repo_hash"] for hit in store.search("c++")] == ["blog"]
+        assert store.search("websockets", repo_url="https://github.com/test/blog")[0]["repo_hash"] == "blog"
+        print("  ✓ Components, concepts, prefixes and punctuation are searchable")
+
+        blog.update(summary="A static blog")
+        store.save(blog)
+        assert [hit["repo_hash"] for hit in store.search("websockets")] == ["chat"]
+        count = store._connection().execute("SELECT count(*) FROM analysis_search").fetchone()[0]
+        assert count == 2
+        print("  ✓ Replacing an analysis replaces its index entry")
+        store.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_aggregation():
+    """Test technology and concept rankings over the normalized tables."""
+    print("🧪 Testing cross-repository aggregation...")
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-store-"))
+    try:
+        store = AnalysisStore(str(tmp_dir / "store.db"))
+        stacks = {"a": ["Python", "FastAPI"], "b": ["python", "React"], "c": ["Python ", "React", "React"]}
+        for repo_hash, stack in stacks.items():
+            analysis = make_analysis(repo_hash, repo_url=f"https://github.com/test/{repo_hash}")
+            analysis.update(tech_stack=stack, concepts=[
+                {"name": "Dependency Injection", "category": "design_pattern", "importance": "high"},
+                {"name": f"Concept {repo_hash}", "category": "theory", "importance": "low"},
+            ])
+            store.save(analysis)
+
+        assert store.top_technologies(2) == [{"technology": "Python", "analyses": 3},
+                                             {"technology": "React", "analyses": 2}]
+        print("  ✓ Technologies ranked with case and spacing folded, duplicates counted once")
+
+        top = store.top_concepts(1)[0]
+        assert (top["concept"], top["analyses"], top["high_importance"]) == ("Dependency Injection", 3, 3)
+        assert {row["concept"] for row in store.top_concepts(category="theory")} == {"Concept a", "Concept b", "Concept c"}
+        print("  ✓ Concepts ranked overall and within a category")
+
+        analysis = make_analysis("c", repo_url="https://github.com/test/c")
+        analysis.update(tech_stack=["Go"])
+        store.save(analysis)
+        assert store.top_technologies(1) == [{"technology": "Python", "analyses": 2}]
+        assert [row["repo_url"] for row in store.analyses_using("GO")] == ["https://github.com/test/c"]
+        print("  ✓ Re-storing an analysis replaces its technology rows")
+        store.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_legacy_migration()
+    test_round_trip_and_lookup()
+    test_concurrent_readers_and_writer()
+    test_history_pagination()
+    test_full_text_search()
+    test_aggregation()
@@ -10,6 +10,7 @@ This script tests the complete workflow including:
 """
 
 import sys
+import asyncio
 import tempfile
 import shutil
 from pathlib import Path
@@ -20,7 +21,12 @@ from unittest.mock import patch, MagicMock
 # Add current directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from github_analyzer import RepositoryAnalyzer, RepositoryMetadata, AnalysisResult
+from agents import Usage
+from github_analyzer import ANALYSIS_INSTRUCTIONS, AnalysisStats, RepositoryAnalyzer, RepositoryMetadata, AnalysisResult
+from context_packer import MIN_FILE_TOKENS, TokenCounter, file_header, pack_context
+from json_stream import JSONSectionParser
+from analysis_schema import AnalysisOutputError, extract_json_object, validate_analysis
+from repo_scanner import PrioritySelector, scan_repository, count_newlines, read_file_head
 
 def test_file_prioritization():
     """Test that file prioritization logic works correctly."""
@@ -117,6 +123,7 @@ def test_database_operations():
             tech_stack=["Python"],
             complexity_score=5,
             recommendations=["Test recommendation"],
+            concepts=[],
             raw_response="Raw test response"
         )
         
@@ -214,6 +221,7 @@ def test_subfolder_database_operations():
             tech_stack=["JavaScript", "React"],
             complexity_score=3,
             recommendations=["Add more tests"],
+            concepts=[],
             raw_response="Raw frontend response"
         )
         
@@ -343,6 +351,504 @@ def test_repository_loading():
         
     finally:
         shutil.rmtree(test_repo, ignore_errors=True)
+
+def test_repository_scanner():
+    """Test that the scanner prunes skip directories before descending."""
+    print("🧪 Testing repository scanner...")
+    
+    test_repo = create_test_repository()
+    (test_repo / "node_modules" / "lib").mkdir(parents=True)
+    (test_repo / "node_modules" / "lib" / "index.js").write_text("module.exports = {};")
+    
+    try:
+        analyzer = RepositoryAnalyzer(show_progress=False)
+        classified = []
+        
+        def classify(relative):
+            classified.append(relative)
+            return analyzer._is_important_file(relative)
+        
+        scanned = list(scan_repository(test_repo, classify))
+        
+        if any('node_modules' in path.parts for path in classified):
+            print("  ✗ Scanner descended into node_modules")
+            return False
+        print("  ✓ node_modules pruned before descending")
+        
+        readme = [entry for entry in scanned if entry.path.name == "README.md"]
+        if readme and readme[0].priority == 1 and readme[0].size == (test_repo / "README.md").stat().st_size:
+            print("  ✓ Scanner yields path, size and priority")
+        else:
+            print("  ✗ Scanner results missing README.md details")
+            return False
+        
+        if all(entry.path.name != ".gitignore" for entry in scanned):
+            print("  ✓ Unimportant files filtered out")
+            return True
+        print("  ✗ Unimportant files returned by scanner")
+        return False
+        
+    finally:
+        shutil.rmtree(test_repo, ignore_errors=True)
+
+def test_bounded_file_reads():
+    """Test byte-level line counting and bounded content reads."""
+    print("🧪 Testing bounded file reads...")
+    
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as tmp:
+        tmp.write("line é\n" * 30000 + "last line without newline")
+        tmp_path = Path(tmp.name)
+    
+    try:
+        expected_lines = len(tmp_path.read_text(encoding='utf-8').splitlines())
+        content, lines, truncated = read_file_head(tmp_path, 100)
+        
+        if not (len(content) == 100 and truncated and lines == expected_lines == count_newlines(tmp_path)):
+            print(f"  ✗ Unexpected result: {len(content)} chars, {lines} lines (expected {expected_lines}), truncated={truncated}")
+            return False
+        print(f"  ✓ Read 100 chars and counted {lines} lines in one pass")
+        
+        with patch('repo_scanner.READ_CHUNK_SIZE', 1024):
+            content, lines, truncated = read_file_head(tmp_path, 100, exact_lines=False)
+        if len(content) != 100 or not truncated or abs(lines - expected_lines) > expected_lines * 0.01:
+            print(f"  ✗ Unexpected approximate result: {lines} lines (expected about {expected_lines})")
+            return False
+        print(f"  ✓ Without exact lines the read stops after the head, {lines} lines estimated")
+        return True
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def test_priority_selection():
+    """Test streaming top-N selection and early scan termination."""
+    print("🧪 Testing priority-bucketed file selection...")
+    
+    selector = PrioritySelector(3)
+    dropped = [selector.offer(name, priority) for name, priority in
+               [("a", 5), ("b", 2), ("c", 5), ("d", 1), ("e", 5), ("f", 2)]]
+    if selector.selected() != ["d", "b", "f"] or dropped != [None, None, None, "c", "e", "a"]:
+        print(f"  ✗ Unexpected selection {selector.selected()} / dropped {dropped}")
+        return False
+    print("  ✓ Selection matches a stable priority sort, evictions reported")
+    
+    analyzer = RepositoryAnalyzer(show_progress=False, max_files=3, exact_totals=False, filter_files=False)
+    consumed = []
+    
+    # Sources and notes come first, the files that saturate the selection are spread between them
+    paths = ([f"src/util{i}.py" for i in range(20)] + ["README.md", "notes.txt", "requirements.txt"]
+             + [f"tests/test_{i}.py" for i in range(20)] + ["main.py"]
+             + [f"src/core/module{i}.py" for i in range(500)] + ["pyproject.toml"])
+    
+    def candidates():
+        for path in paths:
+            consumed.append(path)
+            _, priority = analyzer._is_important_file(Path(path), 0)
+            yield path, path, 10, priority
+    
+    chunks, totals = analyzer._select_and_load(
+        candidates(),
+        read_head=lambda key: (key, 1, False),
+        count_lines=lambda key: 1
+    )
+    if consumed[-1] != "main.py" or totals["totals_exact"] or \
+       [c["path"] for c in chunks] != ["README.md", "requirements.txt", "main.py"]:
+        print(f"  ✗ Scan not stopped early: consumed {len(consumed)} of {len(paths)} candidates")
+        return False
+    print(f"  ✓ Scan stops after {len(consumed)} of {len(paths)} files once the selection is saturated")
+    
+    analyzer.filter_files = True
+    consumed.clear()
+    chunks, totals = analyzer._select_and_load(
+        candidates(),
+        read_head=lambda key: (key, 1, False),
+        count_lines=lambda key: 1
+    )
+    if len(consumed) != len(paths):
+        print(f"  ✗ Stopped with only {len(consumed)} candidates while the doubled selection was not saturated")
+        return False
+    print("  ✓ Filtering keeps scanning until its doubled selection is saturated")
+    
+    analyzer.exact_totals = True
+    analyzer.filter_files = False
+    consumed.clear()
+    chunks, totals = analyzer._select_and_load(
+        candidates(),
+        read_head=lambda key: (key, 1, False),
+        count_lines=lambda key: 1
+    )
+    if totals["total_files"] == len(paths) and totals["total_lines"] == len(paths) and totals["totals_exact"]:
+        print("  ✓ Exact totals still count every candidate")
+        return True
+    print(f"  ✗ Unexpected totals: {totals}")
+    return False
+
+def test_context_packing():
+    """Test token-budget packing of loaded files."""
+    print("🧪 Testing token-budget context packing...")
+    
+    counter = TokenCounter()
+    chunks = [
+        {"path": "README.md", "content": "# Project\nShort readme\n", "size": 24, "truncated": False, "priority": 1},
+        {"path": "src/main.py", "content": "".join(f"line_{i} = {i}\n" for i in range(2000)), "size": 30000, "truncated": False, "priority": 4},
+        {"path": "src/util.py", "content": "".join(f"value_{i} = {i}\n" for i in range(2000)), "size": 30000, "truncated": False, "priority": 5},
+    ]
+    packed = pack_context(chunks, 1000, counter=counter)
+    used = sum(chunk["tokens"] + counter.count(file_header(chunk["path"])) for chunk in packed)
+    
+    if used > 1000:
+        print(f"  ✗ Packed context uses {used} tokens, budget 1000")
+        return False
+    print(f"  ✓ Packed context fits the budget ({used}/1000 tokens)")
+    
+    readme, main, util = packed
+    if readme["content"] != chunks[0]["content"] or readme["truncated"]:
+        print("  ✗ Small file was not kept whole")
+        return False
+    print("  ✓ Small files kept whole")
+    
+    if not (main["truncated"] and main["content"].startswith("line_0 = 0") and
+            main["content"].endswith("line_1999 = 1999\n") and "lines omitted" in main["content"]):
+        print("  ✗ Large file not cut to head and tail")
+        return False
+    if main["tokens"] <= util["tokens"]:
+        print("  ✗ Higher priority file did not get a larger share")
+        return False
+    print("  ✓ Large files keep head and tail, shares follow priority")
+    
+    if len(pack_context(chunks, 100, counter=counter)) == 3:
+        print("  ✗ Starved files were not dropped")
+        return False
+    print("  ✓ Files that cannot get a useful share are dropped")
+    
+    # The budget, not max_files, decides how many files are selected
+    analyzer = RepositoryAnalyzer(show_progress=False, max_files=2, token_budget=640, filter_files=False)
+    candidates = ((f"src/module{i}.py", f"src/module{i}.py", 10, 6) for i in range(30))
+    chunks, _ = analyzer._select_and_load(
+        candidates,
+        read_head=lambda key: ("x = 1\n", 1, False),
+        count_lines=lambda key: 1
+    )
+    if len(chunks) != 640 // MIN_FILE_TOKENS:
+        print(f"  ✗ Selected {len(chunks)} files for the budget, expected {640 // MIN_FILE_TOKENS}")
+        return False
+    print(f"  ✓ Token budget selects {len(chunks)} files past max_files=2")
+    return True
+
+def test_content_filtering():
+    """Test that duplicate, generated and minified files give up their slots."""
+    print("🧪 Testing duplicate and generated file filtering...")
+    
+    def module(name):
+        return "".join(f"def {name}_step_{i}(value):\n    return value * {i} + {name}_offset\n\n" for i in range(40))
+    
+    parser = module("parser")
+    files = {
+        "README.md": "# Filter test\nA repository with copies.",
+        "src/parser.py": parser,
+        "src/models.py": module("models"),
+        "src/utils.py": module("utils"),
+        "src/views.py": module("views"),
+        "lib/parser_copy.py": parser,
+        "vendor/parser.py": parser.replace("parser_step_3(", "parser_step_three("),
+        "src/generated_client.py": "# Code generated by openapi-generator. DO NOT EDIT.\n" + module("client"),
+        "static/app.js": "var a=function(b){return b*2};" * 100,
+        "src/api_pb2.py": module("proto"),
+        "package-lock.json": '{"lockfileVersion": 3}',
+        "docs/guide.md": "# Guide\nThis page is auto-generated from the API. Do not edit.\n",
+        "src/schema.py": "import json\n# Code generated by the build below, DO NOT EDIT\n" + module("schema"),
+    }
+    test_repo = Path(tempfile.mkdtemp(prefix="test-repo-"))
+    for path, content in files.items():
+        (test_repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (test_repo / path).write_text(content)
+    
+    try:
+        # One slot more than there are distinct files, so every copy gets checked
+        analyzer = RepositoryAnalyzer(max_files=8, show_progress=False)
+        with patch.object(analyzer, '_clone_repo_to_tmp', return_value=test_repo):
+            chunks, metadata = analyzer._load_repository_context("https://github.com/test/repo", "main")
+        
+        reasons = {entry["path"]: entry["reason"] for entry in metadata.dropped_files}
+        expected = {"src/generated_client.py": "generated code header", "static/app.js": "minified",
+                    "src/api_pb2.py": "generated file name", "package-lock.json": "lock file"}
+        if any(reasons.get(path) != reason for path, reason in expected.items()):
+            print(f"  ✗ Unexpected drop reasons: {reasons}")
+            return False
+        print("  ✓ Lock files, generated names, generator headers and minified code dropped")
+        
+        if "docs/guide.md" in reasons or "src/schema.py" in reasons:
+            print(f"  ✗ Docs or code outside the header dropped as generated: {reasons}")
+            return False
+        print("  ✓ Docs and markers below the leading comments are not treated as generated")
+        
+        copies = ["src/parser.py", "lib/parser_copy.py", "vendor/parser.py"]
+        kept_copies = [path for path in copies if path not in reasons]
+        if len(kept_copies) != 1 or sorted(reasons[p].split(" of ")[0] for p in copies if p in reasons) != \
+           ["duplicate", "near-duplicate"]:
+            print(f"  ✗ Copies not collapsed: kept {kept_copies}, reasons {reasons}")
+            return False
+        print(f"  ✓ Exact and near-duplicate copies collapsed into {kept_copies[0]}")
+        
+        paths = sorted(chunk["path"] for chunk in chunks)
+        if paths != sorted(["README.md", kept_copies[0], "src/models.py", "src/utils.py", "src/views.py",
+                            "docs/guide.md", "src/schema.py"]) or \
+           metadata.total_files != len(files):
+            print(f"  ✗ Unexpected selection: {paths}")
+            return False
+        print("  ✓ Only distinct files selected, totals still count every file")
+        return True
+    finally:
+        shutil.rmtree(test_repo, ignore_errors=True)
+
+def test_map_reduce_analysis():
+    """Test per-directory map-reduce analysis under a concurrency cap."""
+    print("🧪 Testing map-reduce analysis...")
+    
+    test_repo = create_test_repository()
+    db_dir = Path(tempfile.mkdtemp(prefix="test-db-"))
+    prompts = []
+    running = [0, 0]  # current, peak
+    
+    async def fake_run(agent, prompt, context=None):
+        prompts.append(prompt)
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        output = json.dumps({"summary": "Combined", "tech_stack": ["Python"]}) if "DIRECTORY SUMMARIES" in prompt else "Directory summary"
+        return MagicMock(final_output=output)
+    
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(db_dir / "test.db"), max_files=2, show_progress=False,
+                                      analysis_mode="map_reduce", map_concurrency=2)
+        with patch.object(analyzer, '_clone_repo_to_tmp', return_value=test_repo), \
+             patch.object(analyzer, '_resolve_commit', return_value=None), \
+             patch('github_analyzer.Runner.run', side_effect=fake_run):
+            result = analyzer.analyze_repository("https://github.com/test/repo", "main")
+        
+        map_prompts = [prompt for prompt in prompts if "DIRECTORY SUMMARIES" not in prompt]
+        groups = sorted(prompt.split("CONTENTS OF ")[1].split(":")[0] for prompt in map_prompts)
+        if groups != [".", "docs", "src", "tests"]:
+            print(f"  ✗ Unexpected directory groups: {groups}")
+            return False
+        print(f"  ✓ One summary per directory: {groups}")
+        
+        if running[1] > 2:
+            print(f"  ✗ {running[1]} concurrent calls exceed the cap of 2")
+            return False
+        print("  ✓ Concurrent calls stay within map_concurrency")
+        
+        if result.summary != "Combined" or result.tech_stack != ["Python"] or len(prompts) != 5:
+            print(f"  ✗ Unexpected reduce result: {result.summary}")
+            return False
+        print("  ✓ Summaries reduced into the final analysis")
+        
+        async def analyze_in_loop():
+            return analyzer.analyze_repository("https://github.com/test/repo", "main", force_refresh=True)
+        
+        test_repo = create_test_repository()  # The analyzer removes its clone
+        with patch.object(analyzer, '_clone_repo_to_tmp', return_value=test_repo), \
+             patch.object(analyzer, '_resolve_commit', return_value=None), \
+             patch('github_analyzer.Runner.run', side_effect=fake_run):
+            result = asyncio.run(analyze_in_loop())
+        if result.summary != "Combined":
+            print("  ✗ Map-reduce failed inside a running event loop")
+            return False
+        print("  ✓ Sync map-reduce also runs from inside a running event loop")
+        return True
+    finally:
+        shutil.rmtree(test_repo, ignore_errors=True)
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+def test_streaming_analysis():
+    """Test that sections stream out before the analysis completes."""
+    print("🧪 Testing streaming analysis...")
+    
+    document = json.dumps({
+        "summary": "Streams {braces}, \"quotes\" and [brackets]",
+        "tech_stack": ["Python"],
+        "architecture": {"pattern": "MVC", "layers": ["api", "db"]},
+        "complexity_score": 3
+    })
+    parser = JSONSectionParser()
+    sections = []
+    for i in range(0, len(document), 5):
+        sections.extend(name for name, _ in parser.feed(document[i:i + 5]))
+    if sections != ["summary", "tech_stack", "architecture", "complexity_score"] or not parser.done:
+        print(f"  ✗ Unexpected sections from parser: {sections}")
+        return False
+    print("  ✓ Parser reports each top-level member once complete")
+    
+    delivered = []
+    
+    class FakeStream:
+        final_output = "```json\n" + document + "\n```"
+        
+        async def stream_events(self):
+            for i in range(0, len(self.final_output), 7):
+                await asyncio.sleep(0)  # Network delay between chunks
+                delivered.append(i)
+                delta = MagicMock(type="response.output_text.delta", delta=self.final_output[i:i + 7])
+                yield MagicMock(type="raw_response_event", data=delta)
+    
+    test_repo = create_test_repository()
+    db_dir = Path(tempfile.mkdtemp(prefix="test-db-"))
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(db_dir / "test.db"), show_progress=False)
+        
+        async def collect():
+            events = []
+            async for event in analyzer.stream_analysis("https://github.com/test/repo", "main"):
+                events.append((event, len(delivered)))
+            return events
+        
+        with patch.object(analyzer, '_clone_repo_to_tmp_async', return_value=test_repo), \
+             patch.object(analyzer, '_resolve_commit_async', return_value=None), \
+             patch('github_analyzer.Runner.run_streamed', return_value=FakeStream()):
+            events = asyncio.run(collect())
+        
+        kinds = [event["event"] for event, _ in events]
+        first_section = next(i for i, kind in enumerate(kinds) if kind == "section")
+        if not (kinds[0] == "stage" and "token" in kinds[:first_section] and kinds[-1] == "result"):
+            print(f"  ✗ Unexpected event order: {kinds}")
+            return False
+        summary_event, chunks_so_far = events[first_section]
+        if summary_event["event"] != "section" or summary_event["name"] != "summary" or chunks_so_far == len(delivered):
+            print("  ✗ Summary was not emitted before the response finished")
+            return False
+        print("  ✓ Summary emitted while the response was still streaming")
+        
+        result = events[-1][0]["analysis"]
+        stored = analyzer._get_stored_analysis(result.repository_metadata.repo_hash)
+        if result.tech_stack == ["Python"] and stored and stored.summary == result.summary:
+            print("  ✓ Final AnalysisResult assembled and stored")
+            return True
+        print("  ✗ Final result missing or not stored")
+        return False
+    finally:
+        shutil.rmtree(test_repo, ignore_errors=True)
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+def test_output_repair():
+    """Test that invalid analysis output is repaired from its broken fields only."""
+    print("🧪 Testing analysis output repair...")
+    
+    test_repo = create_test_repository()
+    db_dir = Path(tempfile.mkdtemp(prefix="test-db-"))
+    prompts = []
+    
+    def runner(responses):
+        def fake_run(agent, prompt, context=None):
+            prompts.append(prompt)
+            return MagicMock(final_output=responses.pop(0))
+        return fake_run
+    
+    invalid = json.dumps({"summary": "A test repository", "tech_stack": ["Python"], "complexity_score": 42,
+                          "concepts": [{"name": "Recursion", "category": "Algorithm"}]})
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(db_dir / "test.db"), show_progress=False, repair_attempts=1)
+        async def analyze_in_loop():
+            # Sync analysis called from a running event loop, e.g. a notebook
+            return analyzer.analyze_repository("https://github.com/test/repo", "main")
+        
+        with patch.object(analyzer, '_clone_repo_to_tmp', return_value=test_repo), \
+             patch.object(analyzer, '_resolve_commit', return_value=None), \
+             patch('github_analyzer.Runner.run_sync', side_effect=runner([invalid, '{"complexity_score": 7}'])):
+            result = asyncio.run(analyze_in_loop())
+        
+        if result.complexity_score != 7 or result.summary != "A test repository" or \
+           result.concepts[0]["category"] != "algorithm":
+            print(f"  ✗ Unexpected repaired result: {result.complexity_score}, {result.concepts}")
+            return False
+        print("  ✓ Invalid field repaired from inside a running event loop, valid fields and labels kept")
+        
+        repair_prompt = prompts[-1]
+        if len(prompts) != 2 or "complexity_score" not in repair_prompt or "A test repository" in repair_prompt \
+           or "FILE:" in repair_prompt:
+            print("  ✗ Repair call did not send only the broken fragment")
+            return False
+        print("  ✓ Repair call sent only the broken field, not the codebase")
+        
+        test_repo = create_test_repository()  # The analyzer removes its clone
+        with patch.object(analyzer, '_clone_repo_to_tmp', return_value=test_repo), \
+             patch.object(analyzer, '_resolve_commit', return_value=None), \
+             patch('github_analyzer.Runner.run_sync', side_effect=runner(["Not JSON at all", "Still not JSON"])):
+            try:
+                analyzer.analyze_repository("https://github.com/test/other", "main")
+                print("  ✗ Unrepairable output did not fail the analysis")
+                return False
+            except AnalysisOutputError:
+                pass
+        if analyzer.get_analysis_history("https://github.com/test/other"):
+            print("  ✗ Degraded analysis was stored")
+            return False
+        print("  ✓ Exhausted repairs fail the analysis without storing it")
+        return True
+    finally:
+        shutil.rmtree(test_repo, ignore_errors=True)
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+def test_chat_analysis():
+    """Test that /chat analyzes in-process without stalling the event loop."""
+    print("🧪 Testing in-process chat analysis...")
+    
+    import api
+    
+    test_repo = create_test_repository()
+    db_dir = Path(tempfile.mkdtemp(prefix="test-db-"))
+    
+    class SlowStream:
+        final_output = json.dumps({"summary": "A chat-analyzed repository", "tech_stack": ["Python"]})
+        
+        async def stream_events(self):
+            await asyncio.sleep(0.3)  # A slow model call
+            delta = MagicMock(type="response.output_text.delta", delta=self.final_output)
+            yield MagicMock(type="raw_response_event", data=delta)
+    
+    async def scenario():
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        ticking = asyncio.create_task(ticker())
+        reply = await api.analyze_github_repository("https://github.com/test/repo")
+        ticking.cancel()
+        return reply, ticks
+    
+    original = api._repository_analyzer
+    try:
+        api._repository_analyzer = RepositoryAnalyzer(db_path=str(db_dir / "test.db"), show_progress=False)
+        with patch.object(api._repository_analyzer, '_clone_repo_to_tmp_async', return_value=test_repo), \
+             patch.object(api._repository_analyzer, '_resolve_commit_async', return_value=None), \
+             patch('github_analyzer.Runner.run_streamed', side_effect=lambda *args, **kwargs: SlowStream()):
+            reply, ticks = asyncio.run(scenario())
+        
+        if ticks < 10:
+            print(f"  ✗ Event loop stalled during the analysis ({ticks} ticks)")
+            return False
+        print(f"  ✓ Event loop kept serving other work during the analysis ({ticks} ticks)")
+        
+        if not reply.startswith("# 📊 Repository Analysis") or "A chat-analyzed repository" not in reply \
+           or "`Python`" not in reply:
+            print(f"  ✗ Unexpected reply: {reply[:200]}")
+            return False
+        print("  ✓ Reply rendered as markdown from the AnalysisResult")
+        
+        with patch.object(api._repository_analyzer, 'analyze_repository_async', side_effect=ValueError("boom")):
+            reply = asyncio.run(api.analyze_github_repository("https://github.com/test/repo"))
+        if not reply.startswith("❌") or "boom" not in reply:
+            print("  ✗ Failure not reported in the reply")
+            return False
+        print("  ✓ Failures are reported in the reply")
+        return True
+    finally:
+        api._repository_analyzer = original
+        shutil.rmtree(test_repo, ignore_errors=True)
+        shutil.rmtree(db_dir, ignore_errors=True)
+
 def test_subfolder_repository_loading():
     """Test repository content loading with subfolder analysis."""
     print("🧪 Testing subfolder repository loading...")
@@ -501,7 +1007,7 @@ def test_prompt_generation():
     
     prompt = analyzer._create_analysis_prompt(context_chunks, metadata)
     
-    # Check that prompt contains key elements
+    # Check that the instructions and the per-call input together contain key elements
     required_elements = [
         "REPOSITORY METADATA:",
         "FILES ANALYZED:",
@@ -512,31 +1018,63 @@ def test_prompt_generation():
         "architecture"
     ]
     
-    missing_elements = [elem for elem in required_elements if elem not in prompt]
+    missing_elements = [elem for elem in required_elements if elem not in ANALYSIS_INSTRUCTIONS + prompt]
     
-    if not missing_elements:
-        print("  ✓ Prompt contains all required elements")
-        return True
-    else:
+    if missing_elements:
         print(f"  ✗ Missing elements in prompt: {missing_elements}")
         return False
+    print("  ✓ Prompt contains all required elements")
+    
+    if "JSON format" in prompt or "A sample repository" in ANALYSIS_INSTRUCTIONS or "test/repo" in ANALYSIS_INSTRUCTIONS:
+        print("  ✗ Static instructions and repository input are mixed")
+        return False
+    print("  ✓ Instructions are static, repository metadata and contents only in the input")
+    return True
+
+def test_prompt_sent_once():
+    """Test that the codebase is sent once, after the static instructions, and token usage is reported."""
+    print("🧪 Testing prompt layout and token usage...")
+    
+    test_repo = create_test_repository()
+    db_dir = Path(tempfile.mkdtemp(prefix="test-db-"))
+    calls = []
+    
+    def fake_run_sync(agent, prompt, context=None):
+        calls.append((agent.instructions, prompt))
+        usage = Usage(requests=1, input_tokens=1200, output_tokens=300)
+        usage.input_tokens_details.cached_tokens = 1024  # Static prefix served from the provider's cache
+        return MagicMock(final_output=json.dumps({"summary": "A test repository"}),
+                         context_wrapper=MagicMock(usage=usage))
+    
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(db_dir / "test.db"), show_progress=False)
+        stats = AnalysisStats()
+        with patch.object(analyzer, '_clone_repo_to_tmp', return_value=test_repo), \
+             patch.object(analyzer, '_resolve_commit', return_value=None), \
+             patch('github_analyzer.Runner.run_sync', side_effect=fake_run_sync):
+            analyzer.analyze_repository("https://github.com/test/repo", "main", stats=stats)
+        
+        instructions, prompt = calls[0]
+        if instructions != ANALYSIS_INSTRUCTIONS or "CODEBASE CONTENTS" in instructions or \
+           prompt.count("def main") != 1:
+            print("  ✗ Codebase not sent exactly once in the per-call input")
+            return False
+        print("  ✓ Static instructions first, codebase sent once")
+        
+        if stats.usage != {"requests": 1, "input_tokens": 1200, "cached_tokens": 1024, "output_tokens": 300}:
+            print(f"  ✗ Unexpected token usage: {stats.usage}")
+            return False
+        print("  ✓ Token usage including cached prefix tokens recorded in the stats")
+        return True
+    finally:
+        shutil.rmtree(test_repo, ignore_errors=True)
+        shutil.rmtree(db_dir, ignore_errors=True)
 
 def test_response_parsing():
-    """Test OpenAI response parsing."""
+    """Test that model responses are parsed and validated against the analysis schema."""
     print("🧪 Testing response parsing...")
     
-    analyzer = RepositoryAnalyzer(show_progress=False)
-    
-    metadata = RepositoryMetadata(
-        repo_url="https://github.com/test/repo",
-        ref="main",
-        analysis_timestamp="2023-01-01T00:00:00Z",
-        total_files=10,
-        analyzed_files=2,
-        total_lines=150,
-        file_types={"md": 1, "py": 1},
-        repo_hash="test123"
-    )
+    analyzer = RepositoryAnalyzer(show_progress=False, repair_attempts=0)
     
     # Test valid JSON response
     valid_response = """
@@ -553,26 +1091,25 @@ Here is the analysis:
 }
 """
     
-    result = analyzer._parse_openai_response(valid_response, metadata)
-    
-    if (result.summary == "This is a test repository" and 
-        result.objectives == ["Testing", "Learning"] and
-        result.complexity_score == 3):
-        print("  ✓ Valid JSON response parsed correctly")
-    else:
-        print("  ✗ Valid JSON response parsing failed")
+    analysis, errors = validate_analysis(extract_json_object(valid_response))
+    if errors or analysis.summary != "This is a test repository" or \
+       analysis.objectives != ["Testing", "Learning"] or analysis.complexity_score != 3:
+        print(f"  ✗ Valid JSON response parsing failed: {errors}")
         return False
+    print("  ✓ Valid JSON response parsed correctly")
     
-    # Test invalid response (fallback behavior)
+    # Malformed text raises instead of turning into an empty analysis
     invalid_response = "This is just plain text without JSON structure."
-    result = analyzer._parse_openai_response(invalid_response, metadata)
-    
-    if result.summary and result.raw_response == invalid_response:
-        print("  ✓ Invalid response handled gracefully")
-        return True
-    else:
-        print("  ✗ Invalid response not handled properly")
+    if extract_json_object(invalid_response) is not None:
+        print("  ✗ Plain text parsed as JSON")
         return False
+    try:
+        analyzer._repair_analysis_output_sync(invalid_response)
+        print("  ✗ Invalid response produced an analysis")
+        return False
+    except AnalysisOutputError:
+        print("  ✓ Invalid response raises instead of producing an empty result")
+        return True
 
 def run_all_tests():
     """Run all tests."""
@@ -585,8 +1122,18 @@ def run_all_tests():
         ("Subfolder Hash Generation", test_subfolder_hash_generation),
         ("Subfolder Database Operations", test_subfolder_database_operations),
         ("Repository Loading", test_repository_loading),
+        ("Repository Scanner", test_repository_scanner),
+        ("Bounded File Reads", test_bounded_file_reads),
+        ("Priority Selection", test_priority_selection),
+        ("Context Packing", test_context_packing),
+        ("Content Filtering", test_content_filtering),
+        ("Map-Reduce Analysis", test_map_reduce_analysis),
+        ("Streaming Analysis", test_streaming_analysis),
+        ("Output Repair", test_output_repair),
+        ("Chat Analysis", test_chat_analysis),
         ("Subfolder Repository Loading", test_subfolder_repository_loading),
         ("Prompt Generation", test_prompt_generation),
+        ("Prompt Sent Once", test_prompt_sent_once),
         ("Response Parsing", test_response_parsing),
     ]
     
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled outbound HTTP clients.
+
+Uses a local keep-alive HTTP server so no network is needed.
+"""
+
+import os
+import sys
+import time
+import json
+import asyncio
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from http_clients import ClientConfig, ClientRegistry
+from trends_cache import TrendsCache
+
+
+class SlowJSONHandler(BaseHTTPRequestHandler):
+    """Answers every GET with an empty tweet search result after a short delay."""
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_GET(self):
+        SlowJSONHandler.connections.add(self.client_address)
+        time.sleep(0.05)
+        body = json.dumps({"data": [], "meta": {"result_count": 0}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """Start the local server; returns (server, base_url)."""
+    SlowJSONHandler.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowJSONHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_pooling_and_limits():
+    """Test that connections are reused and capped per service."""
+    print("🧪 Testing connection pooling and limits...")
+
+    server, base_url = start_server()
+    registry = ClientRegistry({"local": ClientConfig(base_url=base_url, max_connections=2,
+                                                     max_keepalive_connections=2)})
+
+    async def scenario():
+        await registry.start()
+        client = registry.get("local")
+        for _ in range(5):
+            (await client.get("/sequential")).raise_for_status()
+        sequential = len(SlowJSONHandler.connections)
+
+        requests = [asyncio.create_task(client.get("/concurrent")) for _ in range(6)]
+        await asyncio.sleep(0.02)
+        during = registry.stats()["local"]
+        await asyncio.gather(*requests)
+        after = registry.stats()["local"]
+        await registry.aclose()
+        return sequential, during, after
+
+    try:
+        sequential, during, after = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert sequential == 1
+    print("  ✓ Sequential requests reused one kept-alive connection")
+
+    assert during["in_flight"] == 6 and during["utilization"] == 1.0 and during["waiting"] == 4
+    assert len(SlowJSONHandler.connections) <= 2
+    print("  ✓ Concurrent requests capped at max_connections, the rest waited in the pool")
+
+    assert after["requests"] == 11 and after["in_flight"] == 0 and after["utilization"] == 0
+    print("  ✓ Stats report requests sent and in flight")
+
+
+def test_ai_trends_and_metrics():
+    """Test that the X API call goes through the registry and shows up in /metrics."""
+    print("🧪 Testing pooled X API calls and /metrics...")
+
+    from fastapi.testclient import TestClient
+    import api
+
+    server, base_url = start_server()
+    original = api._http_clients, api._trends_cache
+    api._http_clients = ClientRegistry({"openai": ClientConfig(), "x": ClientConfig(base_url=base_url)})
+    api._trends_cache = TrendsCache(api.fetch_ai_trends, api.CACHE_DURATION)
+    try:
+        with patch.dict(os.environ, {"X_BEARER_TOKEN": "t" * 100}), TestClient(api.app) as client:
+            trends = client.get("/ai-trends").json()
+            client.portal.call(api.fetch_ai_trends)  # On the app loop that owns the pool
+            metrics = client.get("/metrics").json()
+        assert trends["total_count"] == 0
+        assert len(SlowJSONHandler.connections) == 1
+        print("  ✓ /ai-trends fetched from the X API through the pooled client")
+
+        assert metrics["http_clients"]["x"]["requests"] == 2
+        assert set(metrics["http_clients"]) == {"openai", "x"}
+        print("  ✓ /metrics reports pool utilization per service")
+    finally:
+        server.shutdown()
+        api._http_clients, api._trends_cache = original
+
+
+if __name__ == "__main__":
+    test_pooling_and_limits()
+    test_ai_trends_and_metrics()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job queue and the /jobs endpoints.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from job_queue import JobFailed, JobQueue, JobQueueFull
+
+
+def test_coalescing_and_worker_bound():
+    """Test that identical jobs share one run and at most `workers` jobs run at once."""
+    print("🧪 Testing job coalescing and the worker bound...")
+
+    runs = []
+    running = peak = 0
+
+    async def analyze(params, emit):
+        nonlocal running, peak
+        runs.append(params["repo"])
+        running += 1
+        peak = max(peak, running)
+        emit({"event": "stage", "stage": "Cloning"})
+        await asyncio.sleep(0.05)
+        running -= 1
+        return {"repo": params["repo"]}
+
+    async def scenario():
+        queue = JobQueue({"analyze": analyze}, workers=2)
+        first, coalesced_first = queue.submit("analyze", {"repo": "a"}, key="a")
+        second, coalesced_second = queue.submit("analyze", {"repo": "a"}, key="a")
+        others = [queue.submit("analyze", {"repo": repo}, key=repo)[0] for repo in "bcd"]
+        results = await asyncio.gather(*(queue.wait(job.id) for job in [first, second] + others))
+        again, coalesced_again = queue.submit("analyze", {"repo": "a"}, key="a")
+        await queue.wait(again.id)
+        await queue.close()
+        return first, second, (coalesced_first, coalesced_second, coalesced_again), results, again
+
+    first, second, coalesced, results, again = asyncio.run(scenario())
+
+    assert first is second and coalesced == (False, True, False)
+    assert first.submissions == 2 and runs.count("a") == 2
+    assert results[0] == results[1] == {"repo": "a"}
+    print("  ✓ Identical in-flight jobs share one run; finished jobs are not reused")
+
+    assert peak == 2 and sorted(runs) == ["a", "a", "b", "c", "d"]
+    assert first.status == "succeeded" and first.stage == "Cloning" and again.id != first.id
+    print("  ✓ No more than two jobs ran at the same time")
+
+
+def test_events_and_failures():
+    """Test event replay for late subscribers, failure reporting and the pending limit."""
+    print("🧪 Testing job events and failures...")
+
+    async def analyze(params, emit):
+        emit({"event": "stage", "stage": "Loading files"})
+        await asyncio.sleep(0.02)
+        emit({"event": "token", "text": "{"})
+        emit({"event": "section", "name": "summary", "value": "Demo"})
+        await asyncio.sleep(0.02)
+        if params.get("fail"):
+            raise ValueError("clone failed")
+        return "done"
+
+    async def collect(queue, job_id):
+        return [event async for event in queue.events(job_id)]
+
+    async def scenario():
+        queue = JobQueue({"analyze": analyze}, workers=1, max_pending=2)
+        job, _ = queue.submit("analyze", {})
+        await asyncio.sleep(0.01)  # Running, first stage emitted
+        live = asyncio.create_task(collect(queue, job.id))
+        await queue.wait(job.id)
+        late = await collect(queue, job.id)
+
+        failing, _ = queue.submit("analyze", {"fail": True})
+        queue.submit("analyze", {})
+        try:
+            queue.submit("analyze", {})
+            refused = False
+        except JobQueueFull:
+            refused = True
+        try:
+            await queue.wait(failing.id)
+            error = None
+        except JobFailed as e:
+            error = str(e)
+        await queue.close()
+        return await live, late, refused, error, failing
+
+    live, late, refused, error, failing = asyncio.run(scenario())
+
+    kinds = [event["event"] for event in live]
+    assert kinds == ["status", "status", "stage", "token", "section", "status"], kinds
+    assert live[-1]["status"] == "succeeded"
+    print("  ✓ A subscriber joining mid-run gets earlier events, then live ones")
+
+    assert [event["event"] for event in late] == ["status", "status", "stage", "section", "status"]
+    print("  ✓ Finished jobs replay their events without tokens")
+
+    assert refused
+    print("  ✓ Submissions beyond the pending limit are refused")
+
+    assert error == "clone failed" and failing.to_dict()["status"] == "failed"
+    print("  ✓ Failed jobs report their error")
+
+
+def test_job_endpoints():
+    """Test submitting, polling and following a job over HTTP."""
+    print("🧪 Testing /jobs endpoints...")
+
+    from fastapi.testclient import TestClient
+    import api
+
+    calls = []
+
+    async def analyze(params, emit):
+        calls.append(params)
+        emit({"event": "stage", "stage": "Analyzing"})
+        await asyncio.sleep(0.1)
+        return {"report": "# 📊 Repository Analysis", "analysis": {"summary": "Demo"}}
+
+    original = api._job_queue
+    api._job_queue = JobQueue({"analyze": analyze, "challenge": api.run_challenge_job})
+    try:
+        with TestClient(api.app) as client:
+            body = {"repo_url": "https://github.com/test/repo", "ref": "main"}
+            first = client.post("/jobs/analyze", json=body)
+            second = client.post("/jobs/analyze", json={**body, "repo_url": "https://github.com/Test/repo.git"})
+            assert first.status_code == 202 and not first.json()["coalesced"]
+            assert second.json()["job_id"] == first.json()["job_id"] and second.json()["coalesced"]
+            job_id = first.json()["job_id"]
+            print("  ✓ Submission returns a job id; a duplicate joins it")
+
+            forced = client.post("/jobs/analyze", json={**body, "force_refresh": True}).json()
+            assert forced["job_id"] != job_id and not forced["coalesced"]
+            print("  ✓ A forced re-analysis does not join the cached-allowed job")
+
+            with client.stream("GET", f"/jobs/{job_id}/events") as response:
+                lines = [line for line in response.iter_lines() if line.startswith("event: ")]
+            assert lines[-2:] == ["event: status", "event: result"] and "event: stage" in lines
+
+            status = client.get(f"/jobs/{job_id}").json()
+            assert status["status"] == "succeeded" and status["stage"] == "Analyzing"
+            assert status["submissions"] == 2 and status["result"]["analysis"] == {"summary": "Demo"}
+            unforced = [params for params in calls if not params["force_refresh"]]
+            assert len(unforced) == 1 and unforced[0]["repo_url"] == "https://github.com/test/repo"
+            print("  ✓ Events stream to completion and the status carries the result")
+
+            assert client.get("/jobs/missing").status_code == 404
+            assert client.get("/jobs/missing/events").status_code == 404
+            print("  ✓ Unknown jobs return 404")
+    finally:
+        api._job_queue = original
+
+
+if __name__ == "__main__":
+    test_coalescing_and_worker_bound()
+    test_events_and_failures()
+    test_job_endpoints()
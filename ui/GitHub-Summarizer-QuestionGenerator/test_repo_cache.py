@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent repository mirror cache.
+
+Uses local git repositories served over file:// so no network is needed.
+"""
+
+import io
+import sys
+import json
+import asyncio
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import github_analyzer
+from repo_cache import RepoMirrorCache
+from git_objects import GitObjectReader
+from github_analyzer import RepositoryAnalyzer
+from cli_analyzer import read_batch_entries, run_batch
+
+def git(*args, cwd):
+    """Run a git command in a test repository."""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+def create_source_repository(files):
+    """Create a local git repository with one commit on main."""
+    source = Path(tempfile.mkdtemp(prefix="test-source-"))
+    git("init", "--quiet", "--initial-branch=main", cwd=source)
+    git("config", "user.email", "test@example.com", cwd=source)
+    git("config", "user.name", "Test", cwd=source)
+    git("config", "uploadpack.allowFilter", "true", cwd=source)
+    commit_files(source, files, "Initial commit")
+    return source
+
+def commit_files(source, files, message):
+    """Write files into a test repository and commit them."""
+    for file_path, content in files.items():
+        full_path = source / file_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(content)
+    git("add", "-A", cwd=source)
+    git("commit", "--quiet", "-m", message, cwd=source)
+
+def test_checkout_and_refresh():
+    """Test that checkouts come from the mirror and pick up new commits."""
+    print("🧪 Testing mirror checkout and incremental refresh...")
+
+    source = create_source_repository({"README.md": "# v1\n", "src/app.py": "print('v1')\n"})
+    cache_dir = Path(tempfile.mkdtemp(prefix="test-cache-"))
+
+    try:
+        cache = RepoMirrorCache(str(cache_dir), min_fetch_interval=0)
+        url = source.as_uri()
+
+        first = cache.checkout(url, "main")
+        assert (first / "README.md").read_text() == "# v1\n"
+        assert cache.mirror_path(url).exists()
+        print("  ✓ Initial checkout created mirror and worktree")
+
+        again = cache.checkout(url, "main")
+        assert again == first
+        print("  ✓ Same commit reuses the existing worktree")
+
+        commit_files(source, {"README.md": "# v2\n"}, "Update readme")
+        second = cache.checkout(url, "main")
+        assert second != first
+        assert (second / "README.md").read_text() == "# v2\n"
+        print("  ✓ New commits are fetched into the mirror")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def test_lru_eviction():
+    """Test that the cache evicts least-recently-used entries above its quota."""
+    print("🧪 Testing LRU eviction...")
+
+    sources = [
+        create_source_repository({"README.md": f"# repo {i}\n", "data.txt": "x" * 20000})
+        for i in range(2)
+    ]
+    cache_dir = Path(tempfile.mkdtemp(prefix="test-cache-"))
+
+    try:
+        cache = RepoMirrorCache(str(cache_dir), max_bytes=1, min_fetch_interval=0)
+        first_url, second_url = (source.as_uri() for source in sources)
+
+        cache.checkout(first_url, "main")
+        cache.checkout(second_url, "main")
+
+        assert not cache.mirror_path(first_url).exists()
+        assert cache.mirror_path(second_url).exists()
+        print("  ✓ Older mirror evicted, most recent one kept")
+    finally:
+        for source in sources:
+            shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def test_leased_entries_survive_eviction():
+    """Test that entries in use are not evicted and sizes come from the markers."""
+    print("🧪 Testing leases and recorded sizes...")
+
+    sources = [
+        create_source_repository({"README.md": f"# repo {i}\n", "data.txt": "x" * 20000})
+        for i in range(2)
+    ]
+    cache_dir = Path(tempfile.mkdtemp(prefix="test-cache-"))
+
+    try:
+        cache = RepoMirrorCache(str(cache_dir), max_bytes=1, min_fetch_interval=0)
+        first_url, second_url = (source.as_uri() for source in sources)
+
+        with cache.use_worktree(first_url, "main") as worktree:
+            cache.checkout(second_url, "main")
+            assert (worktree / "data.txt").exists()
+            assert cache.mirror_path(first_url).exists()
+            print("  ✓ Leased worktree and mirror kept while another checkout evicts")
+
+        marker = json.loads((cache.mirror_path(second_url) / "prenup-cache.json").read_text())
+        assert marker["size"] > 0 and list(marker["worktrees"].values())[0] > 20000
+        with patch("repo_cache._dir_size", side_effect=AssertionError("walked")):
+            assert cache.evict() > 0
+        assert not cache.mirror_path(first_url).exists()
+        print("  ✓ Eviction uses the sizes recorded in the markers once the lease ends")
+    finally:
+        for source in sources:
+            shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def test_mirror_skips_hosting_refs():
+    """Test that mirrors fetch branches and tags but not pull request refs."""
+    print("🧪 Testing mirror refspecs...")
+
+    source = create_source_repository({"README.md": "# v1\n"})
+    git("tag", "v1", cwd=source)
+    git("update-ref", "refs/pull/1/head", "HEAD", cwd=source)
+    cache_dir = Path(tempfile.mkdtemp(prefix="test-cache-"))
+
+    try:
+        cache = RepoMirrorCache(str(cache_dir), min_fetch_interval=0)
+        url = source.as_uri()
+        for label in ("Clone", "Fetch"):
+            refs = subprocess.run(["git", "for-each-ref", "--format=%(refname)"], cwd=cache.ensure_mirror(url),
+                                  check=True, capture_output=True, text=True).stdout.split()
+            assert refs == ["refs/heads/main", "refs/tags/v1"], refs
+            print(f"  ✓ {label}: branches and tags only")
+            git("update-ref", "refs/pull/2/head", "HEAD", cwd=source)
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def test_sparse_subfolder_checkout():
+    """Test that subfolder checkouts only materialize the subfolder and root files."""
+    print("🧪 Testing sparse subfolder checkouts...")
+
+    source = create_source_repository({
+        "README.md": "# root\n",
+        "package.json": "{}",
+        "services/api/app.py": "print('api')\n",
+        "services/web/index.js": "console.log('web')\n",
+    })
+    cache_dir = Path(tempfile.mkdtemp(prefix="test-cache-"))
+    analyzer = RepositoryAnalyzer(db_path=str(cache_dir / "test.db"), show_progress=False)
+    clone = None
+
+    try:
+        for label, checkout in (
+            ("Mirror cache", lambda: RepoMirrorCache(str(cache_dir / "cache")).checkout(
+                source.as_uri(), "main", "services/api")),
+            ("Partial clone", lambda: analyzer._clone_repo_to_tmp(source.as_uri(), "main", "services/api")),
+        ):
+            clone = checkout()
+            assert (clone / "services/api/app.py").exists()
+            assert (clone / "README.md").exists() and (clone / "package.json").exists()
+            assert not (clone / "services/web").exists()
+            print(f"  ✓ {label}: only subfolder and root manifests checked out")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if clone:
+            shutil.rmtree(clone, ignore_errors=True)
+
+def test_object_ingestion_matches_worktree():
+    """Test that the zero-checkout backend produces the same context as the worktree walk."""
+    print("🧪 Testing object-database ingestion...")
+
+    source = create_source_repository({
+        "README.md": "# root\nproject\n",
+        "package.json": "{}",
+        "services/api/app.py": "print('api')\n" * 50,
+        "services/web/index.js": "console.log('web')\n",
+        "node_modules/lib/index.js": "module.exports = {};\n",
+    })
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-objects-"))
+
+    try:
+        results = {}
+        for ingestion in ("worktree", "objects"):
+            analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), max_chars_per_file=100,
+                                          show_progress=False, ingestion=ingestion)
+            results[ingestion] = analyzer._load_repository_context(source.as_uri(), "main")
+
+        (tree_chunks, tree_meta), (object_chunks, object_meta) = results["worktree"], results["objects"]
+        assert tree_chunks == object_chunks
+        assert (tree_meta.total_files, tree_meta.total_lines, tree_meta.file_types) == \
+            (object_meta.total_files, object_meta.total_lines, object_meta.file_types)
+        print(f"  ✓ Both backends loaded {len(object_chunks)} files and {object_meta.total_lines} lines")
+
+        analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), show_progress=False, ingestion="objects")
+        chunks, metadata = analyzer._load_repository_context(source.as_uri(), "main", "services/api")
+        assert [chunk["path"] for chunk in chunks] == ["services/api/app.py"]
+        try:
+            analyzer._load_repository_context(source.as_uri(), "main", "missing")
+            assert False, "Expected ValueError for missing subfolder"
+        except ValueError as e:
+            assert "does not exist" in str(e)
+        print("  ✓ Subfolder scoping and validation work without a checkout")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+class CountingRunner:
+    """Stand-in for the agents Runner that counts model calls."""
+    calls = 0
+    last_prompt = None
+
+    @classmethod
+    def run_sync(cls, agent, prompt, context=None):
+        cls.calls += 1
+        cls.last_prompt = prompt
+        response = {"summary": f"Analysis {cls.calls}", "objectives": [], "architecture": {},
+                    "key_components": [], "tech_stack": [], "concepts": [],
+                    "complexity_score": 3, "recommendations": []}
+        return type("Result", (), {"final_output": json.dumps(response)})()
+
+    @classmethod
+    async def run(cls, agent, prompt, context=None):
+        await asyncio.sleep(0)
+        return cls.run_sync(agent, prompt, context)
+
+def test_streamed_tree_listing():
+    """Test that tree entries stream from git ls-tree, which is stopped when the caller stops."""
+    print("🧪 Testing streamed tree listing...")
+
+    source = create_source_repository({f"src/module_{i:03d}.py": f"value = {i}\n" for i in range(300)})
+    processes = []
+    real_popen = subprocess.Popen
+
+    def spy(*args, **kwargs):
+        processes.append(real_popen(*args, **kwargs))
+        return processes[-1]
+
+    try:
+        reader = GitObjectReader(source)
+        entries = list(reader.list_files("HEAD", "src"))
+        assert len(entries) == 300 and entries[0].path == "src/module_000.py" and entries[0].size == 10
+        print("  ✓ All blobs listed with their sizes")
+
+        with patch("git_objects.LIST_READ_SIZE", 64), patch("git_objects.subprocess.Popen", side_effect=spy):
+            listing = reader.list_files("HEAD")
+            first = next(listing)
+            listing.close()
+        assert first.path == "src/module_000.py"
+        assert processes[0].poll() is not None and processes[0].stdout.closed
+        print("  ✓ Stopping early stops git ls-tree and closes its pipes")
+
+        try:
+            list(reader.list_files("missing-ref"))
+            assert False, "missing ref listed"
+        except subprocess.CalledProcessError as e:
+            assert "missing-ref" in e.stderr
+        print("  ✓ git errors are raised once the listing ends")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+
+def test_commit_keyed_analysis_cache():
+    """Test that stored analyses follow the commit and are shared with forks."""
+    print("🧪 Testing commit-keyed analysis cache...")
+
+    source = create_source_repository({
+        "README.md": "# root\n",
+        "services/api/app.py": "print('api')\n",
+        "services/web/index.js": "console.log('web')\n",
+    })
+    fork = Path(tempfile.mkdtemp(prefix="test-fork-"))
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-analysis-"))
+    original_runner = github_analyzer.Runner
+    github_analyzer.Runner = CountingRunner
+    CountingRunner.calls = 0
+
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), show_progress=False)
+        url = source.as_uri()
+
+        first = analyzer.analyze_repository(url, "main")
+        analyzer.analyze_repository(url, "main")
+        assert CountingRunner.calls == 1
+        assert first.repository_metadata.commit_sha == analyzer._resolve_commit(url, "main")
+        print("  ✓ Unchanged commit served from the store")
+
+        commit_files(source, {"services/web/index.js": "console.log('v2')\n"}, "Update web")
+        second = analyzer.analyze_repository(url, "main")
+        assert CountingRunner.calls == 2 and second.summary == "Analysis 2"
+        print("  ✓ New commit analyzed again without force_refresh")
+
+        git("clone", "--quiet", url, str(fork), cwd=tmp_dir)
+        forked = analyzer.analyze_repository(fork.as_uri(), "main")
+        assert CountingRunner.calls == 2 and forked.summary == "Analysis 2"
+        assert forked.repository_metadata.repo_url == fork.as_uri()
+        assert analyzer.export_analysis(fork.as_uri(), "main")["summary"] == "Analysis 2"
+        print("  ✓ Fork at the same commit reuses the stored analysis")
+
+        analyzer.analyze_repository(url, "main", "services/api")
+        git("config", "user.email", "test@example.com", cwd=fork)
+        git("config", "user.name", "Test", cwd=fork)
+        commit_files(fork, {"services/web/index.js": "console.log('fork')\n"}, "Diverge")
+        analyzer.analyze_repository(fork.as_uri(), "main", "services/api")
+        assert CountingRunner.calls == 3
+        print("  ✓ Diverged fork with an identical subfolder tree reuses the analysis")
+    finally:
+        github_analyzer.Runner = original_runner
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(fork, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_incremental_reanalysis():
+    """Test that small diffs update the stored analysis and large ones trigger a full analysis."""
+    print("🧪 Testing incremental re-analysis...")
+
+    files = {f"src/module_{i}.py": f"value = {i}\n" for i in range(5)}
+    source = create_source_repository({"README.md": "# root\n", "notes.bin": "x", **files})
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-analysis-"))
+    original_runner = github_analyzer.Runner
+    github_analyzer.Runner = CountingRunner
+    CountingRunner.calls = 0
+
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), show_progress=False,
+                                      incremental_max_files=2)
+        url = source.as_uri()
+        first = analyzer.analyze_repository(url, "main")
+
+        commit_files(source, {"src/module_1.py": "value = 'changed'\n"}, "Change one module")
+        updated = analyzer.analyze_repository(url, "main")
+        assert CountingRunner.calls == 2
+        assert "modified: src/module_1.py" in CountingRunner.last_prompt
+        assert "src/module_2.py" not in CountingRunner.last_prompt
+        assert updated.repository_metadata.base_commit_sha == first.repository_metadata.commit_sha
+        assert updated.summary == "Analysis 2" and updated.complexity_score == 3
+        print("  ✓ Only the changed file was sent and the update merged")
+
+        commit_files(source, {"notes.bin": "y"}, "Change an unimportant file")
+        analyzer.analyze_repository(url, "main")
+        assert CountingRunner.calls == 2
+        print("  ✓ Changes to unimportant files reuse the analysis without a model call")
+
+        commit_files(source, {path: "value = None\n" for path in files}, "Change every module")
+        analyzer.analyze_repository(url, "main")
+        assert CountingRunner.calls == 3 and "CODEBASE CONTENTS" in CountingRunner.last_prompt
+        print("  ✓ Large diffs fall back to a full analysis")
+    finally:
+        github_analyzer.Runner = original_runner
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_incremental_update_validation():
+    """Test that merged incremental updates are validated, repaired or replaced by a full analysis."""
+    print("🧪 Testing incremental update validation...")
+
+    source = create_source_repository({"README.md": "# root\n", "src/app.py": "value = 1\n"})
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-analysis-"))
+    full = json.dumps({"summary": "Full analysis", "tech_stack": ["Python"], "complexity_score": 3})
+    responses = []
+
+    def run_sync(agent, prompt, context=None):
+        return type("Result", (), {"final_output": responses.pop(0)})()
+
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), show_progress=False, repair_attempts=1)
+        url = source.as_uri()
+        with patch("github_analyzer.Runner.run_sync", side_effect=run_sync):
+            responses[:] = [full]
+            analyzer.analyze_repository(url, "main")
+
+            commit_files(source, {"src/app.py": "value = 2\n"}, "Change app")
+            responses[:] = ['Changed fields:\n```json\n{"summary": "Updated", "complexity_score": 42}\n```',
+                            '{"complexity_score": 4}']
+            updated = analyzer.analyze_repository(url, "main")
+            assert updated.repository_metadata.base_commit_sha
+            assert (updated.summary, updated.complexity_score, updated.tech_stack) == ("Updated", 4, ["Python"])
+            assert not responses
+            print("  ✓ Invalid merged field repaired, unchanged fields kept from the stored analysis")
+
+            commit_files(source, {"src/app.py": "value = 3\n"}, "Change app again")
+            responses[:] = ['{"complexity_score": 42}', '{"complexity_score": 99}', full]
+            result = analyzer.analyze_repository(url, "main")
+            assert result.summary == "Full analysis" and result.repository_metadata.base_commit_sha is None
+            assert not responses
+            print("  ✓ Unrepairable update falls back to a full analysis")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_async_analysis():
+    """Test that several analyses run concurrently in one event loop."""
+    print("🧪 Testing async analysis API...")
+
+    sources = [create_source_repository({"README.md": f"# repo {i}\n", "src/app.py": f"print({i})\n"})
+               for i in range(3)]
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-analysis-"))
+    original_runner = github_analyzer.Runner
+    github_analyzer.Runner = CountingRunner
+    CountingRunner.calls = 0
+
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), show_progress=False)
+
+        async def analyze_all():
+            return await asyncio.gather(*(analyzer.analyze_repository_async(source.as_uri(), "main")
+                                          for source in sources))
+
+        results = asyncio.run(analyze_all())
+        assert CountingRunner.calls == 3
+        assert [result.repository_metadata.repo_url for result in results] == [s.as_uri() for s in sources]
+        assert all(result.repository_metadata.commit_sha for result in results)
+        print("  ✓ Three repositories analyzed concurrently in one event loop")
+
+        asyncio.run(analyze_all())
+        assert CountingRunner.calls == 3
+        print("  ✓ Async analyses share the commit-keyed store")
+    finally:
+        github_analyzer.Runner = original_runner
+        for source in sources:
+            shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_batch_analysis():
+    """Test that batch analysis streams one NDJSON line per repository and summarizes them."""
+    print("🧪 Testing batch analysis...")
+
+    sources = [create_source_repository({"README.md": f"# repo {i}\n", "src/app.py": f"print({i})\n"})
+               for i in range(2)]
+    tmp_dir = Path(tempfile.mkdtemp(prefix="test-analysis-"))
+    original_runner = github_analyzer.Runner
+    github_analyzer.Runner = CountingRunner
+    CountingRunner.calls = 0
+
+    try:
+        analyzer = RepositoryAnalyzer(db_path=str(tmp_dir / "test.db"), show_progress=False)
+        lines = ["# repositories to analyze", *(source.as_uri() for source in sources),
+                 f"{sources[0].as_uri()} main", "", str(tmp_dir / "missing")]
+        entries = read_batch_entries(lines)
+        assert len(entries) == 3
+        print("  ✓ Comments, blank lines and duplicates are skipped")
+
+        out = io.StringIO()
+        summary = asyncio.run(run_batch(analyzer, entries, concurrency=2, out=out))
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert len(records) == 3
+        assert CountingRunner.calls == 2
+        assert summary["succeeded"] == 2 and summary["failed"] == 1
+        assert {r["status"] for r in records if r["repo_url"] != entries[2][0]} == {"ok"}
+        assert all("raw_response" not in r["analysis"] for r in records if r["status"] == "ok")
+        assert {"resolve", "load", "model"} <= set(summary["stage_seconds"])
+        print("  ✓ One result line per repository, failures reported without stopping the batch")
+
+        out = io.StringIO()
+        summary = asyncio.run(run_batch(analyzer, entries[:2], concurrency=2, out=out))
+        assert CountingRunner.calls == 2
+        assert summary["cache_hits"] == 2 and summary["outcomes"] == {"cached": 2}
+        assert all(json.loads(line)["cache_hit"] for line in out.getvalue().splitlines())
+        print("  ✓ Repeated batch is served from the analysis store")
+    finally:
+        github_analyzer.Runner = original_runner
+        for source in sources:
+            shutil.rmtree(source, ignore_errors=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_checkout_and_refresh()
+    test_lru_eviction()
+    test_leased_entries_survive_eviction()
+    test_mirror_skips_hosting_refs()
+    test_sparse_subfolder_checkout()
+    test_object_ingestion_matches_worktree()
+    test_streamed_tree_listing()
+    test_commit_keyed_analysis_cache()
+    test_incremental_reanalysis()
+    test_incremental_update_validation()
+    test_async_analysis()
+    test_batch_analysis()
+    print("\n🎉 All repository cache tests passed!")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-flight, stale-while-revalidate trends cache.
+"""
+
+import sys
+import asyncio
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from trends_cache import TrendsCache
+
+
+def make_fetch(results, delay=0.05):
+    """A slow fetch function returning (or raising) the given results in order."""
+    calls = []
+
+    async def fetch():
+        calls.append(len(calls))
+        await asyncio.sleep(delay)
+        result = results[min(len(calls), len(results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fetch, calls
+
+
+def test_single_flight():
+    """Test that concurrent misses share one fetch."""
+    print("🧪 Testing single-flight fetches...")
+
+    fetch, calls = make_fetch(["trends"])
+    cache = TrendsCache(fetch, timedelta(hours=6))
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get() for _ in range(20)))
+
+    values = asyncio.run(scenario())
+    assert values == ["trends"] * 20 and len(calls) == 1
+    print("  ✓ Twenty concurrent requests made one upstream call")
+
+    assert asyncio.run(cache.get()) == "trends" and len(calls) == 1
+    print("  ✓ Fresh values are served from memory")
+
+
+def test_stale_while_revalidate():
+    """Test that expired values are served at once while one refresh runs."""
+    print("🧪 Testing stale-while-revalidate...")
+
+    fetch, calls = make_fetch(["old", "new"])
+    cache = TrendsCache(fetch, timedelta(seconds=0.1))
+
+    async def scenario():
+        await cache.get()
+        await asyncio.sleep(0.15)  # Expired
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        stale = await asyncio.gather(*(cache.get() for _ in range(10)))
+        elapsed = loop.time() - started
+        await asyncio.sleep(0.1)  # Background refresh finishes
+        return stale, elapsed, await cache.get()
+
+    stale, elapsed, refreshed = asyncio.run(scenario())
+    assert stale == ["old"] * 10 and elapsed < 0.02
+    print("  ✓ Expired value served without waiting on the refresh")
+
+    assert refreshed == "new" and len(calls) == 2
+    print("  ✓ One background refresh replaced it")
+
+
+def test_failed_refresh():
+    """Test that failures keep the previous value and back off before retrying."""
+    print("🧪 Testing failed refreshes...")
+
+    fetch, calls = make_fetch([RuntimeError("quota"), "trends", RuntimeError("quota")], delay=0)
+    cache = TrendsCache(fetch, timedelta(seconds=0.05), retry_after=timedelta(seconds=0.1))
+
+    async def scenario():
+        first = await cache.get()
+        again = await cache.get()  # Within retry_after: not retried
+        await asyncio.sleep(0.11)
+        second = await cache.get()  # Nothing cached yet: fetched in the request
+        await asyncio.sleep(0.06)
+        await cache.get()  # Stale: refresh fails in the background
+        await asyncio.sleep(0.01)
+        attempts = len(calls)
+        for _ in range(5):
+            await cache.get()  # Within retry_after: no new attempts
+        await asyncio.sleep(0)
+        return (first, again, second), cache.value, attempts
+
+    (first, again, second), value, attempts = asyncio.run(scenario())
+    assert first is None and again is None and second == "trends"
+    print("  ✓ A failed first fetch returns nothing instead of raising, and backs off")
+
+    assert value == "trends" and attempts == 3 and len(calls) == 3
+    print("  ✓ A failed refresh keeps the previous value and is not retried at once")
+
+
+def test_background_refresher():
+    """Test that the refresher keeps the value fresh and /ai-trends never waits."""
+    print("🧪 Testing the background refresher...")
+
+    fetch, calls = make_fetch(["v1", "v2", "v3"], delay=0)
+    cache = TrendsCache(fetch, timedelta(seconds=0.05))
+
+    async def scenario():
+        refresher = asyncio.create_task(cache.run_refresher())
+        await asyncio.sleep(0.12)
+        refresher.cancel()
+        await asyncio.gather(refresher, return_exceptions=True)
+        return cache.value
+
+    assert asyncio.run(scenario()) == "v3" and len(calls) == 3
+    print("  ✓ Refresher fetched once per TTL")
+
+    from fastapi.testclient import TestClient
+    import api
+
+    trends = api.get_sample_ai_trends()
+    fetch, calls = make_fetch([trends])
+    original = api._trends_cache
+    api._trends_cache = TrendsCache(fetch, timedelta(hours=6))
+    try:
+        with TestClient(api.app) as client:
+            responses = [client.get("/ai-trends") for _ in range(5)]
+        assert all(response.json()["total_count"] == trends.total_count for response in responses)
+        assert len(calls) == 1
+        print("  ✓ /ai-trends served from the cache the lifespan refresher warmed")
+    finally:
+        api._trends_cache = original
+
+
+if __name__ == "__main__":
+    test_single_flight()
+    test_stale_while_revalidate()
+    test_failed_refresh()
+    test_background_refresher()
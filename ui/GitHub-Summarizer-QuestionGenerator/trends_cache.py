@@ -0,0 +1,106 @@
+"""
+In-memory cache for slow, quota-limited upstream data such as the AI trends feed.
+
+Requests are answered from memory. Once the value is older than its TTL it is
+still served (stale-while-revalidate) while one background refresh runs.
+Concurrent misses and refreshes share a single fetch (single-flight), so the
+upstream API is called at most once per refresh, however many requests
+arrive. ``run_refresher`` keeps the value fresh from a background task, so
+requests normally never wait on the upstream API at all.
+"""
+
+import time
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Wait after a failed fetch before the upstream API is tried again
+DEFAULT_RETRY_AFTER = timedelta(minutes=5)
+
+
+class TrendsCache:
+    """Single-flight, stale-while-revalidate cache around one async fetch function."""
+
+    def __init__(self, fetch: Callable[[], Awaitable[Any]], ttl: timedelta,
+                 retry_after: timedelta = DEFAULT_RETRY_AFTER):
+        """
+        Args:
+            fetch: Coroutine function returning a new value; exceptions keep the old value
+            ttl: Age after which the value is refreshed
+            retry_after: Wait after a failed fetch before the next attempt
+        """
+        self.fetch = fetch
+        self.ttl = ttl.total_seconds()
+        self.retry_after = retry_after.total_seconds()
+        self._value: Any = None
+        self._fetched_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    @property
+    def value(self) -> Any:
+        """The cached value, fresh or stale, without triggering a refresh."""
+        return self._value
+
+    def is_fresh(self) -> bool:
+        """Whether a value is cached and younger than the TTL."""
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    async def get(self) -> Any:
+        """
+        The cached value, fetching it first only when nothing is cached.
+
+        A stale value is returned immediately and refreshed in the background.
+        After a failed fetch, no new one starts for retry_after.
+
+        Returns:
+            The value, or None when nothing is cached and the fetch failed
+        """
+        if self._fetched_at is None:
+            if self._retry_due():
+                await self.refresh()
+        elif not self.is_fresh() and self._retry_due():
+            self._start_refresh()
+        return self._value
+
+    async def refresh(self) -> Any:
+        """Fetch a new value, or wait for the fetch already in progress."""
+        # Shielded, so a cancelled request does not cancel a fetch others wait on
+        await asyncio.shield(self._start_refresh())
+        return self._value
+
+    async def run_refresher(self):
+        """Refresh the value whenever it is due; run as a background task until cancelled."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self._seconds_until_due())
+
+    def _start_refresh(self) -> asyncio.Task:
+        """The fetch task in progress, starting one if there is none."""
+        task = self._refreshing
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refreshing = asyncio.create_task(self._refresh())
+        return task
+
+    async def _refresh(self):
+        try:
+            self._value = await self.fetch()
+            self._fetched_at = time.monotonic()
+            self._failed_at = None
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            logger.warning(f"Refresh failed, serving the previous value: {e}")
+
+    def _retry_due(self) -> bool:
+        """Whether a fetch may start: always, unless the last one failed less than retry_after ago."""
+        return self._failed_at is None or time.monotonic() - self._failed_at >= self.retry_after
+
+    def _seconds_until_due(self) -> float:
+        """Seconds until the value expires, or until a failed fetch may be retried."""
+        now = time.monotonic()
+        if self._failed_at is not None:
+            return max(0.0, self._failed_at + self.retry_after - now)
+        return max(0.0, self._fetched_at + self.ttl - now)